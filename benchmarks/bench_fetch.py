@@ -0,0 +1,104 @@
+"""Compare ways of fetching a submission's metadata on large threads
+
+``submission`` is what the plugin used to do: let a lazy PRAW
+``Submission`` load itself from ``/comments/<id>``, which comes with the
+comment tree. ``info`` is what it does now: ask ``/api/info`` for the
+submission's listing data only. Both build the same ``PostInfo``.
+
+For each, reports the bytes received and the time and peak memory (as
+seen by ``tracemalloc``) per fetch, against a local stand-in for reddit
+with no added latency, so the time is mostly JSON parsing and PRAW
+building objects.
+
+Usage::
+
+    python benchmarks/bench_fetch.py [--comments N] [--fetches N]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import praw  # type: ignore[import]
+import requests
+
+from fakereddit import FakeReddit
+from sopel_reddit.snapshots import PostInfo
+
+
+def by_submission(reddit, id_):
+    return PostInfo.from_submission(reddit.submission(id=id_))
+
+
+def by_info(reddit, id_):
+    return PostInfo.from_submission(next(iter(reddit.info(fullnames=['t3_' + id_]))))
+
+
+METHODS = (
+    ('submission', by_submission),
+    ('info', by_info),
+)
+
+
+def make_reddit(url):
+    received = []
+    http = requests.Session()
+    http.hooks['response'].append(
+        lambda response, *args, **kwargs: received.append(len(response.content)))
+    reddit = praw.Reddit(
+        user_agent='sopel-reddit benchmark',
+        client_id='bench',
+        client_secret=None,
+        check_for_updates=False,
+        oauth_url=url,
+        reddit_url=url,
+        requestor_kwargs={'session': http},
+    )
+    return reddit, received
+
+
+def measure(reddit, received, fetch, fetches):
+    fetch(reddit, 'warmup')  # get a token, warm the connection
+    received.clear()
+
+    durations, peaks = [], []
+    for n in range(fetches):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fetch(reddit, 'p%d' % n)
+        durations.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        'bytes': sum(received) / fetches,
+        'time': statistics.median(durations),
+        'peak': statistics.median(peaks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--comments', type=int, default=500,
+                        help='comments in each thread (default: 500)')
+    parser.add_argument('--fetches', type=int, default=20,
+                        help='fetches per method (default: 20)')
+    args = parser.parse_args()
+
+    with FakeReddit(comments=args.comments) as server:
+        reddit, received = make_reddit(server.url)
+        print('{} comments per thread, median of {} fetches\n'.format(
+            args.comments, args.fetches))
+        print('{:<12} {:>12} {:>10} {:>12}'.format(
+            'method', 'bytes', 'ms', 'peak KiB'))
+        for name, fetch in METHODS:
+            result = measure(reddit, received, fetch, args.fetches)
+            print('{:<12} {:>12,.0f} {:>10.2f} {:>12,.0f}'.format(
+                name, result['bytes'], result['time'] * 1000,
+                result['peak'] / 1024))
+
+
+if __name__ == '__main__':
+    main()
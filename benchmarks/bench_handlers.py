@@ -0,0 +1,176 @@
+"""End-to-end benchmark of the reddit plugin's handlers
+
+Runs each handler against a local stand-in for reddit (see
+``fakereddit.py``) with a configurable response latency, and reports
+throughput and p50/p99 latency per handler, plus how many HTTP requests
+each call made on average.
+
+By default every call asks about a thing nobody has asked about yet, so
+nothing is served from the plugin's caches; ``--warm`` cycles through a
+handful of things instead.
+
+Usage::
+
+    python benchmarks/bench_handlers.py [--latency MS] [--calls N]
+        [--concurrency C] [--batch-window MS] [--warm] [scenario ...]
+"""
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import inspect
+import os
+import statistics
+import tempfile
+import time
+
+from sopel.bot import SopelWrapper
+from sopel.config import Config
+from sopel.tests.factories import BotFactory
+from sopel.trigger import PreTrigger, Trigger
+
+from fakereddit import FakeReddit
+from sopel_reddit import plugin
+
+
+CONFIG = """
+[core]
+owner = BenchOwner
+nick = Sopel
+homedir = {homedir}
+enable =
+    reddit
+# measure the plugin, not Sopel's output throttling
+flood_max_wait = 0
+antiloop_threshold = 0
+
+[reddit]
+oauth_url = {url}
+reddit_url = {url}
+batch_window = {batch_window}
+"""
+
+LINE = ':BenchOwner!bench@example.com PRIVMSG #bench :{}'
+
+# (label, handler name, message template); {n} is replaced by a unique ID
+SCENARIOS = (
+    ('post', 'post_or_comment_info',
+     'https://www.reddit.com/r/bench/comments/p{n}/some_title/'),
+    ('comment', 'post_or_comment_info',
+     'https://www.reddit.com/r/bench/comments/p{n}/some_title/c{n}/'),
+    ('short post', 'post_or_comment_info', 'https://redd.it/s{n}'),
+    ('missing post', 'post_or_comment_info', 'https://redd.it/missing{n}'),
+    ('image', 'image_info', 'https://i.redd.it/img{n}.jpg'),
+    ('video', 'video_info', 'https://v.redd.it/vid{n}'),
+    ('share', 'share_info', 'https://www.reddit.com/r/bench/s/share{n}'),
+    ('gallery', 'rgallery_info', 'https://www.reddit.com/gallery/g{n}'),
+    ('subreddit link', 'auto_subreddit_info', 'https://www.reddit.com/r/sub{n}'),
+    ('user link', 'auto_redditor_info', 'https://www.reddit.com/u/user{n}'),
+    ('slash mention', 'reddit_slash_info', 'have you seen r/slash{n} lately'),
+    ('missing subreddit', 'reddit_slash_info', 'try r/missing{n}'),
+    ('.subreddit', 'subreddit_command', '.subreddit cmd{n}'),
+    ('.redditor', 'redditor_command', '.redditor cmd{n}'),
+)
+
+
+def make_bot(homedir, url, batch_window):
+    filename = os.path.join(homedir, 'bench.cfg')
+    with open(filename, 'w') as f:
+        f.write(CONFIG.format(homedir=homedir, url=url, batch_window=batch_window))
+    return BotFactory().preloaded(Config(filename), ['reddit'])
+
+
+def make_call(bot, handler_name, message):
+    """Prepare a synchronous call of a handler, as if ``message`` was seen."""
+    pretrigger = PreTrigger(bot.nick, LINE.format(message))
+    for rule, match in bot._rules_manager.get_triggered_rules(bot, pretrigger):
+        handler = rule._handler
+        if handler.__name__ == handler_name:
+            break
+    else:
+        raise ValueError('{} does not trigger {}'.format(message, handler_name))
+
+    trigger = Trigger(bot.settings, pretrigger, match)
+    wrapper = SopelWrapper(bot, trigger, output_prefix=rule.get_output_prefix())
+    # skip the worker pool and repeat suppression, so the call's duration
+    # is the handler's own
+    func = inspect.unwrap(handler)
+    return lambda: func(wrapper, trigger)
+
+
+def timed(call):
+    start = time.perf_counter()
+    try:
+        call()
+    except Exception:
+        return time.perf_counter() - start, True
+    return time.perf_counter() - start, False
+
+
+def run(bot, server, handler_name, template, calls, concurrency, warm):
+    prepared = [
+        make_call(bot, handler_name, template.format(n=n % 10 if warm else n))
+        for n in range(calls)
+    ]
+    requests_before = server.total_requests()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, prepared))
+    elapsed = time.perf_counter() - start
+
+    durations = [duration for duration, _ in results]
+    quantiles = statistics.quantiles(durations, n=100, method='inclusive')
+    return {
+        'throughput': calls / elapsed,
+        'p50': quantiles[49],
+        'p99': quantiles[98],
+        'errors': sum(failed for _, failed in results),
+        'requests': (server.total_requests() - requests_before) / calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency', type=float, default=50,
+                        help='fake reddit response time, in ms (default: 50)')
+    parser.add_argument('--calls', type=int, default=200,
+                        help='calls per handler (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='concurrent calls, like the workers setting (default: 4)')
+    parser.add_argument('--batch-window', type=int, default=10,
+                        help="the plugin's batch_window setting, in ms (default: 10)")
+    parser.add_argument('--warm', action='store_true',
+                        help='reuse a few things, so caches get hits')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help='only run these scenarios (by label or handler name)')
+    args = parser.parse_args()
+
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not args.scenarios
+        or scenario[0] in args.scenarios or scenario[1] in args.scenarios
+    ]
+
+    with FakeReddit(latency=args.latency / 1000) as server, \
+            tempfile.TemporaryDirectory() as homedir:
+        bot = make_bot(homedir, server.url, args.batch_window)
+        try:
+            print('{} calls per scenario, {} at a time, {:g} ms latency{}\n'.format(
+                args.calls, args.concurrency, args.latency,
+                ', warm caches' if args.warm else ''))
+            print('{:<18} {:<22} {:>9} {:>9} {:>9} {:>7} {:>6}'.format(
+                'scenario', 'handler', 'calls/s', 'p50 ms', 'p99 ms', 'HTTP', 'errors'))
+            for label, handler_name, template in scenarios:
+                result = run(bot, server, handler_name, template,
+                             args.calls, args.concurrency, args.warm)
+                print('{:<18} {:<22} {:>9.1f} {:>9.1f} {:>9.1f} {:>7.2f} {:>6}'.format(
+                    label, handler_name, result['throughput'],
+                    result['p50'] * 1000, result['p99'] * 1000,
+                    result['requests'], result['errors']))
+        finally:
+            plugin.shutdown(bot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Microbenchmark for the reddit plugin's line matching
+
+Compares the per-line cost of running each rule's compiled pattern (what
+Sopel does with plain ``@plugin.url``/``@plugin.find`` rules) with the
+shared prefiltered ``MATCHER``, on a synthetic but chat-like corpus.
+
+Usage::
+
+    python benchmarks/bench_matching.py [--lines N] [--reddit-ratio R]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import timeit
+
+from sopel.tools.web import search_urls
+
+from sopel_reddit.plugin import MATCHER
+
+
+URL_RULES = (
+    'subreddit_url',
+    'post_or_comment_url',
+    'share_url',
+    'short_post_url',
+    'user_url',
+    'image_url',
+    'video_url',
+    'gallery_url',
+)
+
+WORDS = (
+    'the a to and of is it that you in for on this with lol was but just '
+    'have not what are so like be can do if my at about get no all one out '
+    'yeah think time would really know people now good deploy build server '
+    'patch release tests broken works fixed coffee lunch meeting ping'
+).split()
+
+OTHER_URLS = (
+    'https://github.com/sopel-irc/sopel/pull/2500',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://en.wikipedia.org/wiki/Internet_Relay_Chat',
+    'https://docs.python.org/3/library/re.html',
+)
+
+REDDIT_TEXT = (
+    'https://www.reddit.com/r/programming/comments/1abcde/some_title/',
+    'https://old.reddit.com/r/sopel/comments/1abcde/some_title/kxyz123/',
+    'https://redd.it/1abcde',
+    'https://i.redd.it/yib0zwk1mmza1.png',
+    'https://v.redd.it/abc123xyz',
+    'https://www.reddit.com/r/pics/s/AbCdEf123',
+    'https://www.reddit.com/gallery/1abcde',
+    'r/eyebleach',
+    'u/poem_for_your_sprog',
+)
+
+
+def make_corpus(lines: int, reddit_ratio: float, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(lines):
+        words = rng.choices(WORDS, k=rng.randint(3, 18))
+        roll = rng.random()
+        if roll < reddit_ratio:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(REDDIT_TEXT))
+        elif roll < reddit_ratio + 0.05:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(OTHER_URLS))
+        corpus.append(' '.join(words))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--reddit-ratio', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.lines, args.reddit_ratio)
+    # URL extraction is the same either way; keep it out of the comparison
+    prepared = [(line, list(search_urls(line))) for line in corpus]
+
+    plain = (
+        [re.compile(MATCHER.patterns[name].pattern, MATCHER.patterns[name].flags)
+         for name in URL_RULES],
+        re.compile(
+            MATCHER.patterns['slash_mention'].pattern,
+            MATCHER.patterns['slash_mention'].flags),
+    )
+    shared = (
+        [MATCHER.view(name) for name in URL_RULES],
+        MATCHER.view('slash_mention'),
+    )
+
+    def bench(url_patterns, slash_pattern):
+        found = 0
+        for line, urls in prepared:
+            for url in urls:
+                for pattern in url_patterns:
+                    if pattern.search(url):
+                        found += 1
+            for _ in slash_pattern.finditer(line):
+                found += 1
+        return found
+
+    assert bench(*plain) == bench(*shared), 'matchers disagree'
+
+    print('{:,} lines, {:.1%} mentioning reddit'.format(
+        args.lines, args.reddit_ratio))
+    for label, patterns in (('per-rule patterns', plain), ('shared matcher', shared)):
+        best = min(timeit.repeat(
+            lambda: bench(*patterns), number=1, repeat=args.repeat))
+        print('{:>18}: {:8.3f} µs/line'.format(label, best / args.lines * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Startup-time benchmark for the reddit plugin
+
+Each run starts a fresh interpreter with Sopel already imported (as it is
+by the time plugins load) and times:
+
+* importing the plugin module
+* ``setup()``, as done when the bot starts or the plugin is loaded
+* reloading the plugin: ``shutdown()``, re-importing and ``setup()`` again
+* creating the PRAW client, which now happens on the first lookup
+
+Usage::
+
+    python benchmarks/bench_startup.py [--runs N]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+CHILD = r'''
+import importlib, json, os, sys, tempfile, time
+
+import sopel.bot, sopel.plugins, sopel.tests.factories
+
+with tempfile.TemporaryDirectory() as homedir:
+    filename = os.path.join(homedir, 'bench.cfg')
+    with open(filename, 'w') as f:
+        f.write('[core]\nowner = Bench\nnick = Sopel\nhomedir = %s\n' % homedir)
+    bot = sopel.tests.factories.BotFactory()(sopel.config.Config(filename))
+
+    timings = {}
+    start = time.perf_counter()
+    from sopel_reddit import plugin
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plugin.setup(bot)
+    timings['setup'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plugin.shutdown(bot)
+    importlib.reload(plugin)
+    plugin.setup(bot)
+    timings['reload'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plugin.get_reddit(bot)
+    timings['first lookup client'] = time.perf_counter() - start
+
+    plugin.shutdown(bot)
+    print(json.dumps(timings))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10,
+                        help='fresh interpreters to measure (default: 10)')
+    args = parser.parse_args()
+
+    runs = [
+        json.loads(subprocess.run(
+            [sys.executable, '-c', CHILD],
+            check=True, capture_output=True, text=True,
+        ).stdout)
+        for _ in range(args.runs)
+    ]
+
+    print('median of {} runs\n'.format(args.runs))
+    for step in runs[0]:
+        print('{:<20} {:>8.1f} ms'.format(
+            step, statistics.median(run[step] for run in runs) * 1000))
+
+
+if __name__ == '__main__':
+    main()
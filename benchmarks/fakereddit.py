@@ -0,0 +1,271 @@
+"""Local stand-in for the parts of reddit Sopel's reddit plugin talks to
+
+Serves recorded API responses (from ``fixtures/things.json``) for any ID or
+name asked for, so benchmarks and load tests can run without touching the
+real reddit. Point the plugin at it with the ``oauth_url`` and
+``reddit_url`` settings::
+
+    with FakeReddit(latency=0.05) as server:
+        settings.reddit.oauth_url = server.url
+        settings.reddit.reddit_url = server.url
+
+IDs and names starting with ``missing`` don't exist; everything else does.
+No rate-limit headers are sent, so prawcore never sleeps between requests.
+A share of requests can be made to fail with a 503, like reddit under load.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (method, path regex, handler method name)
+ROUTES = (
+    ('POST', r'/api/v1/access_token/?', 'access_token'),
+    ('GET', r'/api/info/?', 'info'),
+    ('GET', r'(?:/r/[^/]+)?/comments/(?P<id>\w+)(?:/.*)?', 'comments'),
+    ('GET', r'/r/all/search/?', 'search'),
+    ('GET', r'/r/(?P<name>[\w-]+)/about/?', 'subreddit_about'),
+    ('GET', r'/user/(?P<name>[\w-]+)/about/?', 'user_about'),
+    ('HEAD', r'/video/(?P<id>\w+)/?', 'video'),
+    ('HEAD', r'/r/(?P<name>[\w-]+)/s/(?P<code>\w+)/?', 'share'),
+)
+
+IMAGE_URL = re.compile(r'https?://(?:i|preview)\.redd\.it/(?P<id>\w+)')
+
+
+def load_things(filename: str = 'things.json') -> dict[str, str]:
+    """Load the recorded things, as JSON templates keyed by kind."""
+    with open(os.path.join(FIXTURES, filename)) as f:
+        return {kind: json.dumps(data) for kind, data in json.load(f).items()}
+
+
+def listing(children: list[str]) -> str:
+    return (
+        '{"kind": "Listing", "data": {"after": null, "before": null, '
+        '"dist": %d, "modhash": "", "children": [%s]}}'
+        % (len(children), ', '.join(children))
+    )
+
+
+def missing(name: str) -> bool:
+    return name.lower().startswith('missing')
+
+
+class FakeReddit:
+    """Threaded HTTP server impersonating reddit's API and website.
+
+    :param latency: seconds to wait before answering each request
+    :param comments: how many comments to put in each post's comment tree
+    :param host: address to listen on
+    :param port: port to listen on; the default picks a free one
+    :param errors: share of requests (other than for access tokens) to answer
+                   with a 503 error
+    :param seed: seed for picking which requests fail
+
+    ``requests`` counts the requests served, by route; ``failures`` counts
+    those that got an error instead.
+    """
+    def __init__(
+        self,
+        latency: float = 0.0,
+        comments: int = 0,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        errors: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.comments = comments
+        self.errors = errors
+        self.things = load_things()
+        self.requests: Counter[str] = Counter()
+        self.failures: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._routes = [
+            (method, re.compile(pattern + '$'), name)
+            for method, pattern, name in ROUTES
+        ]
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='fake-reddit', daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> FakeReddit:
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like reddit
+            # don't let delayed ACKs add 40 ms to every response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server._dispatch(self, 'GET')
+
+            def do_HEAD(self):
+                server._dispatch(self, 'HEAD')
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                server._dispatch(self, 'POST')
+
+        return Handler
+
+    def _dispatch(self, request: BaseHTTPRequestHandler, method: str):
+        url = urlsplit(request.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        for route_method, pattern, name in self._routes:
+            match = route_method == method and pattern.match(url.path)
+            if match:
+                break
+        else:
+            name, match = 'unknown', None
+
+        with self._lock:
+            self.requests[name] += 1
+            fail = (
+                match is not None and name != 'access_token'
+                and self._random.random() < self.errors)
+            if fail:
+                self.failures[name] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if match is None:
+            status, headers, body = self._error(404)
+        elif fail:
+            status, headers, body = self._error(503)
+        else:
+            status, headers, body = getattr(self, '_' + name)(query, **match.groupdict())
+
+        payload = body.encode('utf-8')
+        request.send_response(status)
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.send_header('Content-Length', str(len(payload)))
+        request.end_headers()
+        if method != 'HEAD':
+            request.wfile.write(payload)
+
+    # Responses: (status, headers, body)
+
+    def _json(self, body: str, status: int = 200):
+        return status, {'Content-Type': 'application/json; charset=UTF-8'}, body
+
+    def _error(self, status: int):
+        return self._json(
+            json.dumps({'message': 'Error', 'error': status}), status)
+
+    def _redirect(self, location: str):
+        return 301, {'Location': location}, ''
+
+    def _submission(self, id_: str) -> str:
+        return self.things['t3'].replace('ID', id_)
+
+    def _comment(self, id_: str, link_id: str = 'bench') -> str:
+        return self.things['t1'].replace('ID', id_).replace('LINK', link_id)
+
+    def _access_token(self, query):
+        return self._json(json.dumps({
+            'access_token': 'fake-token',
+            'token_type': 'bearer',
+            'device_id': 'DO_NOT_TRACK_THIS_DEVICE',
+            'expires_in': 86400,
+            'scope': '*',
+        }))
+
+    def _info(self, query):
+        children = []
+        for fullname in query.get('id', '').split(','):
+            kind, _, id_ = fullname.partition('_')
+            if missing(id_):
+                continue
+            if kind == 't3':
+                children.append('{"kind": "t3", "data": %s}' % self._submission(id_))
+            elif kind == 't1':
+                children.append('{"kind": "t1", "data": %s}' % self._comment(id_))
+        return self._json(listing(children))
+
+    def _comments(self, query, id):
+        if missing(id):
+            return self._error(404)
+        return self._json('[%s, %s]' % (
+            listing(['{"kind": "t3", "data": %s}' % self._submission(id)]),
+            listing([
+                '{"kind": "t1", "data": %s}' % self._comment('c%d' % n, id)
+                for n in range(self.comments)
+            ]),
+        ))
+
+    def _search(self, query):
+        image = IMAGE_URL.search(query.get('q', ''))
+        if image is None or missing(image.group('id')):
+            return self._json(listing([]))
+        return self._json(listing(
+            ['{"kind": "t3", "data": %s}' % self._submission(image.group('id'))]))
+
+    def _subreddit_about(self, query, name):
+        if missing(name):
+            # what reddit does for subreddits that don't exist
+            return 302, {
+                'Location': '/subreddits/search.json?q=' + name,
+            }, ''
+        return self._json(
+            '{"kind": "t5", "data": %s}' % self.things['t5'].replace('NAME', name))
+
+    def _user_about(self, query, name):
+        if missing(name):
+            return self._error(404)
+        return self._json(
+            '{"kind": "t2", "data": %s}' % self.things['t2'].replace('NAME', name))
+
+    def _video(self, query, id):
+        if missing(id):
+            return 200, {}, ''
+        return self._redirect(
+            'https://www.reddit.com/r/bench/comments/{}/a_video/'.format(id))
+
+    def _share(self, query, name, code):
+        if missing(code):
+            return 200, {}, ''
+        return self._redirect(
+            'https://www.reddit.com/r/{}/comments/{}/shared_post/'.format(name, code))
@@ -0,0 +1,288 @@
+"""Load test replaying chat through the reddit plugin
+
+Feeds lines of chat, from an IRC log or made up, to every rule they trigger
+in a test bot (so Sopel's own matching runs too), with a local stand-in for
+reddit (see ``fakereddit.py``) answering after a configurable latency and
+failing a configurable share of requests. Reports how fast lines went
+through, how many API requests each line with a reddit link cost, how much
+time went to matching lines against rules, and the handlers' p50/p99
+latency.
+
+Logs can hold raw IRC lines (``:nick!user@host PRIVMSG #channel :text``),
+or the usual client formats: ``[12:34] <nick> text`` or tab-separated
+``time<TAB>nick<TAB>text``; other lines are skipped. Without ``--log``,
+``--lines`` lines of chat are generated, a ``--links`` share of them with a
+reddit link (the kinds ``bench_handlers.py`` runs), and a ``--repeats``
+share of those links to something mentioned before.
+
+Usage::
+
+    python benchmarks/replay.py [--log FILE] [--lines N] [--links R]
+        [--repeats R] [--channels N] [--rate LINES_PER_S] [--latency MS]
+        [--errors R] [--workers N] [--batch-window MS] [--async] [--seed N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+import logging
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from typing import Iterator
+
+from sopel.bot import SopelWrapper
+from sopel.config import Config
+from sopel.tests.factories import BotFactory
+from sopel.trigger import PreTrigger, Trigger
+
+from bench_handlers import SCENARIOS
+from bench_matching import OTHER_URLS, WORDS
+from fakereddit import FakeReddit
+from sopel_reddit import plugin
+
+
+CONFIG = """
+[core]
+owner = BenchOwner
+nick = Sopel
+homedir = {homedir}
+enable =
+    reddit
+# measure the plugin, not Sopel's output throttling
+flood_max_wait = 0
+antiloop_threshold = 0
+
+[reddit]
+oauth_url = {url}
+reddit_url = {url}
+batch_window = {batch_window}
+workers = {workers}
+async_backend = {async_backend}
+"""
+
+RAW = ':{nick}!{nick}@example.com PRIVMSG {channel} :{text}'
+
+LOG_LINE = re.compile(
+    r'^(?:\S*\d:\d\d\S*\s+)?<[~&@%+ ]?(?P<nick>[^>\s]+)>\s(?P<text>.*)$')
+NICK = re.compile(r'^[A-Za-z\[\]\\`^{}|_][\w\[\]\\`^{}|-]*$')
+
+
+def read_log(filename: str, channel: str = '#replay') -> Iterator[str]:
+    """Get the messages of an IRC log, as raw IRC lines."""
+    with open(filename, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line.startswith((':', '@')) and ' PRIVMSG ' in line:
+                yield line
+                continue
+            match = LOG_LINE.match(line)
+            if match:
+                nick, text = match.group('nick', 'text')
+            else:
+                fields = line.split('\t')
+                if len(fields) != 3 or not fields[1].strip('~&@%+ '):
+                    continue
+                nick, text = fields[1].lstrip('~&@%+'), fields[2]
+            if NICK.match(nick):  # not "-->", "*" and the like
+                yield RAW.format(nick=nick, channel=channel, text=text)
+
+
+def generate(
+    lines: int,
+    links: float,
+    repeats: float,
+    channels: int,
+    seed: int,
+) -> Iterator[str]:
+    """Make up chat, with reddit links in a ``links`` share of the lines."""
+    rng = random.Random(seed)
+    templates = [template for _, _, template in SCENARIOS]
+    nicks = ['user%d' % n for n in range(50)]
+    mentioned: list[str] = []
+    for n in range(lines):
+        words = rng.choices(WORDS, k=rng.randint(3, 18))
+        roll = rng.random()
+        if roll < links:
+            if mentioned and rng.random() < repeats:
+                link = rng.choice(mentioned)
+            else:
+                link = rng.choice(templates).format(n=n)
+                mentioned.append(link)
+            if link.startswith('.'):
+                # a command
+                words = [link]
+            else:
+                words.insert(rng.randrange(len(words) + 1), link)
+        elif roll < links + 0.05:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(OTHER_URLS))
+        yield RAW.format(
+            nick=rng.choice(nicks),
+            channel='#chan%d' % rng.randrange(channels),
+            text=' '.join(words),
+        )
+
+
+def make_bot(homedir: str, url: str, args: argparse.Namespace):
+    filename = os.path.join(homedir, 'replay.cfg')
+    with open(filename, 'w') as f:
+        f.write(CONFIG.format(
+            homedir=homedir, url=url, batch_window=args.batch_window,
+            workers=args.workers, async_backend=args.use_async))
+    return BotFactory().preloaded(Config(filename), ['reddit'])
+
+
+def record_latencies(bot) -> dict[str, list[float]]:
+    """Keep every handler duration the plugin's metrics see, for exact quantiles."""
+    metrics = bot.memory['reddit_metrics']
+    samples: dict[str, list[float]] = defaultdict(list)
+    observe = metrics.observe
+
+    def recording(handler, seconds, failed=False):
+        samples[handler].append(seconds)
+        observe(handler, seconds, failed)
+
+    metrics.observe = recording
+    return samples
+
+
+def drain(bot):
+    """Wait until every queued job and pending async lookup is done."""
+    workers = bot.memory['reddit_workers']
+    backend = bot.memory.get('reddit_async')
+
+    async def busy():
+        return len(asyncio.all_tasks()) > 1
+
+    while True:
+        workers.join()
+        if backend is None or not backend.submit(busy()).result():
+            if workers.qsize() == 0:
+                return
+        time.sleep(0.01)
+
+
+def replay(bot, lines: Iterator[str], rate: float) -> dict:
+    """Dispatch each line to the rules it triggers, as Sopel would."""
+    rules_manager = bot._rules_manager
+    stats = {'lines': 0, 'reddit lines': 0, 'matching': 0.0}
+    start = time.perf_counter()
+    for raw in lines:
+        if rate:
+            delay = start + stats['lines'] / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        stats['lines'] += 1
+
+        pretrigger = PreTrigger(bot.nick, raw)
+        matched = time.perf_counter()
+        triggered = list(rules_manager.get_triggered_rules(bot, pretrigger))
+        stats['matching'] += time.perf_counter() - matched
+
+        reddit = False
+        for rule, match in triggered:
+            reddit = reddit or rule.get_plugin_name() == 'reddit'
+            trigger = Trigger(bot.settings, pretrigger, match)
+            wrapper = SopelWrapper(bot, trigger, output_prefix=rule.get_output_prefix())
+            # the plugin's handlers only queue their work; run them inline
+            bot.call_rule(rule, wrapper, trigger)
+        stats['reddit lines'] += reddit
+
+    drain(bot)
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+def quantiles(samples: list[float]) -> tuple[float, float]:
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return value, value
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return cuts[49], cuts[98]
+
+
+def report(stats: dict, server: FakeReddit, samples: dict[str, list[float]], bot):
+    metrics = bot.memory['reddit_metrics']
+    requests = server.total_requests() - server.requests['access_token']
+    failures = sum(server.failures.values())
+    print('{:,} lines in {:.2f}s: {:,.0f} lines/s'.format(
+        stats['lines'], stats['elapsed'], stats['lines'] / stats['elapsed']))
+    print('{:,} lines with reddit links: {:.2f} API requests each '
+          '({:,} requests, {:,} failed)'.format(
+              stats['reddit lines'],
+              requests / max(stats['reddit lines'], 1), requests, failures))
+    print('Matching: {:.3f}s total, {:.1f} µs/line'.format(
+        stats['matching'], stats['matching'] / max(stats['lines'], 1) * 1e6))
+    print('Dropped jobs: {}\n'.format(bot.memory['reddit_workers'].dropped))
+
+    print('{:<26} {:>7} {:>9} {:>9} {:>6}'.format(
+        'handler', 'calls', 'p50 ms', 'p99 ms', 'errors'))
+    everything = []
+    for handler in sorted(samples):
+        everything.extend(samples[handler])
+        p50, p99 = quantiles(samples[handler])
+        print('{:<26} {:>7} {:>9.1f} {:>9.1f} {:>6}'.format(
+            handler, len(samples[handler]), p50 * 1000, p99 * 1000,
+            metrics.errors[handler]))
+    p50, p99 = quantiles(everything)
+    print('{:<26} {:>7} {:>9.1f} {:>9.1f} {:>6}'.format(
+        'all', len(everything), p50 * 1000, p99 * 1000,
+        sum(metrics.errors.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--log', metavar='FILE',
+                        help='IRC log to replay, instead of generated chat')
+    parser.add_argument('--lines', type=int, default=5000,
+                        help='lines of chat to generate (default: 5000)')
+    parser.add_argument('--links', type=float, default=0.05,
+                        help='share of generated lines with a reddit link (default: 0.05)')
+    parser.add_argument('--repeats', type=float, default=0.3,
+                        help='share of links to something linked before (default: 0.3)')
+    parser.add_argument('--channels', type=int, default=5,
+                        help='channels to spread generated chat over (default: 5)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='lines per second to replay at; 0 for as fast as possible')
+    parser.add_argument('--latency', type=float, default=50,
+                        help='fake reddit response time, in ms (default: 50)')
+    parser.add_argument('--errors', type=float, default=0.0,
+                        help='share of reddit requests that fail (default: 0)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help="the plugin's workers setting (default: 4)")
+    parser.add_argument('--batch-window', type=int, default=10,
+                        help="the plugin's batch_window setting, in ms (default: 10)")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='use the asyncio backend for lookups')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='seed for generated chat and failed requests')
+    args = parser.parse_args()
+
+    # dropped jobs and failed lookups are counted in the report instead
+    logging.getLogger('sopel').setLevel(logging.CRITICAL)
+
+    if args.log:
+        lines = read_log(args.log)
+    else:
+        lines = generate(args.lines, args.links, args.repeats, args.channels, args.seed)
+
+    with FakeReddit(latency=args.latency / 1000, errors=args.errors, seed=args.seed) as server, \
+            tempfile.TemporaryDirectory() as homedir:
+        bot = make_bot(homedir, server.url, args)
+        try:
+            samples = record_latencies(bot)
+            print('{}, {:g} ms latency, {:.0%} failed requests, {} workers{}\n'.format(
+                args.log or 'generated chat', args.latency, args.errors,
+                args.workers, ', asyncio backend' if args.use_async else ''))
+            stats = replay(bot, lines, args.rate)
+            report(stats, server, samples, bot)
+        finally:
+            plugin.shutdown(bot)
+
+
+if __name__ == '__main__':
+    main()
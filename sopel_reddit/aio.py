@@ -0,0 +1,321 @@
+"""Asynchronous reddit client for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+An alternative to PRAW for the plugin's lookups: every request runs on one
+asyncio event loop in a background thread, over a single aiohttp connection
+pool, so any number of lookups can wait on reddit without holding a thread
+each. Needs the optional ``aiohttp`` dependency (``sopel-reddit[async]``).
+"""
+from __future__ import annotations
+
+import asyncio
+from base64 import b64encode
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+import json
+import threading
+import time
+from typing import Any, Awaitable, Callable, Mapping, NamedTuple
+
+import aiohttp
+
+from .ratelimit import SharedBucket
+
+
+INSTALLED_CLIENT = 'https://oauth.reddit.com/grants/installed_client'
+"""OAuth grant for app-only access without a client secret, as PRAW uses."""
+MAX_BATCH = 100
+"""Maximum number of fullnames reddit's info endpoint accepts at once."""
+TOKEN_MARGIN = 60
+"""Seconds before it expires that an access token is renewed."""
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Mapping[str, str]
+    data: Any  # parsed JSON body, if there was one
+
+
+class ResponseError(Exception):
+    """Reddit answered with a status the caller can't make sense of."""
+    def __init__(self, method: str, url: str, status: int):
+        super().__init__('{} {} returned {}'.format(method, url, status))
+        self.status = status
+
+
+class AsyncBackend:
+    """Reddit API client running on its own event loop thread.
+
+    :param user_agent: ``User-Agent`` to send
+    :param client_id: reddit app ID to get app-only access tokens for
+    :param oauth_url: base URL of reddit's API
+    :param reddit_url: base URL of reddit's website
+    :param connections: most connections to keep open at once
+    :param batch_window: how long (in seconds) to collect :meth:`info`
+                         lookups into one request; 0 disables batching
+    :param on_response: called with ``(method, url, status, headers)`` for
+                        every response
+    :param bucket: optional shared rate limit to wait for before requests
+    :param on_wait: called with how long each request waited for ``bucket``
+    :param token: access token to start with, and when (as a UNIX time) it
+                  expires
+    :param on_token: called with every new access token and its expiry
+
+    Coroutines are run with :meth:`submit`, from any thread. Rate limits
+    reddit announces in its response headers are respected by pausing
+    requests until the window resets. Blocking calls (file locks, SQLite)
+    go through :meth:`run_blocking`, so they never hold up the loop.
+    """
+    def __init__(
+        self,
+        user_agent: str,
+        client_id: str,
+        oauth_url: str,
+        reddit_url: str,
+        connections: int = 20,
+        batch_window: float = 0.0,
+        on_response: Callable[[str, str, int, Mapping[str, str]], None] | None = None,
+        bucket: SharedBucket | None = None,
+        on_wait: Callable[[float], None] | None = None,
+        token: tuple[str, float] | None = None,
+        on_token: Callable[[str, float], None] | None = None,
+    ):
+        self.user_agent = user_agent
+        self.client_id = client_id
+        self.oauth_url = oauth_url.rstrip('/')
+        self.reddit_url = reddit_url.rstrip('/')
+        self.connections = connections
+        self.batch_window = batch_window
+        self._on_response = on_response
+        self._bucket = bucket
+        self._on_wait = on_wait
+        self._on_token = on_token
+
+        self._token: str | None = None
+        self._token_expires = 0.0
+        if token is not None:
+            self._token, self._token_expires = token
+        self._remaining: float | None = None
+        self._reset_at = 0.0
+        self._paused_until = 0.0  # reddit's rate-limit window ran out
+        self._flights: dict[Any, asyncio.Future] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+        self.loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(4, thread_name_prefix='reddit-asyncio-io')
+        self.loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(
+            target=self._run, name='reddit-asyncio', daemon=True)
+        self._thread.start()
+        self.submit(self._open()).result()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _open(self):
+        # created on the loop, where aiohttp and (before 3.10) asyncio want them
+        self._token_lock = asyncio.Lock()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connections),
+            headers={'User-Agent': self.user_agent},
+            timeout=aiohttp.ClientTimeout(total=30, sock_connect=10),
+        )
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedule ``coro`` on the loop; returns a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Await ``func(*args)``, run in a thread rather than on the loop."""
+        return await self.loop.run_in_executor(None, functools.partial(func, *args))
+
+    def close(self, timeout: float = 5.0):
+        """Cancel outstanding lookups, close the connections and stop the loop."""
+        if self.loop.is_closed():
+            return
+        try:
+            self.submit(self._close()).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+        self._executor.shutdown(wait=False)
+
+    async def _close(self):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.session.close()
+
+    async def coalesce(self, key: Any, func: Callable[..., Awaitable], *args: Any) -> Any:
+        """Await ``func(*args)``, sharing one run among concurrent callers
+        with the same ``key``.
+        """
+        future = self._flights.get(key)
+        if future is None:
+            future = self._flights[key] = asyncio.ensure_future(func(*args))
+            future.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(future)
+
+    # Requests
+
+    async def _send(self, method: str, url: str, **kwargs: Any) -> Response:
+        if self._bucket is not None:
+            wait = await self.run_blocking(self._bucket.reserve)
+            if self._on_wait is not None:
+                self._on_wait(wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        delay = self._paused_until - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        async with self.session.request(
+            method, url, allow_redirects=False, **kwargs,
+        ) as response:
+            body = await response.read()
+            status, headers = response.status, response.headers
+
+        if self._on_response is not None:
+            self._on_response(method, url, status, headers)
+
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is not None and reset is not None:
+            self._remaining = float(remaining)
+            self._reset_at = time.time() + float(reset)
+            if self._remaining < 1:
+                self._paused_until = self._reset_at
+
+        data = None
+        if body and 'json' in headers.get('Content-Type', ''):
+            data = json.loads(body)
+        return Response(status, headers, data)
+
+    def remaining(self) -> float | None:
+        """Requests left in the current rate-limit window, if reddit has told us yet."""
+        if self._reset_at <= time.time():
+            return None
+        return self._remaining
+
+    async def _access_token(self, rejected: str | None = None) -> str:
+        """Get a valid access token; ``rejected`` is one reddit just refused."""
+        async with self._token_lock:
+            if self._token is None or self._token == rejected \
+                    or self._token_expires - TOKEN_MARGIN <= time.time():
+                url = self.reddit_url + '/api/v1/access_token'
+                requested = time.time()
+                response = await self._send(
+                    'POST', url,
+                    headers={'Authorization': 'Basic ' + b64encode(
+                        (self.client_id + ':').encode('utf-8')).decode('ascii')},
+                    data={
+                        'grant_type': INSTALLED_CLIENT,
+                        'device_id': 'DO_NOT_TRACK_THIS_DEVICE',
+                    },
+                )
+                if response.status != 200 or not response.data \
+                        or 'access_token' not in response.data:
+                    raise ResponseError('POST', url, response.status)
+                self._token = response.data['access_token']
+                self._token_expires = requested + response.data.get('expires_in', 3600)
+                if self._on_token is not None:
+                    await self.run_blocking(self._on_token, self._token, self._token_expires)
+            return self._token
+
+    @property
+    def token_expires(self) -> float:
+        """When (as a UNIX time) the current access token expires; 0 if none."""
+        return self._token_expires if self._token is not None else 0.0
+
+    async def renew_token(self):
+        """Get a new access token now, rather than when a request needs one."""
+        await self._access_token(rejected=self._token)
+
+    async def api(self, path: str, params: Mapping[str, str] | None = None) -> Response:
+        """GET an endpoint of reddit's API, with an access token.
+
+        Redirects aren't followed; reddit uses them to say things don't exist.
+        """
+        params = dict(params or {}, raw_json='1')  # unescaped text, like PRAW
+        url = self.oauth_url + path
+        token = None
+        for _ in range(2):
+            # concurrent requests refused the same token only renew it once
+            token = await self._access_token(rejected=token)
+            response = await self._send(
+                'GET', url, params=params,
+                headers={'Authorization': 'bearer ' + token})
+            if response.status != 401:
+                break
+        return response
+
+    async def head(self, url: str) -> str:
+        """Get where ``url`` redirects to; empty if it doesn't, or can't be reached."""
+        try:
+            response = await self._send(
+                'HEAD', url, timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=4))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return ''
+        return response.headers.get('Location', '')
+
+    # Batched /api/info lookups
+
+    async def info(self, fullname: str) -> dict | None:
+        """Get a post or comment's data by fullname, or ``None`` if it doesn't exist.
+
+        Lookups made within ``batch_window`` of each other share a request.
+        """
+        if not self.batch_window:
+            return (await self._fetch_info([fullname])).get(fullname)
+
+        future = self._pending.get(fullname)
+        if future is None:
+            future = self._pending[fullname] = self.loop.create_future()
+            if len(self._pending) >= MAX_BATCH:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = self.loop.call_later(self.batch_window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: dict[str, asyncio.Future]):
+        try:
+            items = await self._fetch_info(list(batch))
+        except BaseException as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            return
+
+        for fullname, future in batch.items():
+            if not future.done():
+                future.set_result(items.get(fullname))
+
+    async def _fetch_info(self, fullnames: list[str]) -> dict[str, dict]:
+        response = await self.api('/api/info', {'id': ','.join(fullnames)})
+        if response.status != 200 or not response.data:
+            raise ResponseError('GET', '/api/info', response.status)
+        return {
+            child['data']['name']: child['data']
+            for child in response.data['data']['children']
+        }
@@ -0,0 +1,100 @@
+"""Request batching for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future
+import threading
+from typing import Any, Callable, Iterable
+
+
+class InfoBatcher:
+    """Group fullname lookups from many threads into shared requests.
+
+    :param fetch: function taking a list of fullnames (``t1_…``, ``t3_…``)
+                  and returning the items reddit knows about; each item must
+                  have a ``fullname`` attribute
+    :param window: how long (in seconds) to wait for other lookups before
+                   sending a batch
+    :param max_batch: most fullnames to send at once (at most
+                      :attr:`MAX_BATCH`)
+
+    The first thread to ask for a fullname when nothing is pending waits for
+    ``window`` seconds, then sends every fullname requested in the meantime
+    as one request and hands each waiting thread its own result. A batch is
+    sent early, by the thread that fills it, once it holds ``max_batch``
+    fullnames.
+
+    Every lookup blocks its thread until its batch is back, so a batch can't
+    hold more lookups than there are threads making them: ``max_batch``
+    should be no more than that, or full batches wait out the window.
+    """
+    MAX_BATCH = 100
+    """Maximum number of fullnames reddit's info endpoint accepts at once."""
+
+    def __init__(
+        self,
+        fetch: Callable[[list[str]], Iterable[Any]],
+        window: float,
+        max_batch: int = MAX_BATCH,
+    ):
+        self._fetch = fetch
+        self._window = window
+        self.max_batch = max(1, min(max_batch, self.MAX_BATCH))
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        self._taken = threading.Event()  # the pending batch was sent
+
+    def get(self, fullname: str) -> Any:
+        """Get the item for ``fullname``, or ``None`` if reddit has none.
+
+        Exceptions raised by the ``fetch`` function are raised here too, in
+        every thread that was waiting on the failed batch.
+        """
+        taken = None
+        batch = None
+        with self._lock:
+            future = self._pending.get(fullname)
+            if future is None:
+                if not self._pending:
+                    # first of a new batch: this thread sends it
+                    taken = self._taken = threading.Event()
+                future = self._pending[fullname] = Future()
+                if len(self._pending) >= self.max_batch:
+                    batch = self._take()
+
+        if batch:
+            self._run(batch)
+        elif taken is not None and not taken.wait(self._window):
+            with self._lock:
+                if not taken.is_set():
+                    batch = self._take()
+            self._run(batch)
+
+        return future.result()
+
+    def _take(self) -> dict[str, Future]:
+        self._taken.set()
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _run(self, batch: dict[str, Future] | None):
+        if not batch:
+            # flushed early because it was full
+            return
+
+        try:
+            for item in self._fetch(list(batch)):
+                future = batch.pop(item.fullname, None)
+                if future is not None:
+                    future.set_result(item)
+        except Exception as exc:
+            for future in batch.values():
+                future.set_exception(exc)
+            return
+
+        for future in batch.values():
+            future.set_result(None)
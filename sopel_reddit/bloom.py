@@ -0,0 +1,158 @@
+"""Known-subreddit index for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+A Bloom filter answers "is this a subreddit?" with either "no" (for sure) or
+"probably", in about 10 bits per name. Loaded from a dump of all subreddit
+names, it lets the plugin ignore ``r/whatever`` mentions that can't exist
+without asking reddit.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+import struct
+import threading
+from typing import Iterable, TextIO
+
+
+HEADER = struct.Struct('<4sBBxxQQQ')
+"""Magic, version, flags, bit count, hash count, names added."""
+MAGIC = b'SRBF'
+VERSION = 1
+COMPLETE = 0x01
+"""Flag: the filter was built from a full dump of subreddit names."""
+
+DUMP_NAME = re.compile(r'^\s*(?:/?r/)?(?P<name>[A-Za-z0-9_]{2,21})\b')
+
+
+class BloomFilter:
+    """Set of names that can only tell for sure that a name *isn't* in it.
+
+    :param bits: size of the filter, in bits
+    :param hashes: number of bits set per name
+    :param complete: whether every existing name was added; only a complete
+                     filter can rule names out
+
+    Names are compared case-insensitively. Use :meth:`for_capacity` to size
+    a filter for a given number of names.
+    """
+    def __init__(self, bits: int, hashes: int, complete: bool = False):
+        self.bits = max(bits, 8)
+        self.hashes = max(hashes, 1)
+        self.complete = complete
+        self.count = 0
+        self.dirty = False
+        self._data = bytearray((self.bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_capacity(
+        cls,
+        capacity: int,
+        error_rate: float = 0.01,
+        complete: bool = False,
+    ) -> BloomFilter:
+        """Make a filter that holds ``capacity`` names at ``error_rate``."""
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = round(bits / capacity * math.log(2))
+        return cls(bits, hashes, complete)
+
+    def _positions(self, name: str) -> list[int]:
+        digest = hashlib.blake2b(name.lower().encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, name: str) -> bool:
+        data = self._data
+        return all(data[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(name))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, name: str) -> bool:
+        """Add ``name``; returns ``False`` if it (probably) was there already."""
+        positions = self._positions(name)
+        with self._lock:
+            new = False
+            for pos in positions:
+                byte, bit = pos >> 3, 1 << (pos & 7)
+                if not self._data[byte] & bit:
+                    self._data[byte] |= bit
+                    new = True
+            if new:
+                self.count += 1
+                self.dirty = True
+        return new
+
+    def update(self, names: Iterable[str]):
+        for name in names:
+            self.add(name)
+
+    def rules_out(self, name: str) -> bool:
+        """Tell if ``name`` is definitely not a known name."""
+        return self.complete and name not in self
+
+    def save(self, filename: str):
+        """Write the filter to ``filename``, replacing it atomically."""
+        with self._lock:
+            header = HEADER.pack(
+                MAGIC, VERSION, COMPLETE if self.complete else 0,
+                self.bits, self.hashes, self.count)
+            data = bytes(self._data)
+            self.dirty = False
+        tmp = filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            f.write(data)
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename: str) -> BloomFilter | None:
+        """Read a filter saved by :meth:`save`; ``None`` if there is none."""
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+            magic, version, flags, bits, hashes, count = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('{} is not a subreddit index'.format(filename))
+            bloom = cls(bits, hashes, bool(flags & COMPLETE))
+            data = f.read()
+        if len(data) != len(bloom._data):
+            raise ValueError('{} is truncated'.format(filename))
+        bloom._data[:] = data
+        bloom.count = count
+        return bloom
+
+
+def dump_names(lines: TextIO) -> Iterable[str]:
+    """Get the subreddit names in a dump, one name (or CSV row) per line.
+
+    Lines may start with ``r/``; anything after the name is ignored, and so
+    are lines that don't start with a valid name.
+    """
+    for line in lines:
+        match = DUMP_NAME.match(line)
+        if match:
+            yield match.group('name')
+
+
+def build_from_dump(filename: str, capacity: int = 0) -> BloomFilter:
+    """Build a complete filter of the subreddit names listed in ``filename``.
+
+    The filter is sized for the dump or for ``capacity`` names, whichever is
+    more, so there's room for subreddits created later.
+    """
+    with open(filename, encoding='utf-8', errors='replace') as f:
+        total = sum(1 for _ in dump_names(f))
+    bloom = BloomFilter.for_capacity(max(total, capacity), complete=True)
+    with open(filename, encoding='utf-8', errors='replace') as f:
+        bloom.update(dump_names(f))
+    return bloom
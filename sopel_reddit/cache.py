@@ -0,0 +1,117 @@
+"""Caching helpers for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Hashable, NamedTuple
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire after a time-to-live.
+
+    :param maxsize: maximum number of entries to keep; least recently used
+                    entries are evicted first
+    :param ttl: default lifetime of an entry, in seconds; a TTL of ``0``
+                (or less) disables storage entirely
+    :param timer: clock function, mostly useful for tests
+    """
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > self._timer()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get the value cached for ``key``, or ``default`` if there is none.
+
+        A successful lookup marks the entry as recently used.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires, value = item
+            if expires <= self._timer():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """Store ``value`` under ``key`` for ``ttl`` seconds.
+
+        If ``ttl`` is not given, the cache's default TTL is used.
+        """
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: Hashable, value: Any, ttl: float | None = None) -> bool:
+        """Store ``value`` under ``key``, unless a live entry is already there.
+
+        Returns ``False`` if there was one; checking and storing is atomic.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > self._timer():
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key: Hashable, value: Any, ttl: float | None):
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+
+        self._data[key] = (self._timer() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            return default
+        return item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, len(self._data), self.maxsize)
@@ -0,0 +1,32 @@
+"""Deferred imports for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule:
+    """Stand-in for a module that's only imported when first used.
+
+    Attribute lookups import the real module, so code can refer to e.g.
+    ``prawcore.exceptions.NotFound`` in an ``except`` clause without paying
+    for the import until that clause is actually evaluated.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module: ModuleType | None = None
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self._name)
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            # the import system's own locks make this safe across threads
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
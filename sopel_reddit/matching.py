@@ -0,0 +1,122 @@
+"""Shared pattern matching for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+Sopel runs every URL and find rule against every line it sees, but only a
+tiny fraction of chat mentions reddit at all. A :class:`Matcher` answers
+"can any of the plugin's patterns match this text?" once per text, with a
+substring check and then a single combined regex, so the individual
+patterns only ever run on text that can actually match.
+"""
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator
+
+
+# named groups may repeat across patterns, which isn't allowed in one regex
+NAMED_GROUP = re.compile(r'\(\?P<\w+>')
+
+# flags that can be scoped to one alternative of the combined regex
+SCOPED_FLAGS = (
+    (re.IGNORECASE, 'i'),
+    (re.MULTILINE, 'm'),
+    (re.DOTALL, 's'),
+    (re.VERBOSE, 'x'),
+)
+
+
+def scoped(pattern: str, flags: int) -> str:
+    """Wrap ``pattern`` in a group that applies its ``flags`` to it alone."""
+    letters = ''.join(letter for flag, letter in SCOPED_FLAGS if flags & flag)
+    if flags & ~sum(flag for flag, _ in SCOPED_FLAGS):
+        raise ValueError('Flags {!r} cannot be scoped to a pattern'.format(flags))
+    return '(?%s:%s)' % (letters, pattern) if letters else '(?:%s)' % pattern
+
+
+class Matcher:
+    """Combined matcher for a set of named patterns.
+
+    :param patterns: mapping of names to regular expressions
+    :param prefilter: substrings, at least one of which appears in any text
+                      one of the ``patterns`` can match; they are looked for
+                      case-insensitively
+    :param flags: mapping of names to the flags to compile those patterns with
+                  (e.g. ``re.IGNORECASE``); others are compiled without any
+    """
+    def __init__(
+        self,
+        patterns: dict[str, str],
+        prefilter: Iterable[str],
+        flags: dict[str, int] | None = None,
+    ):
+        flags = flags or {}
+        self.patterns = {
+            name: re.compile(pattern, flags.get(name, 0))
+            for name, pattern in patterns.items()
+        }
+        self.prefilter = tuple(needle.lower() for needle in prefilter)
+        self.combined = re.compile('|'.join(
+            scoped(NAMED_GROUP.sub('(?:', pattern), flags.get(name, 0))
+            for name, pattern in patterns.items()
+        ))
+        # (text, result) of the last check; every rule asks about the same
+        # text in turn, and assigning a tuple is atomic
+        self._last: tuple[str | None, bool] = (None, False)
+
+    def may_match(self, text: str) -> bool:
+        """Tell if any of the patterns could match somewhere in ``text``.
+
+        ``False`` is definitive; ``True`` means the individual patterns need
+        to be checked.
+        """
+        last_text, result = self._last
+        if text == last_text:
+            return result
+
+        lowered = text.lower()
+        result = (
+            any(needle in lowered for needle in self.prefilter)
+            and self.combined.search(text) is not None
+        )
+        self._last = (text, result)
+        return result
+
+    def view(self, name: str) -> PatternView:
+        """Get a stand-in for pattern ``name`` to register with Sopel."""
+        return PatternView(self, name)
+
+
+class PatternView:
+    """Compiled-pattern lookalike that consults a :class:`Matcher` first.
+
+    Matches are produced by the original pattern, so they have exactly the
+    same groups.
+    """
+    def __init__(self, matcher: Matcher, name: str):
+        self._matcher = matcher
+        self._regex = matcher.patterns[name]
+        self.name = name
+        self.pattern = self._regex.pattern
+        self.flags = self._regex.flags
+        self.groupindex = self._regex.groupindex
+
+    def __repr__(self):
+        return '<%s %s %r>' % (self.__class__.__name__, self.name, self.pattern)
+
+    def search(self, text: str, *args) -> re.Match | None:
+        if not self._matcher.may_match(text):
+            return None
+        return self._regex.search(text, *args)
+
+    def match(self, text: str, *args) -> re.Match | None:
+        if not self._matcher.may_match(text):
+            return None
+        return self._regex.match(text, *args)
+
+    def finditer(self, text: str, *args) -> Iterator[re.Match]:
+        if not self._matcher.may_match(text):
+            return iter(())
+        return self._regex.finditer(text, *args)
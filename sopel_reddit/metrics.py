@@ -0,0 +1,243 @@
+"""Instrumentation for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+import re
+import threading
+import time
+from typing import Iterable, Iterator, Mapping
+from urllib.parse import urlparse
+
+from .cache import CacheStats
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Upper bounds (in seconds) of the latency histogram buckets."""
+
+ENDPOINTS = (
+    (re.compile(r'/api/info/?$'), 'info'),
+    (re.compile(r'/api/v1/access_token/?$'), 'access_token'),
+    (re.compile(r'/r/[^/]+/search/?$'), 'search'),
+    (re.compile(r'/r/[^/]+/about/?$'), 'subreddit_about'),
+    (re.compile(r'/user/[^/]+/about/?$'), 'user_about'),
+    (re.compile(r'/r/[^/]+/s/[^/]+/?$'), 'share'),
+    (re.compile(r'/r/[^/]+/new/?$'), 'new'),
+    (re.compile(r'^(?:/r/[^/]+)?/comments/'), 'comments'),
+    (re.compile(r'^/video/'), 'video'),
+)
+
+
+def endpoint_name(url: str) -> str:
+    """Reduce a reddit URL to a low-cardinality endpoint name."""
+    path = urlparse(url).path
+    for pattern, name in ENDPOINTS:
+        if pattern.search(path):
+            return name
+    return 'other'
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate quantile ``q`` as the upper bound of its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Thread-safe collection of the plugin's counters and histograms."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: dict[str, Histogram] = {}
+        self.errors: Counter[str] = Counter()
+        self.not_found: Counter[str] = Counter()
+        self.requests: Counter[tuple[str, str]] = Counter()
+        self.responses: Counter[tuple[str, int]] = Counter()
+        self.ratelimit_remaining: float | None = None
+        self.ratelimit_wait = Histogram()  # for a shared rate limit
+
+    def observe(self, handler: str, seconds: float, failed: bool = False):
+        with self._lock:
+            if handler not in self.latency:
+                self.latency[handler] = Histogram()
+            self.latency[handler].observe(seconds)
+            if failed:
+                self.errors[handler] += 1
+
+    @contextmanager
+    def timing(self, handler: str) -> Iterator[None]:
+        """Time the ``with`` block as a run of ``handler``."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.observe(handler, time.perf_counter() - start, failed)
+
+    def observe_wait(self, seconds: float):
+        """Record how long a request waited for the shared rate limit."""
+        with self._lock:
+            self.ratelimit_wait.observe(seconds)
+
+    def count_not_found(self, kind: str):
+        with self._lock:
+            self.not_found[kind] += 1
+
+    def count_response(self, method: str, url: str, status: int, headers: Mapping):
+        endpoint = endpoint_name(url)
+        with self._lock:
+            self.requests[(method, endpoint)] += 1
+            self.responses[(endpoint, status)] += 1
+            remaining = headers.get('x-ratelimit-remaining')
+            if remaining is not None:
+                self.ratelimit_remaining = float(remaining)
+
+    def response_hook(self, response, *args, **kwargs):
+        """Hook for a ``requests.Session`` that counts every response."""
+        self.count_response(
+            response.request.method,
+            response.url,
+            response.status_code,
+            response.headers,
+        )
+
+    def summary(self, caches: Mapping[str, CacheStats]) -> list[str]:
+        """Describe the metrics in a few short lines, for chat."""
+        with self._lock:
+            handlers = ', '.join(
+                '{} {}× p50 {:g}s p99 {:g}s{}'.format(
+                    name, hist.count, hist.quantile(0.5), hist.quantile(0.99),
+                    ' ({} errors)'.format(self.errors[name])
+                    if self.errors[name] else '')
+                for name, hist in sorted(self.latency.items())
+            )
+            requests = ', '.join(
+                '{} {}: {}'.format(method, endpoint, count)
+                for (method, endpoint), count in sorted(self.requests.items())
+            )
+            not_found = ', '.join(
+                '{}: {}'.format(kind, count)
+                for kind, count in sorted(self.not_found.items())
+            )
+            remaining = self.ratelimit_remaining
+            wait = self.ratelimit_wait
+            waits = (
+                ' | Shared limit waits: p50 {:g}s p99 {:g}s ({:.1f}s total)'.format(
+                    wait.quantile(0.5), wait.quantile(0.99), wait.sum)
+                if wait.count else '')
+
+        cache_info = ', '.join(
+            '{} {}/{} ({:.0%} hits)'.format(
+                name, stats.size, stats.maxsize,
+                stats.hits / ((stats.hits + stats.misses) or 1))
+            for name, stats in sorted(caches.items())
+        )
+
+        return [
+            'Handlers: ' + (handlers or 'none run yet'),
+            'API requests: ' + (requests or 'none yet') +
+            ' | Rate limit remaining: ' +
+            ('unknown' if remaining is None else '{:g}'.format(remaining)) +
+            waits,
+            'Not found: ' + (not_found or 'none'),
+            'Caches: ' + (cache_info or 'none'),
+        ]
+
+    def prometheus(self, caches: Mapping[str, CacheStats]) -> str:
+        """Render the metrics in Prometheus' text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+        def sample(name, labels, value):
+            if labels:
+                name += '{' + ','.join(
+                    '{}="{}"'.format(key, val) for key, val in labels) + '}'
+            lines.append('{} {:g}'.format(name, value))
+
+        def histogram(name, labels, hist):
+            cumulative = 0
+            for bound, count in zip(hist.buckets + (float('inf'),), hist.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else '{:g}'.format(bound)
+                sample(name + '_bucket', labels + (('le', le),), cumulative)
+            sample(name + '_sum', labels, hist.sum)
+            sample(name + '_count', labels, hist.count)
+
+        with self._lock:
+            family('sopel_reddit_handler_seconds', 'histogram', 'Handler latency.')
+            for handler, hist in sorted(self.latency.items()):
+                histogram('sopel_reddit_handler_seconds', (('handler', handler),), hist)
+
+            family('sopel_reddit_handler_errors_total', 'counter',
+                   'Handler invocations that raised an exception.')
+            for handler, count in sorted(self.errors.items()):
+                sample('sopel_reddit_handler_errors_total',
+                       (('handler', handler),), count)
+
+            family('sopel_reddit_not_found_total', 'counter',
+                   'Lookups of things reddit does not have.')
+            for kind, count in sorted(self.not_found.items()):
+                sample('sopel_reddit_not_found_total', (('kind', kind),), count)
+
+            family('sopel_reddit_requests_total', 'counter',
+                   'HTTP requests made to reddit.')
+            for (method, endpoint), count in sorted(self.requests.items()):
+                sample('sopel_reddit_requests_total',
+                       (('method', method), ('endpoint', endpoint)), count)
+
+            family('sopel_reddit_responses_total', 'counter',
+                   'HTTP responses from reddit, by status code.')
+            for (endpoint, status), count in sorted(self.responses.items()):
+                sample('sopel_reddit_responses_total',
+                       (('endpoint', endpoint), ('status', status)), count)
+
+            if self.ratelimit_remaining is not None:
+                family('sopel_reddit_ratelimit_remaining', 'gauge',
+                       'Requests left in the current rate limit window.')
+                sample('sopel_reddit_ratelimit_remaining', (),
+                       self.ratelimit_remaining)
+
+            if self.ratelimit_wait.count:
+                family('sopel_reddit_ratelimit_wait_seconds', 'histogram',
+                       'Time requests waited for the shared rate limit.')
+                histogram('sopel_reddit_ratelimit_wait_seconds', (),
+                          self.ratelimit_wait)
+
+        for name, attr, kind, help_text in (
+            ('sopel_reddit_cache_hits_total', 'hits', 'counter', 'Cache hits.'),
+            ('sopel_reddit_cache_misses_total', 'misses', 'counter', 'Cache misses.'),
+            ('sopel_reddit_cache_entries', 'size', 'gauge', 'Entries currently cached.'),
+        ):
+            family(name, kind, help_text)
+            for cache, stats in sorted(caches.items()):
+                sample(name, (('cache', cache),), getattr(stats, attr))
+
+        return '\n'.join(lines) + '\n'
@@ -10,26 +10,74 @@ https://sopel.chat
 from __future__ import annotations
 
 import datetime as dt
+import functools
 import html
+import os
 import re
+import threading
 from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
 
-import praw  # type: ignore[import]
-import prawcore  # type: ignore[import]
-import requests
+import pytz
 
 from sopel import plugin
 from sopel.config import types
 from sopel.formatting import bold, color, colors
-from sopel.tools import time
+from sopel.tools import events, get_logger, time
 from sopel.tools.web import USER_AGENT
 
+from .batch import InfoBatcher
+from .bloom import BloomFilter, build_from_dump
+from .cache import TTLCache
+from .lazy import LazyModule
+from .matching import Matcher
+from .metrics import Metrics
+from .profiling import Profiler, top as profile_top
+from .snapshots import (
+    BANNED,
+    CommentInfo,
+    Missing,
+    NOT_FOUND,
+    PostInfo,
+    PRIVATE,
+    RedditorInfo,
+    SubredditInfo,
+    image_ids,
+    image_ids_from_data,
+)
+from .snapshots import dump as dump_snapshot, load as load_snapshot
+from .ratelimit import RateBudget, SharedBucket, throttle
+from .store import IdIndex, IMAGE, SHARE, SnapshotStore, TokenStore, VIDEO, WatchStore
+from .tokens import (
+    authorizer_expires,
+    keep_tokens,
+    praw_authorizer,
+    renewal_due,
+    token_key,
+)
+from .watch import PAGE_SIZE, Watcher
+from .workers import EXPLICIT, PASSIVE, SingleFlight, WorkerPool
+
 if TYPE_CHECKING:
     from sopel import SopelWrapper
     from sopel.triggers import Trigger
 
 
+LOGGER = get_logger('reddit')
 PLUGIN_OUTPUT_PREFIX = '[reddit] '
+SHUTDOWN_TIMEOUT = 10
+"""Seconds to wait at shutdown for running lookups to finish."""
+TIME_SETTINGS_SETTLE = 2
+"""Seconds to give Sopel to save a changed timezone or time format."""
+
+# PRAW (with prawcore and requests) takes longer to import than the rest of
+# the bot put together; wait until a reddit lookup actually needs it
+praw = LazyModule('praw')
+# only needed (and only installed) for the optional asyncio backend
+aio = LazyModule('sopel_reddit.aio')
+prawcore = LazyModule('prawcore')
+requests = LazyModule('requests')
+CLIENT_LOCK = threading.Lock()
 
 domain = r'https?://(?:www\.|old\.|new\.|beta\.|pay\.|ssl\.|[a-z]{2}\.)?reddit\.com'
 subreddit_url = r'%s/r/([\w-]+)/?$' % domain
@@ -38,12 +86,48 @@ post_or_comment_url = (
     r'(?:/r/\S+?)?/comments/(?P<submission>[\w-]+)'
     r'(?:/?(?:[\w%]+/(?P<comment>[\w-]+))?)'
 )
-share_url = r'https?://(?:www\.)?reddit\.com/r/\S+?/s/\w+'
+share_url = r'https?://(?:www\.)?reddit\.com/r/\S+?/s/(?P<share>\w+)'
 short_post_url = r'https?://(redd\.it|reddit\.com)/(?P<submission>[\w-]+)/?$'
 user_url = r'%s/u(?:ser)?/([\w-]+)' % domain
 image_url = r'https?://(?P<subdomain>i|preview)\.redd\.it/(?:[\w%]+-)*(?P<image>[^-?\s]+)'
 video_url = r'https?://v\.redd\.it/([\w-]+)'
 gallery_url = r'https?://(?:www\.)?reddit\.com/gallery/([\w-]+)'
+slash_mention = r'(?<!\S)/?(?P<prefix>r|u)/(?P<id>[a-zA-Z0-9-_]+)\b'
+
+# Every rule consults this first, so lines that can't mention reddit at all
+# are rejected with a couple of substring checks
+MATCHER = Matcher(
+    {
+        'subreddit_url': subreddit_url,
+        'post_or_comment_url': post_or_comment_url,
+        'share_url': share_url,
+        'short_post_url': short_post_url,
+        'user_url': user_url,
+        'image_url': image_url,
+        'video_url': video_url,
+        'gallery_url': gallery_url,
+        'slash_mention': slash_mention,
+    },
+    prefilter=('redd', 'r/', 'u/'),
+    # like Sopel compiles find rules' patterns
+    flags={'slash_mention': re.IGNORECASE},
+)
+
+
+def patterns(*names):
+    """Make a lazy loader for MATCHER's stand-ins for the named patterns."""
+    def loader(settings):
+        return [MATCHER.view(name) for name in names]
+    return loader
+
+
+# kind of snapshot in the cache_db -> in-memory cache
+SNAPSHOT_CACHES = {
+    'post': 'reddit_post_cache',
+    'comment': 'reddit_comment_cache',
+    'subreddit': 'reddit_subreddit_cache',
+    'redditor': 'reddit_redditor_cache',
+}
 
 
 class RedditSection(types.StaticSection):
@@ -53,19 +137,279 @@ class RedditSection(types.StaticSection):
     app_id = types.ValidatedAttribute('app_id', default='6EiphT6SSQq7FQ')
     """Optional custom app ID for the reddit API."""
 
+    cache_ttl = types.ValidatedAttribute('cache_ttl', parse=int, default=300)
+    """How long (in seconds) to remember post and comment metadata."""
+
+    cache_max_entries = types.ValidatedAttribute(
+        'cache_max_entries', parse=int, default=1000)
+    """Maximum number of entries in each in-memory cache.
+
+    That is, of posts, comments, subreddits and users to remember (and
+    likewise of image and video misses, time settings and channel flags).
+    """
+
+    lookup_ttl = types.ValidatedAttribute('lookup_ttl', parse=int, default=600)
+    """How long (in seconds) to remember subreddit and user details."""
+
+    negative_ttl = types.ValidatedAttribute(
+        'negative_ttl', parse=int, default=3600)
+    """How long (in seconds) to remember that a subreddit or user is unavailable."""
+
+    batch_window = types.ValidatedAttribute('batch_window', parse=int, default=10)
+    """How long (in milliseconds) to collect post/comment lookups into one request.
+
+    Without the asyncio backend, each lookup holds a worker while it waits,
+    so a batch holds at most ``workers`` lookups, and is sent as soon as it
+    has that many. Set to 0 to look up every post and comment separately.
+    """
+
+    index_db = types.FilenameAttribute('index_db', default='reddit-index.db')
+    """File where the mapping from hosted images/videos and share links to posts is kept.
+
+    Subreddit watches, and the posts already announced, are kept there too, as
+    is the API access token, so it can be reused after a restart.
+
+    Relative paths are relative to Sopel's home directory.
+    """
+
+    index_ttl = types.ValidatedAttribute('index_ttl', parse=int, default=0)
+    """How long (in seconds) to keep image, video and share link mappings. 0 keeps them forever."""
+
+    index_max_entries = types.ValidatedAttribute(
+        'index_max_entries', parse=int, default=100000)
+    """Maximum number of image, video and share link mappings to keep, of each kind."""
+
+    cache_db = types.FilenameAttribute('cache_db')
+    """Optional file to keep cached post, comment, subreddit and user details in.
+
+    Entries expire as they would in memory, but survive restarts: the bot
+    loads them at startup instead of asking reddit again.
+
+    Relative paths are relative to Sopel's home directory.
+    """
+
+    cache_db_max_entries = types.ValidatedAttribute(
+        'cache_db_max_entries', parse=int, default=50000)
+    """Maximum number of entries of each kind to keep in ``cache_db``."""
+
+    subreddit_index = types.FilenameAttribute('subreddit_index')
+    """Optional file to keep an index of known subreddit names in.
+
+    Once it's been filled from a list of all subreddits (see the
+    ``.redditimportsubs`` command), r/name mentions of subreddits that aren't
+    in it are ignored without asking reddit. Subreddits the bot comes across
+    later are added to it.
+
+    Relative paths are relative to Sopel's home directory.
+    """
+
+    subreddit_index_capacity = types.ValidatedAttribute(
+        'subreddit_index_capacity', parse=int, default=4000000)
+    """How many subreddit names to size the index for; it takes about 10 bits per name."""
+
+    search_limit = types.ValidatedAttribute('search_limit', parse=int, default=25)
+    """Maximum number of search results to scan for an image or video's post."""
+
+    workers = types.ValidatedAttribute('workers', parse=int, default=4)
+    """Number of threads making reddit API requests."""
+
+    max_queue = types.ValidatedAttribute('max_queue', parse=int, default=64)
+    """How many lookups may wait for a free worker before new ones are dropped."""
+
+    time_settings_ttl = types.ValidatedAttribute(
+        'time_settings_ttl', parse=int, default=300)
+    """How long (in seconds) to remember users' and channels' time settings.
+
+    Also how long channels' ``sfw`` and ``spoiler_free`` flags are remembered.
+    Changes made with Sopel's own timezone/time format commands apply within a
+    couple of seconds.
+    """
+
+    passive_reserve = types.ValidatedAttribute(
+        'passive_reserve', parse=int, default=10)
+    """API requests to keep for commands; link and mention expansions stop below this."""
+
+    shared_ratelimit_file = types.FilenameAttribute('shared_ratelimit_file')
+    """Optional file through which bots on this host share one rate limit.
+
+    Every bot pointed at the same file waits its turn before each request to
+    reddit, so together they stay within ``shared_ratelimit``.
+
+    Relative paths are relative to Sopel's home directory.
+    """
+
+    shared_ratelimit = types.ValidatedAttribute(
+        'shared_ratelimit', parse=int, default=100)
+    """Requests per minute allowed across all bots sharing ``shared_ratelimit_file``."""
+
+    shared_ratelimit_burst = types.ValidatedAttribute(
+        'shared_ratelimit_burst', parse=int, default=10)
+    """Requests that may be made back to back when the shared limit has been idle."""
+
+    async_backend = types.BooleanAttribute('async_backend', False)
+    """Look up posts, comments, subreddits, users and videos on an asyncio event loop.
+
+    Lookups then wait on reddit without holding a worker thread each, so
+    many more can be in progress at once. Needs ``aiohttp`` installed
+    (``pip install sopel-reddit[async]``).
+    """
+
+    async_connections = types.ValidatedAttribute(
+        'async_connections', parse=int, default=20)
+    """Most connections to reddit the asyncio backend keeps open at once."""
+
+    metrics_file = types.FilenameAttribute('metrics_file')
+    """Optional file to write Prometheus-format metrics to, every minute.
+
+    Relative paths are relative to Sopel's home directory.
+    """
+
+    oauth_url = types.ValidatedAttribute(
+        'oauth_url', default='https://oauth.reddit.com')
+    """Base URL of reddit's API; only useful to test against a stand-in server."""
+
+    reddit_url = types.ValidatedAttribute(
+        'reddit_url', default='https://www.reddit.com')
+    """Base URL of reddit's website; only useful to test against a stand-in server."""
+
+    repeat_window = types.ValidatedAttribute('repeat_window', parse=int, default=60)
+    """How long (in seconds) to ignore links and mentions already expanded in a channel.
+
+    Explicit commands are always answered. 0 disables.
+    """
+
+    repeat_max_entries = types.ValidatedAttribute(
+        'repeat_max_entries', parse=int, default=5000)
+    """Maximum number of recent expansions to remember, across all channels."""
+
+    watch_min_interval = types.ValidatedAttribute(
+        'watch_min_interval', parse=int, default=60)
+    """Shortest time (in seconds) between two checks of a watched subreddit."""
+
+    watch_max_interval = types.ValidatedAttribute(
+        'watch_max_interval', parse=int, default=900)
+    """Longest time (in seconds) between two checks of a watched subreddit."""
+
+    watch_group_size = types.ValidatedAttribute(
+        'watch_group_size', parse=int, default=25)
+    """How many watched subreddits to check with a single request."""
+
+    watch_seen_size = types.ValidatedAttribute(
+        'watch_seen_size', parse=int, default=10000)
+    """How many already-announced posts to remember, so they aren't repeated."""
+
 
 def setup(bot):
     bot.config.define_section('reddit', RedditSection)
 
-    if 'reddit_praw' not in bot.memory:
-        # Create a PRAW instance just once, at load time
-        bot.memory['reddit_praw'] = praw.Reddit(
-            user_agent=USER_AGENT,
-            client_id=bot.settings.reddit.app_id,
-            client_secret=None,
-            check_for_updates=False,
+    if 'reddit_metrics' not in bot.memory:
+        bot.memory['reddit_metrics'] = Metrics()
+
+    if 'reddit_batcher' not in bot.memory and bot.settings.reddit.batch_window > 0:
+        bot.memory['reddit_batcher'] = InfoBatcher(
+            lambda fullnames: get_reddit(bot).info(fullnames=fullnames),
+            bot.settings.reddit.batch_window / 1000,
+            # more lookups than workers can't be waiting at once
+            max_batch=bot.settings.reddit.workers,
         )
 
+    if 'reddit_shared_bucket' not in bot.memory and bot.settings.reddit.shared_ratelimit_file:
+        try:
+            bot.memory['reddit_shared_bucket'] = SharedBucket(
+                bot.settings.reddit.shared_ratelimit_file,
+                bot.settings.reddit.shared_ratelimit / 60,
+                bot.settings.reddit.shared_ratelimit_burst,
+            )
+        except RuntimeError as exc:
+            LOGGER.warning('Not sharing the rate limit: %s', exc)
+
+    if 'reddit_budget' not in bot.memory:
+        bot.memory['reddit_budget'] = RateBudget(
+            lambda: bot.memory.get('reddit_praw'),
+            bot.settings.reddit.passive_reserve,
+            bucket=bot.memory.get('reddit_shared_bucket'),
+            get_backend=lambda: bot.memory.get('reddit_async'),
+        )
+
+    if 'reddit_workers' not in bot.memory:
+        bot.memory['reddit_workers'] = WorkerPool(
+            bot.settings.reddit.workers,
+            bot.settings.reddit.max_queue,
+            bot.memory['reddit_budget'].allows_passive,
+        )
+    if 'reddit_flights' not in bot.memory:
+        bot.memory['reddit_flights'] = SingleFlight()
+
+    if 'reddit_tokens' not in bot.memory:
+        bot.memory['reddit_tokens'] = TokenStore(bot.settings.reddit.index_db)
+
+    if 'reddit_async' not in bot.memory and bot.settings.reddit.async_backend:
+        key = token_key(bot.settings.reddit.app_id, bot.settings.reddit.oauth_url)
+        saved = bot.memory['reddit_tokens'].get(key)
+        try:
+            bot.memory['reddit_async'] = aio.AsyncBackend(
+                USER_AGENT,
+                bot.settings.reddit.app_id,
+                bot.settings.reddit.oauth_url,
+                bot.settings.reddit.reddit_url,
+                connections=bot.settings.reddit.async_connections,
+                batch_window=bot.settings.reddit.batch_window / 1000,
+                on_response=bot.memory['reddit_metrics'].count_response,
+                bucket=bot.memory.get('reddit_shared_bucket'),
+                on_wait=bot.memory['reddit_metrics'].observe_wait,
+                token=saved[:2] if saved else None,
+                on_token=functools.partial(bot.memory['reddit_tokens'].set, key),
+            )
+        except ImportError as exc:
+            LOGGER.warning('Not using the asyncio backend: %s', exc)
+
+    if 'reddit_index' not in bot.memory:
+        bot.memory['reddit_index'] = IdIndex(bot.settings.reddit.index_db)
+
+    if 'reddit_subreddit_index' not in bot.memory and bot.settings.reddit.subreddit_index:
+        try:
+            index = BloomFilter.load(bot.settings.reddit.subreddit_index)
+        except (OSError, ValueError) as exc:
+            LOGGER.warning('Not using the subreddit index: %s', exc)
+        else:
+            # nothing to use until a list of subreddits is imported
+            if index is not None:
+                bot.memory['reddit_subreddit_index'] = index
+
+    if 'reddit_watcher' not in bot.memory:
+        bot.memory['reddit_watcher'] = Watcher(
+            WatchStore(bot.settings.reddit.index_db, bot.settings.reddit.watch_seen_size),
+            bot.settings.reddit.watch_group_size,
+            bot.settings.reddit.watch_min_interval,
+            bot.settings.reddit.watch_max_interval,
+        )
+
+    caches = {
+        'reddit_post_cache': bot.settings.reddit.cache_ttl,
+        'reddit_comment_cache': bot.settings.reddit.cache_ttl,
+        'reddit_subreddit_cache': bot.settings.reddit.lookup_ttl,
+        'reddit_redditor_cache': bot.settings.reddit.lookup_ttl,
+        'reddit_image_misses': bot.settings.reddit.negative_ttl,
+        'reddit_video_misses': bot.settings.reddit.negative_ttl,
+        'reddit_time_settings': bot.settings.reddit.time_settings_ttl,
+        'reddit_channel_flags': bot.settings.reddit.time_settings_ttl,
+    }
+    for key, ttl in caches.items():
+        if key not in bot.memory:
+            bot.memory[key] = TTLCache(bot.settings.reddit.cache_max_entries, ttl)
+    if 'reddit_recent_expansions' not in bot.memory:
+        bot.memory['reddit_recent_expansions'] = TTLCache(
+            bot.settings.reddit.repeat_max_entries, bot.settings.reddit.repeat_window)
+
+    if 'reddit_snapshots' not in bot.memory and bot.settings.reddit.cache_db:
+        snapshots = SnapshotStore(bot.settings.reddit.cache_db)
+        bot.memory['reddit_snapshots'] = snapshots
+        # warm up, so a restart doesn't mean a burst of cold lookups
+        for kind, key in SNAPSHOT_CACHES.items():
+            cache = bot.memory[key]
+            for name, value, ttl in snapshots.load(kind, cache.maxsize):
+                cache.set(name, load_snapshot(value), ttl)
+
 
 def configure(config):
     config.define_section('reddit', RedditSection)
@@ -74,20 +418,167 @@ def configure(config):
     )
 
 
-def shutdown(bot):
-    # Clean up shared PRAW instance
-    bot.memory.pop('reddit_praw', None)
+def get_reddit(bot):
+    """Get the shared PRAW instance, creating it the first time it's needed.
+
+    It comes with a keep-alive HTTP session that we can use for our own
+    requests too; see :func:`get_http`.
+    """
+    reddit = bot.memory.get('reddit_praw')
+    if reddit is not None:
+        return reddit
+
+    with CLIENT_LOCK:
+        reddit = bot.memory.get('reddit_praw')
+        if reddit is None:
+            http = requests.Session()
+            http.hooks['response'].append(bot.memory['reddit_metrics'].response_hook)
+            bucket = bot.memory.get('reddit_shared_bucket')
+            if bucket is not None:
+                throttle(http, bucket, bot.memory['reddit_metrics'].observe_wait)
+            reddit = praw.Reddit(
+                user_agent=USER_AGENT,
+                client_id=bot.settings.reddit.app_id,
+                client_secret=None,
+                check_for_updates=False,
+                oauth_url=bot.settings.reddit.oauth_url,
+                reddit_url=bot.settings.reddit.reddit_url,
+                requestor_kwargs={'session': http},
+            )
+            authorizer = praw_authorizer(reddit)
+            if authorizer is not None:
+                # reuse the token from before a restart, rather than wait for one
+                keep_tokens(
+                    authorizer,
+                    bot.memory['reddit_tokens'],
+                    token_key(bot.settings.reddit.app_id, bot.settings.reddit.oauth_url),
+                )
+            bot.memory['reddit_http'] = http
+            bot.memory['reddit_praw'] = reddit
+    return reddit
+
+
+def get_http(bot):
+    """Get the HTTP session shared with the PRAW instance."""
+    get_reddit(bot)
+    return bot.memory['reddit_http']
 
 
-def get_time_created(bot, trigger, entrytime):
-    tz = time.get_timezone(
-        bot.db, bot.config, None, trigger.nick, trigger.sender)
-    time_created = dt.datetime.utcfromtimestamp(entrytime)
-    created = time.format_time(bot.db,
-                               bot.config, tz,
-                               trigger.nick, trigger.sender,
-                               time_created)
-    return created
+def shutdown(bot):
+    # let running jobs finish before pulling everything they use from under
+    # them; lookups still waiting for a worker are dropped
+    workers = bot.memory.pop('reddit_workers', None)
+    if workers is not None and not workers.shutdown(SHUTDOWN_TIMEOUT):
+        LOGGER.warning('Reddit lookups still running after %ds; shutting down anyway',
+                       SHUTDOWN_TIMEOUT)
+
+    backend = bot.memory.pop('reddit_async', None)
+    if backend is not None:
+        backend.close()
+
+    index = bot.memory.pop('reddit_index', None)
+    if index is not None:
+        index.close()
+
+    snapshots = bot.memory.pop('reddit_snapshots', None)
+    if snapshots is not None:
+        snapshots.close()
+
+    tokens = bot.memory.pop('reddit_tokens', None)
+    if tokens is not None:
+        tokens.close()
+
+    save_subreddit_index(bot)
+    bot.memory.pop('reddit_subreddit_index', None)
+
+    watcher = bot.memory.pop('reddit_watcher', None)
+    if watcher is not None:
+        watcher.close()
+
+    http = bot.memory.pop('reddit_http', None)
+    if http is not None:
+        http.close()
+
+    bucket = bot.memory.pop('reddit_shared_bucket', None)
+    if bucket is not None:
+        bucket.close()
+
+    # Clean up shared PRAW instance (if it was ever needed) and caches
+    for key in (
+        'reddit_praw',
+        'reddit_batcher',
+        'reddit_budget',
+        'reddit_flights',
+        'reddit_post_cache',
+        'reddit_comment_cache',
+        'reddit_subreddit_cache',
+        'reddit_redditor_cache',
+        'reddit_image_misses',
+        'reddit_video_misses',
+        'reddit_time_settings',
+        'reddit_recent_expansions',
+        'reddit_channel_flags',
+        'reddit_metrics',
+    ):
+        bot.memory.pop(key, None)
+
+
+def get_time_settings(bot, nick, channel):
+    """Get the (timezone, time format) to use for ``nick`` in ``channel``.
+
+    Resolution follows :func:`sopel.tools.time.get_timezone` and
+    :func:`sopel.tools.time.format_time`, but results are cached.
+    """
+    cache = bot.memory['reddit_time_settings']
+    key = (nick, channel)
+    settings = cache.get(key)
+    if settings is not None:
+        return settings
+
+    tz = time.get_timezone(bot.db, bot.config, None, nick, channel)
+
+    tformat = None
+    if nick:
+        tformat = bot.db.get_nick_value(nick, 'time_format')
+    if not tformat and channel:
+        tformat = bot.db.get_channel_value(channel, 'time_format')
+    if not tformat:
+        tformat = bot.config.core.default_time_format or '%Y-%m-%d - %T %z'
+
+    settings = (tz, tformat)
+    cache.set(key, settings)
+    return settings
+
+
+def get_time_created(bot, nick, channel, entrytime):
+    tz, tformat = get_time_settings(bot, nick, channel)
+    time_created = dt.datetime.fromtimestamp(entrytime, dt.timezone.utc)
+    if tz:
+        time_created = time_created.astimezone(pytz.timezone(tz))
+    return time_created.strftime(tformat)
+
+
+def time_settings_commands(settings):
+    """Match Sopel's commands for changing timezones and time formats."""
+    return [re.compile(
+        settings.core.prefix +
+        r'(?:un)?set(?:tz|timezone|tf|timeformat|'
+        r'ctz|channeltz|ctf|channeltimeformat)\b'
+    )]
+
+
+@plugin.rule_lazy(time_settings_commands)
+@plugin.thread(False)
+@plugin.unblockable
+def forget_time_settings(bot, trigger):
+    # someone changed their (or their channel's) settings; start over now, and
+    # again once Sopel's own (threaded) command has saved them, in case a
+    # lookup cached the old ones in between
+    cache = bot.memory['reddit_time_settings']
+    cache.clear()
+    timer = threading.Timer(TIME_SETTINGS_SETTLE, cache.clear)
+    timer.daemon = True
+    timer.start()
 
 
 def get_is_cakeday(entrytime):
@@ -108,66 +599,335 @@ def get_is_cakeday(entrytime):
     return is_cakeday
 
 
-@plugin.url(image_url)
+def offloaded(handler=None, *, explicit=False):
+    """Run a rule handler on the plugin's worker pool.
+
+    Sopel's dispatch loop only queues the job, so slow reddit lookups can
+    neither pile up threads nor stall other plugins. Passive jobs are dropped
+    when the queue is full or the API rate limit budget runs low; pass
+    ``explicit=True`` for commands, which run first and are never dropped.
+    """
+    if handler is None:
+        return functools.partial(offloaded, explicit=explicit)
+
+    priority = EXPLICIT if explicit else PASSIVE
+    timed = instrumented(handler)
+
+    @functools.wraps(handler)
+    def wrapper(bot, trigger, on_failure=None):
+        queue_job(
+            bot, trigger, handler.__name__, timed, bot, trigger,
+            priority=priority, on_failure=on_failure)
+        return plugin.NOLIMIT
+
+    wrapper.thread = False  # queueing is quick; no need for a thread
+    return wrapper
+
+
+def queue_job(
+    bot, trigger, name, func, *args, priority=PASSIVE, on_failure=None,
+) -> bool:
+    """Queue ``func(*args)`` on the worker pool; ``False`` if it was refused.
+
+    Errors are reported to wherever ``trigger`` came from. ``on_failure`` is
+    called if the job is refused, dropped, or raises.
+    """
+    def job():
+        try:
+            func(*args)
+        except Exception as error:
+            if on_failure is not None:
+                on_failure()
+            bot.error(trigger, exception=error)
+
+    if not bot.memory['reddit_workers'].submit(job, priority=priority, on_drop=on_failure):
+        LOGGER.warning(
+            'Work queue full; dropping %s for %s in %s', name, trigger.nick, trigger.sender)
+        if on_failure is not None:
+            on_failure()
+        return False
+    return True
+
+
+def instrumented(func):
+    """Record how long each call of ``func`` takes, and whether it fails."""
+    @functools.wraps(func)
+    def wrapper(bot, *args, **kwargs):
+        with bot.memory['reddit_metrics'].timing(func.__name__):
+            return profiled(bot, func, bot, *args, **kwargs)
+    return wrapper
+
+
+def profiled(bot, func, *args, **kwargs):
+    """Call ``func``, under the owner's profiler if one is running."""
+    session = bot.memory.get('reddit_profiler')
+    if session is None:
+        return func(*args, **kwargs)
+
+    profiler, _ = session
+    try:
+        return profiler.run(func, *args, **kwargs)
+    finally:
+        if profiler.done:
+            finish_profile(bot)
+
+
+def suppress_repeats(key):
+    """Ignore things already expanded in the same channel, within ``repeat_window``.
+
+    ``key`` takes the trigger and returns what it's about (e.g.
+    ``('t3', submission_id)``), so different links to the same thing count
+    as repeats. The check happens before anything else, network included.
+
+    Goes on an :func:`offloaded` handler: if its job is dropped or fails,
+    the thing wasn't expanded, and the next link to it will be.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(bot, trigger):
+            recent = bot.memory['reddit_recent_expansions']
+            seen = (trigger.sender.lower(),) + key(trigger)
+            if not recent.add(seen, True):
+                LOGGER.debug('Not expanding %s again in %s', key(trigger), trigger.sender)
+                return plugin.NOLIMIT
+            return handler(bot, trigger, on_failure=functools.partial(recent.pop, seen))
+        return wrapper
+    return decorator
+
+
+def post_or_comment_key(trigger):
+    comment = trigger.groupdict().get('comment')
+    if comment:
+        return ('t1', comment)
+    return ('t3', trigger.group('submission'))
+
+
+def coalesced(func):
+    """Let concurrent calls with the same (positional) arguments share one call."""
+    @functools.wraps(func)
+    def wrapper(bot, *args):
+        key = (func.__name__,) + args
+        return bot.memory['reddit_flights'].do(key, func, bot, *args)
+    return wrapper
+
+
+def acoalesced(func):
+    """Like :func:`coalesced`, for coroutines run on the asyncio backend."""
+    @functools.wraps(func)
+    async def wrapper(bot, *args):
+        key = (func.__name__,) + args
+        return await bot.memory['reddit_async'].coalesce(key, func, bot, *args)
+    return wrapper
+
+
+def later(bot: SopelWrapper, trigger: Trigger, coro, callback):
+    """Run ``coro`` on the asyncio backend, then ``callback`` with its result.
+
+    The callback runs on the worker pool, ahead of queued lookups, but only
+    once the result is in: lookups waiting on reddit don't hold a thread.
+    Since it jumps the queue, it must not make API requests itself; it can
+    queue a job of its own (see :func:`queue_job`) for that.
+    """
+    metrics = bot.memory['reddit_metrics']
+    name = coro.__qualname__
+
+    async def timed():
+        with metrics.timing(name):
+            return await coro
+
+    def done(future):
+        workers = bot.memory.get('reddit_workers')
+        if future.cancelled() or workers is None:
+            # shutting down
+            return
+
+        def job():
+            try:
+                profiled(bot, callback, future.result())
+            except Exception as error:
+                bot.error(trigger, exception=error)
+
+        workers.submit(job, priority=EXPLICIT)
+
+    bot.memory['reddit_async'].submit(timed()).add_done_callback(done)
+    return plugin.NOLIMIT
+
+
+@plugin.url_lazy(patterns('image_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
-def image_info(bot, trigger, match):
-    url = match.group(0)
-    preview = match.group("subdomain") == "preview"
+@suppress_repeats(lambda trigger: ('image', trigger.group('image').split('.')[0]))
+@offloaded
+def image_info(bot, trigger):
+    url = trigger.group(0)
+    preview = trigger.group("subdomain") == "preview"
     if preview:
-        url = "https://i.redd.it/{}".format(match.group("image"))
+        url = "https://i.redd.it/{}".format(trigger.group("image"))
+
+    submission_id = resolve_image(bot, trigger.group("image").split(".")[0], url)
+    if submission_id is None:
+        # Fail silently if the image link can't be mapped to a submission
+        bot.memory['reddit_metrics'].count_not_found('image')
+        return plugin.NOLIMIT
+    return say_post_info(bot, trigger, submission_id, show_link=preview, show_comments_link=True)
+
+
+@coalesced
+def resolve_image(bot: SopelWrapper, image: str, url: str) -> str | None:
+    """Find the ID of the (oldest) submission of a reddit-hosted image."""
+    index = bot.memory['reddit_index']
+    submission_id = index.get(IMAGE, image)
+    if submission_id is not None:
+        return submission_id
+
+    misses = bot.memory['reddit_image_misses']
+    if image in misses:
+        return None
+
+    submission_id = search_submission(bot, url)
+    if submission_id is None:
+        misses.set(image, True)
+        return None
+
+    index.set(IMAGE, image, submission_id)
+    return submission_id
+
+
+def search_submission(bot: SopelWrapper, url: str) -> str | None:
+    """Search for the oldest submission linking to ``url``."""
     results = list(
-        bot.memory['reddit_praw']
+        get_reddit(bot)
         .subreddit('all')
-        .search('url:"{}"'.format(url), sort='new', params={'include_over_18': 'on'})
+        .search(
+            'url:"{}"'.format(url),
+            sort='new',
+            limit=bot.settings.reddit.search_limit,
+            params={'include_over_18': 'on'},
+        )
     )
-    try:
-        oldest = results[-1]
-    except IndexError:
-        # Fail silently if the image link can't be mapped to a submission
-        return plugin.NOLIMIT
-    return say_post_info(bot, trigger, oldest.id, show_link=preview, show_comments_link=True)
+    if not results:
+        return None
+
+    # oldest first, so the original submission claims its images
+    for s in reversed(results):
+        remember_submission(bot, s)
+    return results[-1].id
 
 
-@plugin.url(video_url)
+@plugin.url_lazy(patterns('video_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
-def video_info(bot, trigger, match):
-    submission_id = None
-    try:
-        # Get the video URL with a cheeky hack
-        url = requests.head(
-            'https://www.reddit.com/video/{}'.format(match.group(1)),
-            timeout=(10.0, 4.0)).headers['Location']
-        submission_id = re.match(post_or_comment_url, url).group('submission')
-    except KeyError:
-        # Reddit must not like this bot's IP range
-        results = list(
-            bot.memory['reddit_praw']
-            .subreddit('all')
-            .search(
-                'url:"{}"'.format(trigger.group(0)),
-                sort='new', params={'include_over_18': 'on'}
-            )
-        )
-        try:
-            oldest = results[-1]
-        except IndexError:
-            # Fail silently at this point; nothing useful from hack *or* the API
-            return plugin.NOLIMIT
-        else:
-            submission_id = oldest.id
+@suppress_repeats(lambda trigger: ('video', trigger.group(1)))
+@offloaded
+def video_info(bot, trigger):
+    video, url = trigger.group(1), trigger.group(0)
+    if 'reddit_async' in bot.memory:
+        def resolved(submission_id):
+            if submission_id is not None:
+                return say_video_info(bot, trigger, submission_id)
+            # searching is the costliest request there is, so it waits its
+            # turn (and for the rate limit budget) like any passive lookup
+            queue_job(bot, trigger, 'video_info', search_and_say_video, bot, trigger, video, url)
+
+        return later(bot, trigger, aresolve_video(bot, video), resolved)
+
+    return say_video_info(bot, trigger, resolve_video(bot, video, url))
+
 
+@instrumented
+def search_and_say_video(bot: SopelWrapper, trigger: Trigger, video: str, url: str):
+    return say_video_info(bot, trigger, search_video(bot, video, url))
+
+
+def say_video_info(bot: SopelWrapper, trigger: Trigger, submission_id: str | None):
     if submission_id is None:
-        # type checking probably wouldn't like omitting this sanity check
+        # Fail silently; nothing useful from hack *or* the API
+        bot.memory['reddit_metrics'].count_not_found('video')
         return plugin.NOLIMIT
 
     return say_post_info(bot, trigger, submission_id, show_link=False, show_comments_link=True)
 
 
-@plugin.url(share_url)
+@coalesced
+def resolve_video(bot: SopelWrapper, video: str, url: str) -> str | None:
+    """Find the ID of the submission of a reddit-hosted video."""
+    index = bot.memory['reddit_index']
+    submission_id = index.get(VIDEO, video)
+    if submission_id is not None:
+        return submission_id
+
+    misses = bot.memory['reddit_video_misses']
+    if video in misses:
+        return None
+
+    try:
+        # Get the video URL with a cheeky hack, over PRAW's warm connection
+        location = get_http(bot).head(
+            '{}/video/{}'.format(bot.settings.reddit.reddit_url, video),
+            timeout=(10.0, 4.0)).headers.get('Location', '')
+    except requests.RequestException:
+        location = ''
+
+    post = re.match(post_or_comment_url, location)
+    if post:
+        index.set(VIDEO, video, post.group('submission'))
+        return post.group('submission')
+
+    # Reddit must not like this bot's IP range
+    return search_video(bot, video, url)
+
+
+@acoalesced
+async def aresolve_video(bot: SopelWrapper, video: str) -> str | None:
+    """Like :func:`resolve_video`, on the asyncio backend, minus the search.
+
+    Returns ``None`` if the video isn't known and the redirect didn't help;
+    searching is left to :func:`search_video`.
+    """
+    index = bot.memory['reddit_index']
+    backend = bot.memory['reddit_async']
+    submission_id = await backend.run_blocking(index.get, VIDEO, video)
+    if submission_id is not None or video in bot.memory['reddit_video_misses']:
+        return submission_id
+
+    location = await backend.head(
+        '{}/video/{}'.format(bot.settings.reddit.reddit_url, video))
+    post = re.match(post_or_comment_url, location)
+    if not post:
+        return None
+
+    await backend.run_blocking(index.set, VIDEO, video, post.group('submission'))
+    return post.group('submission')
+
+
+def search_video(bot: SopelWrapper, video: str, url: str) -> str | None:
+    """Find a video's submission with reddit's search, remembering the result."""
+    misses = bot.memory['reddit_video_misses']
+    if video in misses:
+        return None
+
+    submission_id = search_submission(bot, url)
+    if submission_id is None:
+        misses.set(video, True)
+        return None
+
+    bot.memory['reddit_index'].set(VIDEO, video, submission_id)
+    return submission_id
+
+
+@plugin.url_lazy(patterns('share_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+@suppress_repeats(lambda trigger: ('share', trigger.group('share')))
+@offloaded
 def share_info(bot: SopelWrapper, trigger: Trigger):
     url = trigger.match.group(0)
 
+    fullname = resolve_share(bot, trigger.match.group('share'), url)
+    if fullname is not None:
+        kind, _, id_ = fullname.partition('_')
+        if kind == 't1':
+            return say_comment_info(bot, trigger, id_, show_link=True)
+        return say_post_info(bot, trigger, id_, show_comments_link=True)
+
+    # Couldn't follow the redirect ourselves; let PRAW have a go
     try:
         say_comment_info(bot, trigger, url=url, show_link=True)
         return
@@ -181,12 +941,41 @@ def share_info(bot: SopelWrapper, trigger: Trigger):
     say_post_info(bot, trigger, url=url, show_comments_link=True)
 
 
-@plugin.url(post_or_comment_url)
-@plugin.url(short_post_url)
+@coalesced
+def resolve_share(bot: SopelWrapper, code: str, url: str) -> str | None:
+    """Find the fullname of the post or comment a share link points to."""
+    index = bot.memory['reddit_index']
+    fullname = index.get(SHARE, code)
+    if fullname is not None:
+        return fullname
+
+    try:
+        location = get_http(bot).head(
+            bot.settings.reddit.reddit_url + urlsplit(url).path,
+            timeout=(10.0, 4.0)).headers.get('Location', '')
+    except requests.RequestException:
+        return None
+
+    target = re.match(post_or_comment_url, location)
+    if not target:
+        return None
+
+    if target.group('comment'):
+        fullname = 't1_' + target.group('comment')
+    else:
+        fullname = 't3_' + target.group('submission')
+
+    # share codes never change targets, so remember this one for good
+    index.set(SHARE, code, fullname)
+    return fullname
+
+
+@plugin.url_lazy(patterns('post_or_comment_url', 'short_post_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
-def post_or_comment_info(bot, trigger, match):
-    match = match or trigger
-    groups = match.groupdict()
+@suppress_repeats(post_or_comment_key)
+@offloaded
+def post_or_comment_info(bot, trigger):
+    groups = trigger.groupdict()
 
     if groups.get("comment"):
         say_comment_info(bot, trigger, groups["comment"])
@@ -195,11 +984,157 @@ def post_or_comment_info(bot, trigger, match):
     say_post_info(bot, trigger, groups["submission"])
 
 
-@plugin.url(gallery_url)
+@plugin.url_lazy(patterns('gallery_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
-def rgallery_info(bot, trigger, match):
-    match = match or trigger
-    return say_post_info(bot, trigger, match.group(1), show_link=False)
+@suppress_repeats(lambda trigger: ('t3', trigger.group(1)))
+@offloaded
+def rgallery_info(bot, trigger):
+    return say_post_info(bot, trigger, trigger.group(1), show_link=False)
+
+
+def recall(bot: SopelWrapper, kind: str, key: str):
+    """Get a cached record, from memory or else from the ``cache_db``."""
+    cache = bot.memory[SNAPSHOT_CACHES[kind]]
+    info = cache.get(key)
+    snapshots = bot.memory.get('reddit_snapshots')
+    if info is not None or snapshots is None:
+        return info
+
+    row = snapshots.get(kind, key)
+    if row is None:
+        return None
+    value, ttl = row
+    info = load_snapshot(value)
+    cache.set(key, info, ttl)
+    return info
+
+
+def remember(bot: SopelWrapper, kind: str, key: str, info):
+    """Cache a record in memory, and in the ``cache_db`` if there is one."""
+    cache = bot.memory[SNAPSHOT_CACHES[kind]]
+    ttl = bot.settings.reddit.negative_ttl if isinstance(info, Missing) else cache.ttl
+    cache.set(key, info, ttl)
+    snapshots = bot.memory.get('reddit_snapshots')
+    if snapshots is not None:
+        snapshots.set(kind, key, dump_snapshot(info), ttl)
+
+
+async def arecall(bot: SopelWrapper, kind: str, key: str):
+    """Like :func:`recall`, without blocking the asyncio loop on the ``cache_db``."""
+    info = bot.memory[SNAPSHOT_CACHES[kind]].get(key)
+    if info is not None or 'reddit_snapshots' not in bot.memory:
+        return info
+    return await bot.memory['reddit_async'].run_blocking(recall, bot, kind, key)
+
+
+def remember_submission(bot: SopelWrapper, s) -> PostInfo:
+    """Cache a fetched submission, and index the images it contains."""
+    return remember_post(bot, PostInfo.from_submission(s), image_ids(s))
+
+
+def remember_post(bot: SopelWrapper, post: PostInfo, images: set[str]) -> PostInfo:
+    remember(bot, 'post', post.id, post)
+    learn_subreddit(bot, post.subreddit)
+    bot.memory['reddit_index'].update(IMAGE, ((image, post.id) for image in images))
+    return post
+
+
+def fetch_thing(bot: SopelWrapper, fullname: str):
+    """Get a post or comment by its fullname, or ``None`` if it doesn't exist.
+
+    This asks ``/api/info`` (through the batcher, if there is one), which
+    answers with just the listing data we need. Fetching a lazy PRAW
+    ``Submission`` instead would load ``/comments/<id>``, comment tree and
+    all.
+    """
+    batcher = bot.memory.get('reddit_batcher')
+    if batcher:
+        return batcher.get(fullname)
+    return next(iter(get_reddit(bot).info(fullnames=[fullname])), None)
+
+
+@coalesced
+def fetch_post(
+    bot: SopelWrapper,
+    id_: str | None = None,
+    url: str | None = None,
+) -> PostInfo | None:
+    """Get a post's metadata, from the cache if possible.
+
+    Returns ``None`` if the post doesn't exist.
+    """
+    if not id_:
+        # the ID is parsed from the (resolved) URL without fetching anything
+        id_ = get_reddit(bot).submission(url=url).id
+
+    post = recall(bot, 'post', id_)
+    if post is not None:
+        return post
+
+    s = fetch_thing(bot, 't3_' + id_)
+    if s is None:
+        return None
+
+    return remember_submission(bot, s)
+
+
+@coalesced
+def fetch_comment(
+    bot: SopelWrapper,
+    id_: str | None = None,
+    url: str | None = None,
+) -> CommentInfo | None:
+    """Get a comment's metadata, from the cache if possible.
+
+    Returns ``None`` if the comment doesn't exist.
+    """
+    if not id_:
+        id_ = get_reddit(bot).comment(url=url).id
+
+    comment = recall(bot, 'comment', id_)
+    if comment is not None:
+        return comment
+
+    c = fetch_thing(bot, 't1_' + id_)
+    if c is None:
+        return None
+
+    comment = CommentInfo.from_comment(c)
+    remember(bot, 'comment', comment.id, comment)
+    return comment
+
+
+@acoalesced
+async def afetch_post(bot: SopelWrapper, id_: str) -> PostInfo | None:
+    """Like :func:`fetch_post`, on the asyncio backend."""
+    post = await arecall(bot, 'post', id_)
+    if post is not None:
+        return post
+
+    backend = bot.memory['reddit_async']
+    data = await backend.info('t3_' + id_)
+    if data is None:
+        return None
+
+    return await backend.run_blocking(
+        remember_post, bot, PostInfo.from_data(data), image_ids_from_data(data))
+
+
+@acoalesced
+async def afetch_comment(bot: SopelWrapper, id_: str) -> CommentInfo | None:
+    """Like :func:`fetch_comment`, on the asyncio backend."""
+    comment = await arecall(bot, 'comment', id_)
+    if comment is not None:
+        return comment
+
+    backend = bot.memory['reddit_async']
+    data = await backend.info('t1_' + id_)
+    if data is None:
+        return None
+
+    comment = CommentInfo.from_data(data)
+    await backend.run_blocking(remember, bot, 'comment', comment.id, comment)
+    return comment
 
 
 def say_post_info(
@@ -212,12 +1147,61 @@ def say_post_info(
 ):
     if not (id_ or url):
         raise TypeError("Expected either id_ or url parameter")
+    show = functools.partial(
+        show_post_info, bot, trigger,
+        show_link=show_link, show_comments_link=show_comments_link)
+    if id_ and 'reddit_async' in bot.memory:
+        return later(bot, trigger, afetch_post(bot, id_), show)
+
     try:
-        s = bot.memory["reddit_praw"].submission(id=id_, url=url)
+        s = fetch_post(bot, id_, url)
     except prawcore.exceptions.NotFound:
+        s = None
+    return show(s)
+
+
+def show_post_info(
+    bot: SopelWrapper,
+    trigger: Trigger,
+    s: PostInfo | None,
+    show_link: bool = True,
+    show_comments_link: bool = False,
+):
+    if s is None:
+        bot.memory['reddit_metrics'].count_not_found('post')
         bot.reply("No such post.")
         return plugin.NOLIMIT
 
+    sfw = s.over_18 and get_channel_flag(bot, trigger.sender, 'sfw')
+    spoiler_free = s.spoiler and get_channel_flag(bot, trigger.sender, 'spoiler_free')
+    if sfw:
+        bot.kick(
+            trigger.nick, trigger.sender,
+            'Linking to NSFW content in a SFW channel.'
+        )
+    if spoiler_free:
+        bot.kick(
+            trigger.nick, trigger.sender,
+            'Linking to spoiler content in a spoiler-free channel.'
+        )
+
+    bot.say(format_post_info(
+        bot, s, trigger.nick, trigger.sender, show_link, show_comments_link))
+
+
+def format_post_info(
+    bot,
+    s: PostInfo,
+    nick: str | None,
+    channel: str | None,
+    show_link: bool = True,
+    show_comments_link: bool = False,
+) -> str:
+    """Describe a post for ``nick`` in ``channel``.
+
+    Links are hidden from SFW channels if the post is NSFW, and from
+    spoiler-free channels if it's a spoiler.
+    """
     message = (
         "{title}{flair} to {subreddit}{nsfw}"
         " | {points:,} {points_text} ({percent})"
@@ -227,10 +1211,10 @@ def say_post_info(
     )
 
     flair = ''
-    if s.link_flair_text:
-        flair = " [{}]".format(s.link_flair_text)
+    if s.flair:
+        flair = " [{}]".format(s.flair)
 
-    subreddit = ("self." if s.is_self else "r/") + s.subreddit.display_name
+    subreddit = ("self." if s.is_self else "r/") + s.subreddit
 
     link = ""
     if show_link and not s.is_self:
@@ -240,32 +1224,17 @@ def say_post_info(
     if s.over_18:
         nsfw += ' ' + bold(color('[NSFW]', colors.RED))
 
-        sfw = bot.db.get_channel_value(trigger.sender, 'sfw')
-        if sfw:
-            if link:
-                link = " | (link hidden)"
-            bot.kick(
-                trigger.nick, trigger.sender,
-                'Linking to NSFW content in a SFW channel.'
-            )
+        if link and get_channel_flag(bot, channel, 'sfw'):
+            link = " | (link hidden)"
     if s.spoiler:
         nsfw += ' ' + bold(color('[SPOILER]', colors.GRAY))
 
-        spoiler_free = bot.db.get_channel_value(trigger.sender, 'spoiler_free')
-        if spoiler_free:
-            if link:
-                link = " | (link hidden)"
-            bot.kick(
-                trigger.nick, trigger.sender,
-                'Linking to spoiler content in a spoiler-free channel.'
-            )
+        if link and get_channel_flag(bot, channel, 'spoiler_free'):
+            link = " | (link hidden)"
 
-    if s.author:
-        author = s.author.name
-    else:
-        author = '[deleted]'
+    author = s.author or '[deleted]'
 
-    created = get_time_created(bot, trigger, s.created_utc)
+    created = get_time_created(bot, nick, channel, s.created_utc)
 
     if s.score > 0:
         point_color = colors.GREEN
@@ -279,14 +1248,11 @@ def say_post_info(
     comments_text = 'comment' if s.num_comments == 1 else 'comments'
 
     comments_link = ''
-    if show_comments_link:
-        try:
-            comments_link = " | " + s.shortlink
-        except AttributeError:
-            pass
+    if show_comments_link and s.shortlink:
+        comments_link = " | " + s.shortlink
 
     title = html.unescape(s.title)
-    message = message.format(
+    return message.format(
         title=title,
         flair=flair,
         subreddit=subreddit,
@@ -302,8 +1268,6 @@ def say_post_info(
         comments_link=comments_link,
     )
 
-    bot.say(message)
-
 
 def say_comment_info(
     bot: SopelWrapper,
@@ -314,23 +1278,36 @@ def say_comment_info(
 ):
     if not (id_ or url):
         raise TypeError("Expected either id_ or url parameter")
+    show = functools.partial(show_comment_info, bot, trigger, show_link=show_link)
+    if id_ and 'reddit_async' in bot.memory:
+        return later(bot, trigger, afetch_comment(bot, id_), show)
+
     try:
-        c = bot.memory["reddit_praw"].comment(id=id_, url=url)
+        c = fetch_comment(bot, id_, url)
     except prawcore.exceptions.NotFound:
+        c = None
+    return show(c)
+
+
+def show_comment_info(
+    bot: SopelWrapper,
+    trigger: Trigger,
+    c: CommentInfo | None,
+    show_link: bool = False,
+):
+    if c is None:
+        bot.memory['reddit_metrics'].count_not_found('comment')
         bot.reply('No such comment.')
         return plugin.NOLIMIT
 
     message = ("Comment by {author} | {points} {points_text} | "
                "Posted at {posted} | {link}{comment}")
 
-    if c.author:
-        author = c.author.name
-    else:
-        author = '[deleted]'
+    author = c.author or '[deleted]'
 
     points_text = 'point' if c.score == 1 else 'points'
 
-    posted = get_time_created(bot, trigger, c.created_utc)
+    posted = get_time_created(bot, trigger.nick, trigger.sender, c.created_utc)
 
     # DIY short-ish link, since c.permalink is both long and not a link
     link = ""
@@ -350,6 +1327,105 @@ def say_comment_info(
     bot.say(message, truncation=' […]')
 
 
+@coalesced
+def fetch_subreddit(bot: SopelWrapper, name: str) -> SubredditInfo | Missing:
+    """Get a subreddit's details (or why they're unavailable), cached."""
+    key = name.lower()
+    info = recall(bot, 'subreddit', key)
+    if info is not None:
+        return info
+
+    # A single request to /r/<name>/about tells us everything: reddit
+    # redirects to search for nonexistent subreddits, answers 403 for private
+    # ones, and 404 for banned ones.
+    try:
+        info = SubredditInfo.from_subreddit(get_reddit(bot).subreddit(name))
+    except prawcore.exceptions.Redirect:
+        info = Missing(NOT_FOUND)
+    except prawcore.exceptions.Forbidden:
+        info = Missing(PRIVATE)
+    except prawcore.exceptions.NotFound:
+        info = Missing(BANNED)
+
+    remember(bot, 'subreddit', key, info)
+    if not isinstance(info, Missing):
+        learn_subreddit(bot, name)
+    return info
+
+
+@acoalesced
+async def afetch_subreddit(bot: SopelWrapper, name: str) -> SubredditInfo | Missing:
+    """Like :func:`fetch_subreddit`, on the asyncio backend."""
+    key = name.lower()
+    info = await arecall(bot, 'subreddit', key)
+    if info is not None:
+        return info
+
+    backend = bot.memory['reddit_async']
+    response = await backend.api('/r/{}/about'.format(name))
+    if response.status == 200:
+        info = SubredditInfo.from_data(response.data['data'])
+    elif response.status in (301, 302):
+        info = Missing(NOT_FOUND)
+    elif response.status == 403:
+        info = Missing(PRIVATE)
+    elif response.status == 404:
+        info = Missing(BANNED)
+    else:
+        raise aio.ResponseError('GET', '/r/{}/about'.format(name), response.status)
+
+    await backend.run_blocking(remember, bot, 'subreddit', key, info)
+    if not isinstance(info, Missing):
+        learn_subreddit(bot, name)
+    return info
+
+
+def learn_subreddit(bot: SopelWrapper, name: str):
+    """Add a subreddit known to exist to the subreddit index, if there is one."""
+    index = bot.memory.get('reddit_subreddit_index')
+    if index is not None:
+        index.add(name)
+
+
+@coalesced
+def fetch_redditor(bot: SopelWrapper, name: str) -> RedditorInfo | Missing:
+    """Get a Redditor's details (or whether they don't exist), cached."""
+    key = name.lower()
+    info = recall(bot, 'redditor', key)
+    if info is not None:
+        return info
+
+    try:
+        info = RedditorInfo.from_redditor(get_reddit(bot).redditor(name))
+    except prawcore.exceptions.NotFound:
+        info = Missing(NOT_FOUND)
+
+    remember(bot, 'redditor', key, info)
+    return info
+
+
+@acoalesced
+async def afetch_redditor(bot: SopelWrapper, name: str) -> RedditorInfo | Missing:
+    """Like :func:`fetch_redditor`, on the asyncio backend."""
+    key = name.lower()
+    info = await arecall(bot, 'redditor', key)
+    if info is not None:
+        return info
+
+    backend = bot.memory['reddit_async']
+    response = await backend.api('/user/{}/about'.format(name))
+    if response.status == 200:
+        info = RedditorInfo.from_data(response.data['data'])
+    elif response.status == 404:
+        info = Missing(NOT_FOUND)
+    else:
+        raise aio.ResponseError('GET', '/user/{}/about'.format(name), response.status)
+
+    await backend.run_blocking(remember, bot, 'redditor', key, info)
+    return info
+
+
+@instrumented
 def subreddit_info(bot, trigger, match, commanded=False, explicit_command=False):
     """Shows information about the given subreddit."""
     match_lower = match.lower()
@@ -373,30 +1449,37 @@ def subreddit_info(bot, trigger, match, commanded=False, explicit_command=False)
         bot.say(message)
         return plugin.NOLIMIT
 
-    r = bot.memory['reddit_praw']
-    try:
-        r.subreddits.search_by_name(match, exact=True)
-    except prawcore.exceptions.NotFound:
-        # fail silently if it wasn't an explicit command
-        if explicit_command:
-            bot.reply('No such subreddit.')
-        return plugin.NOLIMIT
+    show = functools.partial(
+        show_subreddit_info, bot, trigger, match,
+        commanded=commanded, explicit_command=explicit_command)
+    if 'reddit_async' in bot.memory:
+        return later(bot, trigger, afetch_subreddit(bot, match), show)
+    return show(fetch_subreddit(bot, match))
 
-    try:
-        s = r.subreddit(match)
-        s.subreddit_type
-    except prawcore.exceptions.Forbidden:
-        if explicit_command:
-            bot.reply("r/" + match + " appears to be a private subreddit!")
-        return plugin.NOLIMIT
-    except prawcore.exceptions.NotFound:
+
+def show_subreddit_info(
+    bot: SopelWrapper,
+    trigger: Trigger,
+    match: str,
+    s: SubredditInfo | Missing,
+    commanded: bool = False,
+    explicit_command: bool = False,
+):
+    if isinstance(s, Missing):
+        bot.memory['reddit_metrics'].count_not_found('subreddit')
+        # fail silently if it wasn't an explicit command
         if explicit_command:
-            bot.reply("r/" + match + " appears to be a banned subreddit!")
+            if s.reason == NOT_FOUND:
+                bot.reply('No such subreddit.')
+            elif s.reason == PRIVATE:
+                bot.reply("r/" + match + " appears to be a private subreddit!")
+            elif s.reason == BANNED:
+                bot.reply("r/" + match + " appears to be a banned subreddit!")
         return plugin.NOLIMIT
 
-    link = 'https://reddit.com' + s.url
+    link = 'https://reddit.com' + s.path
 
-    created = get_time_created(bot, trigger, s.created_utc)
+    created = get_time_created(bot, trigger.nick, trigger.sender, s.created_utc)
 
     message = ('{name}{nsfw}{link} | {subscribers} subscribers | '
                'Created at {created} | {descriptions}')
@@ -405,7 +1488,7 @@ def subreddit_info(bot, trigger, match, commanded=False, explicit_command=False)
     if s.over18:
         nsfw += ' ' + bold(color('[NSFW]', colors.RED))
 
-        sfw = bot.db.get_channel_value(trigger.sender, 'sfw')
+        sfw = get_channel_flag(bot, trigger.sender, 'sfw')
         if sfw:
             link = '(link hidden)'
             bot.kick(
@@ -416,7 +1499,7 @@ def subreddit_info(bot, trigger, match, commanded=False, explicit_command=False)
     descriptions = (text for text in (s.title, s.public_description) if text)
 
     message = message.format(
-        name=s.display_name_prefixed,
+        name=s.name,
         nsfw=nsfw,
         link=(' | ' + link) if commanded else '',
         subscribers='{:,}'.format(s.subscribers),
@@ -427,12 +1510,26 @@ def subreddit_info(bot, trigger, match, commanded=False, explicit_command=False)
     bot.say(message, truncation=' […]')
 
 
+@instrumented
 def redditor_info(bot, trigger, match, commanded=False, explicit_command=False):
     """Shows information about the given Redditor."""
-    try:
-        u = bot.memory['reddit_praw'].redditor(match)
-        u.id  # shortcut to check if the user exists or not
-    except prawcore.exceptions.NotFound:
+    show = functools.partial(
+        show_redditor_info, bot, trigger,
+        commanded=commanded, explicit_command=explicit_command)
+    if 'reddit_async' in bot.memory:
+        return later(bot, trigger, afetch_redditor(bot, match), show)
+    return show(fetch_redditor(bot, match))
+
+
+def show_redditor_info(
+    bot: SopelWrapper,
+    trigger: Trigger,
+    u: RedditorInfo | Missing,
+    commanded: bool = False,
+    explicit_command: bool = False,
+):
+    if isinstance(u, Missing):
+        bot.memory['reddit_metrics'].count_not_found('redditor')
         # fail silently if it wasn't an explicit command
         if explicit_command:
             bot.reply('No such Redditor.')
@@ -458,16 +1555,54 @@ def redditor_info(bot, trigger, match, commanded=False, explicit_command=False):
     bot.say(message)
 
 
-@plugin.url(user_url)
+@plugin.url_lazy(patterns('user_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
-def auto_redditor_info(bot, trigger, match):
-    return redditor_info(bot, trigger, match.group(1), commanded=False, explicit_command=False)
+@suppress_repeats(lambda trigger: ('u', trigger.group(1).lower()))
+@offloaded
+def auto_redditor_info(bot, trigger):
+    return redditor_info(bot, trigger, trigger.group(1), commanded=False, explicit_command=False)
 
 
-@plugin.url(subreddit_url)
+@plugin.url_lazy(patterns('subreddit_url'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
-def auto_subreddit_info(bot, trigger, match):
-    return subreddit_info(bot, trigger, match.group(1), commanded=False, explicit_command=False)
+@suppress_repeats(lambda trigger: ('r', trigger.group(1).lower()))
+@offloaded
+def auto_subreddit_info(bot, trigger):
+    return subreddit_info(bot, trigger, trigger.group(1), commanded=False, explicit_command=False)
+
+
+CHANNEL_FLAGS = ('sfw', 'spoiler_free')
+
+
+def get_channel_flag(bot, channel, flag):
+    """Get a channel's ``sfw`` or ``spoiler_free`` flag.
+
+    A channel's flags are read from the database when they're needed, then
+    kept in memory for a while (like users' time settings).
+    """
+    return channel_flags(bot, channel)[flag]
+
+
+def channel_flags(bot, channel) -> dict[str, bool]:
+    flags = bot.memory['reddit_channel_flags']
+    channel = bot.make_identifier(channel)
+    values = flags.get(channel)
+    if values is None:
+        values = {
+            name: bool(bot.db.get_channel_value(channel, name))
+            for name in CHANNEL_FLAGS
+        }
+        flags.set(channel, values)
+    return values
+
+
+def set_channel_flag(bot, channel, flag, value):
+    """Set a channel's ``sfw`` or ``spoiler_free`` flag, in memory and database."""
+    bot.db.set_channel_value(channel, flag, value)
+    # cached values may be in use by readers; replace them rather than edit
+    values = dict(channel_flags(bot, channel))
+    values[flag] = bool(value)
+    bot.memory['reddit_channel_flags'].set(bot.make_identifier(channel), values)
 
 
 @plugin.require_chanmsg('Setting SFW status is only supported in a channel.')
@@ -485,7 +1620,7 @@ def set_channel_sfw(bot, trigger):
     if trigger.group(2) and trigger.group(3):
         param = trigger.group(3).strip().lower()
     sfw = param == 'true'
-    bot.db.set_channel_value(trigger.sender, 'sfw', sfw)
+    set_channel_flag(bot, trigger.sender, 'sfw', sfw)
     if sfw:
         bot.say('%s is now flagged as SFW.' % trigger.sender)
     else:
@@ -510,7 +1645,7 @@ def get_channel_sfw(bot, trigger):
 
     channel = channel.strip()
 
-    sfw = bot.db.get_channel_value(channel, 'sfw')
+    sfw = get_channel_flag(bot, channel, 'sfw')
     if sfw:
         bot.say('%s is flagged as SFW' % channel)
     else:
@@ -532,7 +1667,7 @@ def set_channel_spoiler_free(bot, trigger):
     if trigger.group(2) and trigger.group(3):
         param = trigger.group(3).strip().lower()
     spoiler_free = param == 'true'
-    bot.db.set_channel_value(trigger.sender, 'spoiler_free', spoiler_free)
+    set_channel_flag(bot, trigger.sender, 'spoiler_free', spoiler_free)
     if spoiler_free:
         bot.say('%s is now flagged as spoiler-free.' % trigger.sender)
     else:
@@ -557,15 +1692,30 @@ def get_channel_spoiler_free(bot, trigger):
 
     channel = channel.strip()
 
-    spoiler_free = bot.db.get_channel_value(channel, 'spoiler_free')
+    spoiler_free = get_channel_flag(bot, channel, 'spoiler_free')
     if spoiler_free:
         bot.say('%s is flagged as spoiler-free' % channel)
     else:
         bot.say('%s is flagged as spoilers-allowed' % channel)
 
 
-@plugin.find(r'(?<!\S)/?(?P<prefix>r|u)/(?P<id>[a-zA-Z0-9-_]+)\b')
+@plugin.require_admin('Only bot admins can reload channel flags.')
+@plugin.command('reloadredditflags')
+@plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+def reload_channel_flags(bot, trigger):
+    """
+    Forgets the SFW and spoiler-free flags kept in memory, so changes made
+    directly in the database take effect.
+    """
+    bot.memory['reddit_channel_flags'].clear()
+    bot.reply('Channel flags will be reloaded from the database.')
+
+
+@plugin.find_lazy(patterns('slash_mention'))
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+@suppress_repeats(lambda trigger: (
+    trigger.group('prefix').lower(), trigger.group('id').lower()))
+@offloaded
 def reddit_slash_info(bot, trigger):
     searchtype = trigger.group('prefix').lower()
     match = trigger.group('id')
@@ -574,6 +1724,12 @@ def reddit_slash_info(bot, trigger):
         return
 
     if searchtype == "r":
+        index = bot.memory.get('reddit_subreddit_index')
+        if index is not None and index.rules_out(match) \
+                and match.lower() not in ('all', 'popular'):
+            # not worth asking reddit about; it's likely a joke or a typo
+            bot.memory['reddit_metrics'].count_not_found('subreddit_index')
+            return plugin.NOLIMIT
         return subreddit_info(bot, trigger, match, commanded=True, explicit_command=False)
     elif searchtype == "u":
         return redditor_info(bot, trigger, match, commanded=True, explicit_command=False)
@@ -582,6 +1738,7 @@ def reddit_slash_info(bot, trigger):
 @plugin.command('subreddit')
 @plugin.example('.subreddit plex')
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+@offloaded(explicit=True)
 def subreddit_command(bot, trigger):
     # require input
     if not trigger.group(2):
@@ -593,9 +1750,38 @@ def subreddit_command(bot, trigger):
     return subreddit_info(bot, trigger, match, commanded=True, explicit_command=True)
 
 
+@plugin.require_owner('Only the bot owner can import a subreddit index.')
+@plugin.command('redditimportsubs')
+@plugin.example('.redditimportsubs /path/to/subreddits.csv')
+@plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+@offloaded(explicit=True)
+def import_subreddit_index(bot, trigger):
+    """Replace the subreddit index with the names listed in a file, one per line."""
+    filename = bot.settings.reddit.subreddit_index
+    if not filename:
+        bot.reply('Set subreddit_index in the [reddit] config section first.')
+        return
+
+    if not trigger.group(2):
+        bot.reply('You must provide the path to a list of subreddits.')
+        return
+
+    dump = os.path.expanduser(trigger.group(2).strip())
+    try:
+        index = build_from_dump(dump, bot.settings.reddit.subreddit_index_capacity)
+    except OSError as exc:
+        bot.reply("Couldn't read {}: {}".format(dump, exc.strerror))
+        return
+
+    index.save(filename)
+    bot.memory['reddit_subreddit_index'] = index
+    bot.reply('Imported {:,} subreddit names.'.format(len(index)))
+
+
 @plugin.command('redditor')
 @plugin.example('.redditor poem_for_your_sprog')
 @plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+@offloaded(explicit=True)
 def redditor_command(bot, trigger):
     # require input
     if not trigger.group(2):
@@ -605,3 +1791,287 @@ def redditor_command(bot, trigger):
     # Redditor names do not contain spaces
     match = trigger.group(3)
     return redditor_info(bot, trigger, match, commanded=True, explicit_command=True)
+
+
+WATCH_MAX_ANNOUNCE = 5
+"""Most new posts from one check to announce to a channel, to avoid floods."""
+
+
+@plugin.require_chanmsg('Watching subreddits is only supported in a channel.')
+@plugin.require_privilege(plugin.OP)
+@plugin.command('redditwatch')
+@plugin.example('.redditwatch add r/sopel')
+@plugin.example('.redditwatch del r/sopel')
+@plugin.example('.redditwatch list')
+@plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+@offloaded(explicit=True)
+def reddit_watch(bot, trigger):
+    """Announces new posts from subreddits in the current channel.
+
+    Use add or del with a subreddit name to start or stop watching it, and
+    list to see what the channel watches.
+    """
+    watcher = bot.memory['reddit_watcher']
+    channel = trigger.sender.lower()
+    action = (trigger.group(3) or 'list').lower()
+
+    if action == 'list':
+        names = watcher.watched_by(channel)
+        if not names:
+            bot.say('{} does not watch any subreddits.'.format(trigger.sender))
+        else:
+            bot.say('{} watches: {}'.format(
+                trigger.sender, ', '.join('r/' + name for name in names)))
+        return
+
+    name = re.sub(r'^/?r/', '', trigger.group(4) or '', flags=re.IGNORECASE)
+    if action not in ('add', 'del') or not re.fullmatch(r'[\w-]+', name):
+        bot.reply('Usage: .redditwatch add|del <subreddit>, or .redditwatch list')
+        return
+
+    if action == 'del':
+        if watcher.remove(channel, name):
+            bot.say('No longer watching r/{}.'.format(name))
+        else:
+            bot.reply('This channel does not watch r/{}.'.format(name))
+        return
+
+    s = fetch_subreddit(bot, name)
+    if isinstance(s, Missing):
+        bot.reply('r/{} {}.'.format(name, {
+            NOT_FOUND: 'does not exist',
+            PRIVATE: 'is private',
+            BANNED: 'is banned',
+        }[s.reason]))
+        return
+    # the record's name is prefixed ("r/Name"); posts name their subreddit
+    # without the prefix, and that's what announcements are matched with
+    name = re.sub(r'^r/', '', s.name, flags=re.IGNORECASE)
+    if s.over18 and get_channel_flag(bot, trigger.sender, 'sfw'):
+        bot.reply('r/{} is NSFW, and this channel is flagged as SFW.'.format(name))
+        return
+
+    if watcher.add(channel, name):
+        bot.say('Watching r/{} for new posts.'.format(name))
+    else:
+        bot.reply('This channel already watches r/{}.'.format(name))
+
+
+@plugin.interval(10)
+def poll_watches(bot):
+    watcher = bot.memory.get('reddit_watcher')
+    if watcher is None:
+        return
+    budget = bot.memory['reddit_budget']
+
+    for group in watcher.due():
+        # checking feeds is the most passive work there is
+        if not budget.allows_passive():
+            watcher.postpone(group)
+            continue
+        remaining = budget.remaining()
+        slowdown = 2.0 if remaining is not None and remaining < 4 * budget.reserve else 1.0
+
+        try:
+            submissions = list(get_reddit(bot).subreddit(group.path).new(limit=PAGE_SIZE))
+        except prawcore.exceptions.PrawcoreException as error:
+            LOGGER.warning('Could not check r/%s for new posts: %s', group.path, error)
+            watcher.failed(group)
+            continue
+
+        new = set(watcher.record(group, [s.id for s in submissions], slowdown))
+        # listings are newest first
+        submissions = [s for s in reversed(submissions) if s.id in new]
+        announced = announce_posts(bot, [PostInfo.from_submission(s) for s in submissions])
+        # caching whole listings would crowd pasted links out of the post
+        # cache on every poll; keep just what channels were told about
+        for s in submissions:
+            if s.id in announced:
+                remember_submission(bot, s)
+
+
+def announce_posts(bot, posts) -> set[str]:
+    """Announce new ``posts`` to the channels watching their subreddits.
+
+    Returns the IDs of the posts announced anywhere.
+    """
+    watcher = bot.memory['reddit_watcher']
+    announced = {}
+    ids = set()
+    for post in posts:
+        for channel, added in watcher.subscribers(post.subreddit).items():
+            if post.created_utc < added or bot.make_identifier(channel) not in bot.channels:
+                continue
+            if post.over_18 and get_channel_flag(bot, channel, 'sfw'):
+                continue
+            if post.spoiler and get_channel_flag(bot, channel, 'spoiler_free'):
+                continue
+            announced[channel] = announced.get(channel, 0) + 1
+            if announced[channel] > WATCH_MAX_ANNOUNCE:
+                continue
+            bot.say(PLUGIN_OUTPUT_PREFIX + format_post_info(
+                bot, post, None, channel, show_comments_link=True), channel)
+            ids.add(post.id)
+
+    for channel, count in announced.items():
+        if count > WATCH_MAX_ANNOUNCE:
+            LOGGER.info('Skipped announcing %d new posts in %s',
+                        count - WATCH_MAX_ANNOUNCE, channel)
+    return ids
+
+
+def cache_stats(bot):
+    return {
+        key[len('reddit_'):]: value.stats()
+        for key, value in bot.memory.items()
+        if isinstance(value, TTLCache)
+    }
+
+
+@plugin.require_owner('Only the bot owner can see reddit stats.')
+@plugin.command('redditstats')
+@plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+def reddit_stats(bot, trigger):
+    """Sends the bot owner a summary of the reddit plugin's activity."""
+    for line in bot.memory['reddit_metrics'].summary(cache_stats(bot)):
+        bot.say(line, trigger.nick)
+
+
+@plugin.require_owner('Only the bot owner can profile the reddit plugin.')
+@plugin.command('redditprofile')
+@plugin.example('.redditprofile 30s')
+@plugin.example('.redditprofile 100')
+@plugin.output_prefix(PLUGIN_OUTPUT_PREFIX)
+def reddit_profile(bot, trigger):
+    """
+    Profile the next N reddit handler calls (default 100), or those in the
+    next N seconds ("30s"); "stop" ends it early.
+    """
+    arg = (trigger.group(3) or '').lower()
+    if arg == 'stop':
+        if not finish_profile(bot):
+            bot.reply('Not profiling.')
+        return
+
+    if 'reddit_profiler' in bot.memory:
+        bot.reply('Already profiling; use ".redditprofile stop" to end it.')
+        return
+
+    match = re.match(r'^(\d+)(s?)$', arg or '100')
+    if match is None or not int(match.group(1)):
+        bot.reply('Give a number of calls, or of seconds ("30s").')
+        return
+
+    count = int(match.group(1))
+    if match.group(2):
+        profiler = Profiler(seconds=count)
+        what = 'reddit handler calls for the next {}s'.format(count)
+    else:
+        profiler = Profiler(calls=count)
+        what = 'the next {} reddit handler calls'.format(count)
+    bot.memory['reddit_profiler'] = (profiler, trigger.nick)
+    bot.reply('Profiling {}.'.format(what))
+
+
+def finish_profile(bot) -> bool:
+    """End profiling, if it's running, and tell the owner who started it."""
+    session = bot.memory.pop('reddit_profiler', None)
+    if session is None:
+        return False
+
+    profiler, nick = session
+    stats = profiler.finish()
+    if stats is None:
+        bot.say('Profiling ended without any reddit handler calls.', nick)
+        return True
+
+    filename = os.path.join(
+        bot.settings.core.homedir,
+        'reddit-profile-{}.pstats'.format(
+            dt.datetime.utcnow().strftime('%Y%m%d-%H%M%S')))
+    stats.dump_stats(filename)
+    bot.say('Profiled {} calls; stats saved to {}. Top functions by own time:'.format(
+        profiler.profiled, filename), nick)
+    for line in profile_top(stats):
+        bot.say(line, nick)
+    return True
+
+
+@plugin.interval(5)
+def end_profile(bot):
+    """Finish a profile that ran out of time while no handler was called."""
+    session = bot.memory.get('reddit_profiler')
+    if session is not None and session[0].done:
+        finish_profile(bot)
+
+
+@plugin.interval(60)
+def write_metrics(bot):
+    filename = bot.settings.reddit.metrics_file
+    if not filename or 'reddit_metrics' not in bot.memory:
+        return
+
+    # write then rename, so scrapers never see a partial file
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(bot.memory['reddit_metrics'].prometheus(cache_stats(bot)))
+    os.replace(tmp, filename)
+
+
+@plugin.interval(60)
+def renew_tokens(bot):
+    """Renew API access tokens before they expire, so no lookup waits for one."""
+    reddit = bot.memory.get('reddit_praw')
+    if reddit is None and 'reddit_async' not in bot.memory:
+        # PRAW is built on first use; without a good token saved from before
+        # a restart, that first lookup would wait for a new one
+        saved = bot.memory['reddit_tokens'].get(
+            token_key(bot.settings.reddit.app_id, bot.settings.reddit.oauth_url))
+        if saved is None or renewal_due(saved[1]):
+            reddit = get_reddit(bot)
+    authorizer = praw_authorizer(reddit) if reddit is not None else None
+    if authorizer is not None and renewal_due(authorizer_expires(authorizer)):
+        try:
+            authorizer.refresh()
+        except prawcore.exceptions.PrawcoreException as error:
+            LOGGER.warning('Could not renew the API access token: %s', error)
+
+    backend = bot.memory.get('reddit_async')
+    if backend is not None and renewal_due(backend.token_expires):
+        try:
+            backend.submit(backend.renew_token()).result(30)
+        except Exception as error:
+            LOGGER.warning('Could not renew the API access token: %s', error)
+
+
+@plugin.event(events.RPL_WELCOME)
+@plugin.thread(True)
+@plugin.unblockable
+def renew_tokens_on_connect(bot, trigger):
+    # interval jobs first run a minute after startup; don't wait that long
+    renew_tokens(bot)
+
+
+@plugin.interval(600)
+def compact_storage(bot):
+    """Drop expired and excess entries from the plugin's SQLite files."""
+    index = bot.memory.get('reddit_index')
+    if index is not None:
+        removed = index.compact(
+            bot.settings.reddit.index_ttl, bot.settings.reddit.index_max_entries)
+        if removed:
+            LOGGER.debug('Dropped %d old ID mappings', removed)
+
+    snapshots = bot.memory.get('reddit_snapshots')
+    if snapshots is not None:
+        removed = snapshots.compact(bot.settings.reddit.cache_db_max_entries)
+        if removed:
+            LOGGER.debug('Dropped %d cached entries from disk', removed)
+
+
+@plugin.interval(600)
+def save_subreddit_index(bot):
+    """Write the subreddit index to disk, if subreddits were added to it."""
+    index = bot.memory.get('reddit_subreddit_index')
+    if index is not None and index.dirty:
+        index.save(bot.settings.reddit.subreddit_index)
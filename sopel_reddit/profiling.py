@@ -0,0 +1,128 @@
+"""On-demand profiling for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+While a :class:`Profiler` runs, handler calls are run under :mod:`cProfile`
+and their stats merged, so the bot owner can see where slow expansions
+spend their time without restarting the bot under a profiler.
+"""
+from __future__ import annotations
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+from typing import Any, Callable
+
+
+class Profiler:
+    """Profile of the next handler calls, however many threads make them.
+
+    :param calls: how many calls to profile; 0 for no limit
+    :param seconds: how long to profile for; 0 for no limit
+    :param timer: clock for ``seconds``
+
+    Calls made while another is being profiled in the same thread (e.g. a
+    handler calling another) are part of the outer call's profile.
+    """
+    def __init__(
+        self,
+        calls: int = 0,
+        seconds: float = 0,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.calls = calls
+        self._timer = timer
+        self.started = timer()
+        self.deadline = self.started + seconds if seconds else None
+        self.profiled = 0
+        self.closed = False
+        self._running = 0
+        self._stats: pstats.Stats | None = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _expired(self) -> bool:
+        return self.deadline is not None and self._timer() >= self.deadline
+
+    @property
+    def done(self) -> bool:
+        """Whether profiling is over, and no profiled call is still running."""
+        with self._lock:
+            if self.closed:
+                return True
+            full = bool(self.calls) and self.profiled >= self.calls
+            return not self._running and (full or self._expired())
+
+    def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call ``func``, profiling it if the profile wants more calls."""
+        if getattr(self._local, 'active', False):
+            return func(*args, **kwargs)
+
+        with self._lock:
+            wanted = not self.closed and not self._expired() and (
+                not self.calls or self.profiled + self._running < self.calls)
+            if wanted:
+                self._running += 1
+        if not wanted:
+            return func(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is active (Python 3.12+ allows only one)
+            with self._lock:
+                self._running -= 1
+            return func(*args, **kwargs)
+
+        self._local.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._local.active = False
+            self._add(profile)
+
+    def _add(self, profile: cProfile.Profile):
+        with self._lock:
+            self._running -= 1
+            if self.closed:
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.profiled += 1
+
+    def finish(self) -> pstats.Stats | None:
+        """Stop profiling; returns the stats, or ``None`` if nothing was profiled."""
+        with self._lock:
+            self.closed = True
+            return self._stats
+
+
+def where(func: tuple[str, int, str]) -> str:
+    """Name a function from :mod:`pstats` briefly: file, line and name."""
+    filename, line, name = func
+    if filename == '~' and line == 0:
+        # built-in
+        return name
+    return '{}:{}({})'.format(os.path.basename(filename), line, name)
+
+
+def top(stats: pstats.Stats, limit: int = 10) -> list[str]:
+    """Describe the ``limit`` functions that spent the most time themselves."""
+    rows = sorted(
+        stats.stats.items(),  # type: ignore[attr-defined]
+        key=lambda row: row[1][2],
+        reverse=True,
+    )
+    return [
+        '{:.3f}s self, {:.3f}s total, {} calls: {}'.format(
+            tottime, cumtime, ncalls, where(func))
+        for func, (_, ncalls, tottime, cumtime, _) in rows[:limit]
+    ]
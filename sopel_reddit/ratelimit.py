@@ -0,0 +1,184 @@
+"""Rate-limit helpers for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import functools
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # not on Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+STATE = struct.Struct('<d')
+"""Layout of a shared bucket's state file: one timestamp."""
+
+
+class RateBudget:
+    """Read-only view of the rate-limit state prawcore tracks for reddit.
+
+    :param get_reddit: callable returning the current ``praw.Reddit`` client
+    :param reserve: number of requests to keep for explicit commands
+    :param max_delay: longest prawcore sleep (in seconds) passive work may
+                      incur before it's dropped instead
+    :param bucket: optional :class:`SharedBucket` requests also wait for
+    :param get_backend: callable returning the asyncio backend, if lookups
+                        go through it; its rate-limit state is used instead
+    """
+    def __init__(
+        self,
+        get_reddit: Callable[[], Any],
+        reserve: int,
+        max_delay: float = 1.0,
+        bucket: SharedBucket | None = None,
+        get_backend: Callable[[], Any] | None = None,
+    ):
+        self._get_reddit = get_reddit
+        self.reserve = reserve
+        self.max_delay = max_delay
+        self.bucket = bucket
+        self._get_backend = get_backend or (lambda: None)
+
+    def _limiter(self):
+        core = getattr(self._get_reddit(), '_core', None)
+        return getattr(core, '_rate_limiter', None)
+
+    def remaining(self) -> float | None:
+        """Requests left in the current window, if reddit has told us yet."""
+        backend = self._get_backend()
+        if backend is not None:
+            return backend.remaining()
+
+        limiter = self._limiter()
+        reset = getattr(limiter, 'reset_timestamp', None)
+        if reset is None or reset <= time.time():
+            return None
+        return getattr(limiter, 'remaining', None)
+
+    def allows_passive(self) -> bool:
+        """Tell if there's budget left for lookups nobody explicitly asked for."""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= self.reserve:
+            return False
+
+        next_request = getattr(self._limiter(), 'next_request_timestamp', None)
+        if next_request is not None and next_request - time.time() > self.max_delay:
+            # prawcore would sleep before the request; don't hold a worker
+            return False
+
+        if self.bucket is not None and self.bucket.delay() > self.max_delay:
+            # other processes are using up the shared budget
+            return False
+
+        return True
+
+
+class SharedBucket:
+    """Token bucket shared by every process that uses the same state file.
+
+    :param filename: path to the state file; created if needed
+    :param rate: requests allowed per second, across all processes
+    :param burst: requests that may be made back to back after a lull
+    :param timer: wall clock, mostly useful for tests
+    :param sleep: sleep function, mostly useful for tests
+
+    This is the generic cell rate algorithm: the file holds the time at which
+    the bucket will next be empty, and each request pushes it back by
+    ``1 / rate``. Callers claim their slot under an exclusive ``flock()`` and
+    only then sleep until it comes, so requests are served in the order they
+    were made, whichever process made them.
+
+    Once closed, the bucket lets everything through, so jobs still draining
+    at shutdown don't fail.
+    """
+    def __init__(
+        self,
+        filename: str,
+        rate: float,
+        burst: int = 1,
+        timer: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if fcntl is None:
+            raise RuntimeError('A shared rate limit needs fcntl.flock()')
+        self.interval = 1 / rate
+        self.tolerance = self.interval * max(burst - 1, 0)
+        self._timer = timer
+        self._sleep = sleep
+        # flock() doesn't exclude threads sharing the file, hence a lock too
+        self._lock = threading.Lock()
+        self._fd: int | None = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def _locked(self) -> Iterator[int | None]:
+        with self._lock:
+            fd = self._fd
+            if fd is None:
+                yield None
+                return
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield fd
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(fd: int) -> float:
+        data = os.pread(fd, STATE.size, 0)
+        return STATE.unpack(data)[0] if len(data) == STATE.size else 0.0
+
+    def delay(self) -> float:
+        """Tell how long a request made now would have to wait."""
+        with self._locked() as fd:
+            if fd is None:
+                return 0.0
+            empty_at = self._read(fd)
+        return max(empty_at - self.tolerance - self._timer(), 0.0)
+
+    def reserve(self) -> float:
+        """Claim the next free slot; returns how long to wait for it."""
+        with self._locked() as fd:
+            if fd is None:
+                return 0.0
+            now = self._timer()
+            empty_at = max(self._read(fd), now)
+            os.pwrite(fd, STATE.pack(empty_at + self.interval), 0)
+        return max(empty_at - self.tolerance - now, 0.0)
+
+    def acquire(self) -> float:
+        """Wait for a slot to make a request in; returns the seconds waited."""
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def throttle(session, bucket: SharedBucket, on_wait: Callable[[float], None]):
+    """Make every request sent through ``session`` wait for ``bucket`` first.
+
+    ``on_wait`` is called with how long each request waited.
+    """
+    request = session.request
+
+    @functools.wraps(request)
+    def wrapper(*args, **kwargs):
+        on_wait(bucket.acquire())
+        return request(*args, **kwargs)
+
+    session.request = wrapper
@@ -0,0 +1,248 @@
+"""Compact metadata records for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+PRAW objects carry a reference to the client and every field reddit returned;
+these records keep only what the plugin renders, so they are cheap to cache.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import NamedTuple, Optional
+
+
+HOSTED_IMAGE = re.compile(
+    r'https?://(?:i|preview)\.redd\.it/(?:[\w%]+-)*(?P<image>[^-?/.\s]+)')
+
+
+class PostInfo(NamedTuple):
+    id: str
+    title: str
+    flair: Optional[str]
+    subreddit: str
+    is_self: bool
+    url: str
+    over_18: bool
+    spoiler: bool
+    author: Optional[str]
+    created_utc: float
+    score: int
+    upvote_ratio: float
+    num_comments: int
+    shortlink: Optional[str]
+
+    @classmethod
+    def from_submission(cls, s) -> PostInfo:
+        """Build a record from a PRAW ``Submission``, fetching it if needed."""
+        try:
+            shortlink = s.shortlink
+        except AttributeError:
+            shortlink = None
+
+        return cls(
+            id=s.id,
+            title=s.title,
+            flair=s.link_flair_text,
+            subreddit=s.subreddit.display_name,
+            is_self=s.is_self,
+            url=s.url,
+            over_18=s.over_18,
+            spoiler=s.spoiler,
+            author=s.author.name if s.author else None,
+            created_utc=s.created_utc,
+            score=s.score,
+            upvote_ratio=s.upvote_ratio,
+            num_comments=s.num_comments,
+            shortlink=shortlink,
+        )
+
+    @classmethod
+    def from_data(cls, data: dict) -> PostInfo:
+        """Build a record from a submission's JSON, as reddit's API returns it."""
+        return cls(
+            id=data['id'],
+            title=data['title'],
+            flair=data.get('link_flair_text'),
+            subreddit=data['subreddit'],
+            is_self=data['is_self'],
+            url=data['url'],
+            over_18=data['over_18'],
+            spoiler=data['spoiler'],
+            author=author_name(data),
+            created_utc=data['created_utc'],
+            score=data['score'],
+            upvote_ratio=data['upvote_ratio'],
+            num_comments=data['num_comments'],
+            shortlink='https://redd.it/' + data['id'],
+        )
+
+
+def author_name(data: dict) -> Optional[str]:
+    """Get the author of a post or comment's JSON; ``None`` if deleted, like PRAW."""
+    author = data.get('author')
+    return None if author in (None, '[deleted]') else author
+
+
+def image_ids(s) -> set[str]:
+    """Get the IDs of all reddit-hosted images in a fetched ``Submission``.
+
+    IDs are returned without their file extension, since the same image can
+    be linked as e.g. ``.jpg`` or ``.png``.
+    """
+    # only look at what was fetched: reddit leaves these out when they don't
+    # apply, and asking a lazy PRAW object for them would fetch it again
+    return image_ids_from_data(vars(s), s.url)
+
+
+def image_ids_from_data(data: dict, url: Optional[str] = None) -> set[str]:
+    """Like :func:`image_ids`, from a submission's JSON."""
+    urls = [url or data['url']]
+    for image in (data.get('preview') or {}).get('images', ()):
+        urls.append(image.get('source', {}).get('url', ''))
+
+    ids = {
+        match.group('image')
+        for match in map(HOSTED_IMAGE.match, urls)
+        if match
+    }
+
+    # gallery items are keyed by their i.redd.it image ID
+    ids.update(data.get('media_metadata') or ())
+
+    return ids
+
+
+class CommentInfo(NamedTuple):
+    id: str
+    link_id: str
+    author: Optional[str]
+    score: int
+    created_utc: float
+    body: str
+
+    @classmethod
+    def from_comment(cls, c) -> CommentInfo:
+        """Build a record from a PRAW ``Comment``, fetching it if needed."""
+        return cls(
+            id=c.id,
+            link_id=c.link_id,
+            author=c.author.name if c.author else None,
+            score=c.score,
+            created_utc=c.created_utc,
+            body=c.body,
+        )
+
+    @classmethod
+    def from_data(cls, data: dict) -> CommentInfo:
+        """Build a record from a comment's JSON, as reddit's API returns it."""
+        return cls(
+            id=data['id'],
+            link_id=data['link_id'],
+            author=author_name(data),
+            score=data['score'],
+            created_utc=data['created_utc'],
+            body=data['body'],
+        )
+
+
+class SubredditInfo(NamedTuple):
+    name: str  # display_name_prefixed
+    path: str  # URL path, e.g. /r/name/
+    over18: bool
+    subscribers: int
+    created_utc: float
+    title: str
+    public_description: str
+
+    @classmethod
+    def from_subreddit(cls, s) -> SubredditInfo:
+        """Build a record from a PRAW ``Subreddit``, fetching it if needed."""
+        return cls(
+            name=s.display_name_prefixed,
+            path=s.url,
+            over18=s.over18,
+            subscribers=s.subscribers,
+            created_utc=s.created_utc,
+            title=s.title,
+            public_description=s.public_description,
+        )
+
+    @classmethod
+    def from_data(cls, data: dict) -> SubredditInfo:
+        """Build a record from a subreddit's JSON, as reddit's API returns it."""
+        return cls(
+            name=data['display_name_prefixed'],
+            path=data['url'],
+            over18=data['over18'],
+            subscribers=data['subscribers'],
+            created_utc=data['created_utc'],
+            title=data['title'],
+            public_description=data['public_description'],
+        )
+
+
+class RedditorInfo(NamedTuple):
+    name: str
+    created_utc: float
+    is_gold: bool
+    is_employee: bool
+    is_mod: bool
+    link_karma: int
+    comment_karma: int
+
+    @classmethod
+    def from_redditor(cls, u) -> RedditorInfo:
+        """Build a record from a PRAW ``Redditor``, fetching it if needed."""
+        created_utc = u.created_utc  # fetch first, to get the canonical name
+        return cls(
+            name=u.name,
+            created_utc=created_utc,
+            is_gold=u.is_gold,
+            is_employee=u.is_employee,
+            is_mod=u.is_mod,
+            link_karma=u.link_karma,
+            comment_karma=u.comment_karma,
+        )
+
+    @classmethod
+    def from_data(cls, data: dict) -> RedditorInfo:
+        """Build a record from a Redditor's JSON, as reddit's API returns it."""
+        return cls(
+            name=data['name'],
+            created_utc=data['created_utc'],
+            is_gold=data['is_gold'],
+            is_employee=data['is_employee'],
+            is_mod=data['is_mod'],
+            link_karma=data['link_karma'],
+            comment_karma=data['comment_karma'],
+        )
+
+
+NOT_FOUND = 'not found'
+PRIVATE = 'private'
+BANNED = 'banned'
+
+
+class Missing(NamedTuple):
+    """Negative lookup result, so unavailable names can be cached too."""
+    reason: str  # one of NOT_FOUND, PRIVATE, BANNED
+
+
+RECORDS = {
+    cls.__name__: cls
+    for cls in (PostInfo, CommentInfo, SubredditInfo, RedditorInfo, Missing)
+}
+
+
+def dump(info) -> str:
+    """Serialize a record to JSON, e.g. to keep it on disk."""
+    return json.dumps([type(info).__name__, *info])
+
+
+def load(text: str):
+    """Rebuild a record serialized by :func:`dump`."""
+    name, *fields = json.loads(text)
+    return RECORDS[name](*fields)
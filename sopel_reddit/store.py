@@ -0,0 +1,331 @@
+"""Persistent storage for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from typing import Iterable
+
+
+IMAGE = 'image'
+SHARE = 'share'
+VIDEO = 'video'
+
+
+def connect(filename: str | None) -> sqlite3.Connection:
+    """Open the plugin's SQLite file (or an in-memory database)."""
+    conn = sqlite3.connect(
+        filename or ':memory:',
+        check_same_thread=False,
+        isolation_level=None,  # autocommit; we only do single statements
+    )
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class IdIndex:
+    """Map external IDs (e.g. image IDs) to reddit IDs, in a SQLite file.
+
+    :param filename: path to the database file; ``None`` keeps the index in
+                     memory only
+
+    Mappings are stored by ``kind`` so one file can hold several kinds of
+    index. The first mapping recorded for a key wins: the things they
+    describe don't change. They are kept until :meth:`compact` drops them.
+    """
+    def __init__(self, filename: str | None):
+        self._conn = connect(filename)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS ids ('
+                'kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                'added REAL NOT NULL DEFAULT 0, '
+                'PRIMARY KEY (kind, key)) WITHOUT ROWID'
+            )
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(ids)')]
+            if 'added' not in columns:
+                # index from an older version; its mappings start aging now
+                self._conn.execute('BEGIN')
+                self._conn.execute(
+                    'ALTER TABLE ids ADD COLUMN added REAL NOT NULL DEFAULT 0')
+                self._conn.execute('UPDATE ids SET added = ?', (time.time(),))
+                self._conn.execute('COMMIT')
+
+    def get(self, kind: str, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM ids WHERE kind = ? AND key = ?',
+                (kind, key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, kind: str, key: str, value: str):
+        self.update(kind, ((key, value),))
+
+    def update(self, kind: str, items: Iterable[tuple[str, str]]):
+        now = time.time()
+        rows = [(kind, key, value, now) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO ids (kind, key, value, added) '
+                'VALUES (?, ?, ?, ?)',
+                rows,
+            )
+            self._conn.execute('COMMIT')
+
+    def compact(self, max_age: float, max_rows: int) -> int:
+        """Drop mappings older than ``max_age`` seconds (0 keeps them all),
+        then the oldest beyond ``max_rows`` of each kind.
+
+        Returns how many mappings were dropped.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN')
+            removed = 0
+            if max_age > 0:
+                removed += self._conn.execute(
+                    'DELETE FROM ids WHERE added < ?',
+                    (time.time() - max_age,),
+                ).rowcount
+            removed += _trim(self._conn, 'ids', 'added', max_rows)
+            self._conn.execute('COMMIT')
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SnapshotStore:
+    """Serialized metadata records, each kept until it expires.
+
+    :param filename: path to the database file
+
+    Records are stored by ``kind`` and ``key``, like in a
+    :class:`~.cache.TTLCache`, but expiry times are wall-clock timestamps so
+    they survive restarts.
+    """
+    def __init__(self, filename: str | None):
+        self._conn = connect(filename)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshots ('
+                'kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                'expires REAL NOT NULL, '
+                'PRIMARY KEY (kind, key)) WITHOUT ROWID'
+            )
+
+    def get(self, kind: str, key: str) -> tuple[str, float] | None:
+        """Get a live record and the seconds it has left, or ``None``."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires FROM snapshots '
+                'WHERE kind = ? AND key = ? AND expires > ?',
+                (kind, key, now),
+            ).fetchone()
+        return (row[0], row[1] - now) if row else None
+
+    def set(self, kind: str, key: str, value: str, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO snapshots (kind, key, value, expires) '
+                'VALUES (?, ?, ?, ?)',
+                (kind, key, value, time.time() + ttl),
+            )
+
+    def load(self, kind: str, limit: int) -> list[tuple[str, str, float]]:
+        """Get up to ``limit`` live ``(key, value, seconds left)`` records,
+        those expiring last first.
+        """
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value, expires - now)
+                for key, value, expires in self._conn.execute(
+                    'SELECT key, value, expires FROM snapshots '
+                    'WHERE kind = ? AND expires > ? '
+                    'ORDER BY expires DESC LIMIT ?',
+                    (kind, now, limit),
+                )
+            ]
+
+    def compact(self, max_rows: int) -> int:
+        """Drop expired records, then those expiring first beyond
+        ``max_rows`` of each kind.
+
+        Returns how many records were dropped.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN')
+            removed = self._conn.execute(
+                'DELETE FROM snapshots WHERE expires <= ?', (time.time(),),
+            ).rowcount
+            removed += _trim(self._conn, 'snapshots', 'expires', max_rows)
+            self._conn.execute('COMMIT')
+            # compaction is a good time to fold the WAL back into the file
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _trim(conn: sqlite3.Connection, table: str, order: str, max_rows: int) -> int:
+    """Keep only the ``max_rows`` rows of each kind that sort last by ``order``."""
+    removed = 0
+    kinds = [row[0] for row in conn.execute(
+        'SELECT kind FROM {} GROUP BY kind HAVING COUNT(*) > ?'.format(table),
+        (max_rows,),
+    )]
+    for kind in kinds:
+        removed += conn.execute(
+            'DELETE FROM {table} WHERE kind = ? AND key NOT IN ('
+            'SELECT key FROM {table} WHERE kind = ? '
+            'ORDER BY {order} DESC LIMIT ?)'.format(table=table, order=order),
+            (kind, kind, max_rows),
+        ).rowcount
+    return removed
+
+
+class TokenStore:
+    """API access tokens, so they outlive restarts.
+
+    :param filename: path to the database file; ``None`` keeps them in
+                     memory only
+
+    Tokens are stored by ``key`` (e.g. app ID and API URL), each with the
+    UNIX time it expires at and its space-separated scopes.
+    """
+    def __init__(self, filename: str | None):
+        self._conn = connect(filename)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS tokens ('
+                'key TEXT PRIMARY KEY, token TEXT NOT NULL, '
+                'expires REAL NOT NULL, scopes TEXT NOT NULL) WITHOUT ROWID'
+            )
+
+    def get(self, key: str) -> tuple[str, float, str] | None:
+        """Get ``(token, expires, scopes)`` for ``key``, unless it expired."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT token, expires, scopes FROM tokens '
+                'WHERE key = ? AND expires > ?',
+                (key, time.time()),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, key: str, token: str, expires: float, scopes: str = '*'):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tokens (key, token, expires, scopes) '
+                'VALUES (?, ?, ?, ?)',
+                (key, token, expires, scopes),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WatchStore:
+    """Feed subscriptions, and the IDs of posts already announced.
+
+    :param filename: path to the database file; ``None`` keeps everything in
+                     memory only
+    :param seen_size: how many post IDs to remember
+
+    Seen IDs are kept in a ring of ``seen_size`` slots, so recording one is a
+    single-row write however many are remembered.
+    """
+    def __init__(self, filename: str | None, seen_size: int):
+        self._conn = connect(filename)
+        self._lock = threading.Lock()
+        self.seen_size = seen_size
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS watches ('
+                'channel TEXT NOT NULL, subreddit TEXT NOT NULL, '
+                'added REAL NOT NULL, '
+                'PRIMARY KEY (channel, subreddit)) WITHOUT ROWID'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen ('
+                'slot INTEGER PRIMARY KEY, seq INTEGER NOT NULL, '
+                'id TEXT NOT NULL)'
+            )
+            # re-slot what's there, in case seen_size changed since
+            rows = self._conn.execute(
+                'SELECT seq, id FROM seen ORDER BY seq DESC LIMIT ?',
+                (seen_size,),
+            ).fetchall()
+            self._seq = rows[0][0] + 1 if rows else 0
+            self._conn.execute('BEGIN')
+            self._conn.execute('DELETE FROM seen')
+            self._conn.executemany(
+                'INSERT INTO seen (slot, seq, id) VALUES (?, ?, ?)',
+                [(seq % seen_size, seq, id_) for seq, id_ in rows],
+            )
+            self._conn.execute('COMMIT')
+
+    def watches(self) -> list[tuple[str, str, float]]:
+        """Get every ``(channel, subreddit, added)`` subscription."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT channel, subreddit, added FROM watches').fetchall()
+
+    def add_watch(self, channel: str, subreddit: str, added: float):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO watches (channel, subreddit, added) '
+                'VALUES (?, ?, ?)',
+                (channel, subreddit, added),
+            )
+
+    def remove_watch(self, channel: str, subreddit: str):
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM watches WHERE channel = ? AND subreddit = ?',
+                (channel, subreddit),
+            )
+
+    def seen(self) -> list[str]:
+        """Get the remembered post IDs, oldest first."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT id FROM seen ORDER BY seq')]
+
+    def add_seen(self, ids: Iterable[str]):
+        with self._lock:
+            rows = []
+            for id_ in ids:
+                rows.append((self._seq % self.seen_size, self._seq, id_))
+                self._seq += 1
+            if not rows:
+                return
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO seen (slot, seq, id) VALUES (?, ?, ?)',
+                rows,
+            )
+            self._conn.execute('COMMIT')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
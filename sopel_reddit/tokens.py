@@ -0,0 +1,73 @@
+"""Access token upkeep for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+PRAW gets its app-only access token with the first request it makes, and
+again whenever it expires, making that request wait for an extra round trip.
+These helpers let the plugin hand PRAW a token saved before a restart, save
+every new one, and tell when one should be renewed ahead of time.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable
+
+from .store import TokenStore
+
+
+REFRESH_MARGIN = 600
+"""Seconds before it expires that a token is renewed in the background."""
+
+
+def token_key(client_id: str, oauth_url: str) -> str:
+    """Key to store tokens under; a token is only good for the API it came from."""
+    return '{} {}'.format(client_id, oauth_url.rstrip('/'))
+
+
+def renewal_due(expires: float, margin: float = REFRESH_MARGIN) -> bool:
+    """Tell if a token expiring at ``expires`` (a UNIX time) should be renewed."""
+    return expires - margin <= time.time()
+
+
+def praw_authorizer(reddit: Any) -> Any:
+    """Get the prawcore authorizer holding a PRAW instance's app-only token.
+
+    Returns ``None`` if PRAW keeps it somewhere this doesn't know about.
+    """
+    core = getattr(reddit, '_read_only_core', None)
+    authorizer = getattr(core, '_authorizer', None)
+    if authorizer is None or not hasattr(authorizer, 'refresh'):
+        return None
+    return authorizer
+
+
+def authorizer_expires(authorizer: Any) -> float:
+    """Get when the authorizer's token expires; 0 if it has none."""
+    if authorizer.access_token is None:
+        return 0.0
+    return getattr(authorizer, '_expiration_timestamp', 0.0)
+
+
+def keep_tokens(authorizer: Any, store: TokenStore, key: str):
+    """Give ``authorizer`` the token saved under ``key``, and save its new ones."""
+    saved = store.get(key)
+    if saved is not None and authorizer.access_token is None:
+        token, expires, scopes = saved
+        authorizer.access_token = token
+        authorizer._expiration_timestamp = expires
+        authorizer.scopes = set(scopes.split())
+
+    refresh: Callable[[], None] = authorizer.refresh
+
+    def refresh_and_save():
+        refresh()
+        store.set(
+            key,
+            authorizer.access_token,
+            authorizer._expiration_timestamp,
+            ' '.join(sorted(authorizer.scopes or ())),
+        )
+
+    authorizer.refresh = refresh_and_save
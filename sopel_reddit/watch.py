@@ -0,0 +1,236 @@
+"""Subreddit feed watching for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+
+Channels subscribe to subreddits; the :class:`Watcher` packs all watched
+subreddits into groups that are each polled with one multireddit request
+(``r/a+b+c/new``), and adapts how often each group is polled to how often
+new posts show up in it.
+"""
+from __future__ import annotations
+
+from collections import deque
+import threading
+import time
+from typing import Callable, Iterable
+
+from .store import WatchStore
+
+
+PAGE_SIZE = 100
+"""Posts per poll; the most reddit returns in one listing."""
+TARGET_PER_POLL = PAGE_SIZE / 4
+"""New posts a poll should find, with room to spare for bursts."""
+RATE_SMOOTHING = 0.3
+"""Weight of the latest poll in a group's estimated post rate."""
+
+
+class SeenRing:
+    """Bounded set of IDs; once full, the oldest are forgotten first."""
+    def __init__(self, size: int, ids: Iterable[str] = ()):
+        self._ring: deque[str] = deque(maxlen=size)
+        self._ids: set[str] = set()
+        for id_ in ids:
+            self.add(id_)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, id_: str) -> bool:
+        """Remember ``id_``; returns ``False`` if it was already known."""
+        if id_ in self._ids:
+            return False
+        if len(self._ring) == self._ring.maxlen:
+            self._ids.discard(self._ring[0])
+        self._ring.append(id_)
+        self._ids.add(id_)
+        return True
+
+
+class Group:
+    """Subreddits polled together, and when to poll them next."""
+    def __init__(self, names: tuple[str, ...], interval: float, next_poll: float):
+        self.names = names
+        self.interval = interval
+        self.next_poll = next_poll
+        self.last_poll: float | None = None
+        self.rate: float | None = None  # new posts per second
+
+    def __repr__(self):
+        return '<Group %s every %.0fs>' % ('+'.join(self.names), self.interval)
+
+    @property
+    def path(self) -> str:
+        return '+'.join(self.names)
+
+
+class Watcher:
+    """Subscriptions of channels to subreddits, and their polling schedule.
+
+    :param store: where subscriptions and seen post IDs are persisted
+    :param group_size: most subreddits to poll in one request
+    :param min_interval: shortest time (in seconds) between polls of a group
+    :param max_interval: longest time (in seconds) between polls of a group
+    :param timer: clock to schedule polls with
+
+    Subreddit names are matched case-insensitively; channel names are used
+    as given.
+    """
+    def __init__(
+        self,
+        store: WatchStore,
+        group_size: int,
+        min_interval: float,
+        max_interval: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self._store = store
+        self._lock = threading.Lock()
+        self.group_size = max(group_size, 1)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self._timer = timer
+        # subreddit (lowercase) -> {channel: time subscribed}
+        self._watches: dict[str, dict[str, float]] = {}
+        self._names: dict[str, str] = {}  # lowercase -> display name
+        self.groups: list[Group] = []
+        self.seen = SeenRing(store.seen_size, store.seen())
+
+        for channel, subreddit, added in store.watches():
+            self._watches.setdefault(subreddit.lower(), {})[channel] = added
+            self._names[subreddit.lower()] = subreddit
+        self._regroup()
+
+    def add(self, channel: str, subreddit: str, added: float | None = None) -> bool:
+        """Subscribe ``channel`` to ``subreddit``; ``False`` if it already was.
+
+        Only posts made after ``added`` (a UNIX timestamp, by default now)
+        are announced to the channel.
+        """
+        key = subreddit.lower()
+        added = time.time() if added is None else added
+        with self._lock:
+            channels = self._watches.setdefault(key, {})
+            if channel in channels:
+                return False
+            channels[channel] = added
+            self._names[key] = subreddit
+            self._store.add_watch(channel, subreddit, added)
+            if len(channels) == 1:
+                self._regroup()
+        return True
+
+    def remove(self, channel: str, subreddit: str) -> bool:
+        """Unsubscribe ``channel`` from ``subreddit``; ``False`` if it wasn't."""
+        key = subreddit.lower()
+        with self._lock:
+            channels = self._watches.get(key, {})
+            if channel not in channels:
+                return False
+            del channels[channel]
+            self._store.remove_watch(channel, self._names[key])
+            if not channels:
+                del self._watches[key]
+                del self._names[key]
+                self._regroup()
+        return True
+
+    def watched_by(self, channel: str) -> list[str]:
+        """Get the names of the subreddits ``channel`` watches."""
+        with self._lock:
+            return sorted(
+                self._names[key]
+                for key, channels in self._watches.items()
+                if channel in channels
+            )
+
+    def subscribers(self, subreddit: str) -> dict[str, float]:
+        """Get the channels watching ``subreddit``, with when they started."""
+        with self._lock:
+            return dict(self._watches.get(subreddit.lower(), {}))
+
+    def due(self) -> list[Group]:
+        """Get the groups that should be polled now."""
+        now = self._timer()
+        with self._lock:
+            return [group for group in self.groups if group.next_poll <= now]
+
+    def postpone(self, group: Group):
+        """Skip a poll of ``group``, e.g. when short on API requests."""
+        group.next_poll = self._timer() + group.interval
+
+    def record(self, group: Group, ids: Iterable[str], slowdown: float = 1.0) -> list[str]:
+        """Record a poll of ``group`` that returned posts ``ids``.
+
+        Returns the IDs that weren't seen before, and schedules the group's
+        next poll according to how many there were. ``slowdown`` stretches
+        the interval, e.g. when the rate-limit budget runs low.
+        """
+        ids = list(ids)
+        now = self._timer()
+        with self._lock:
+            new = [id_ for id_ in ids if self.seen.add(id_)]
+        self._store.add_seen(new)
+
+        if group.last_poll is None:
+            # the first poll only tells what was already there
+            interval = group.interval
+        elif len(ids) >= PAGE_SIZE and len(new) == len(ids):
+            # a full page of new posts; there may have been more
+            interval = self.min_interval
+        else:
+            observed = len(new) / max(now - group.last_poll, 1.0)
+            if group.rate is None:
+                group.rate = observed
+            else:
+                group.rate += RATE_SMOOTHING * (observed - group.rate)
+            if group.rate:
+                interval = TARGET_PER_POLL / group.rate
+            else:
+                interval = group.interval * 2
+        group.last_poll = now
+
+        group.interval = min(max(interval * slowdown, self.min_interval), self.max_interval)
+        group.next_poll = now + group.interval
+        return new
+
+    def failed(self, group: Group):
+        """Back off after a failed poll of ``group``."""
+        group.interval = min(group.interval * 2, self.max_interval)
+        group.next_poll = self._timer() + group.interval
+
+    def _regroup(self):
+        """Pack the watched subreddits into groups, keeping known schedules."""
+        old = {group.names: group for group in self.groups}
+        names = sorted(self._names[key] for key in self._watches)
+        chunks = [
+            tuple(names[i:i + self.group_size])
+            for i in range(0, len(names), self.group_size)
+        ]
+        now = self._timer()
+        groups = []
+        for n, chunk in enumerate(chunks):
+            group = old.get(chunk)
+            if group is None:
+                # spread first polls out, rather than all at once
+                group = Group(
+                    chunk, self.min_interval,
+                    now + self.min_interval * n / len(chunks))
+                # a chunk that merely shifted keeps its predecessor's pace
+                for previous in old.values():
+                    if chunk[0] in previous.names:
+                        group.interval = previous.interval
+                        group.next_poll = previous.next_poll
+                        group.last_poll = previous.last_poll
+                        group.rate = previous.rate
+                        break
+            groups.append(group)
+        self.groups = groups
+
+    def close(self):
+        self._store.close()
@@ -0,0 +1,177 @@
+"""Concurrency helpers for Sopel's reddit plugin
+
+Licensed under the Eiffel Forum License 2.
+
+https://sopel.chat
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+from sopel.tools import get_logger
+
+
+LOGGER = get_logger('reddit')
+
+
+class SingleFlight:
+    """Let concurrent callers asking for the same key share a single call.
+
+    While a call for a given key is running, other callers with the same key
+    wait for it and get its result (or exception) instead of making their own.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+EXPLICIT = 0
+"""Priority of work a user explicitly asked for, e.g. a command."""
+PASSIVE = 1
+"""Priority of automatic expansions of links and mentions."""
+
+
+class WorkerPool:
+    """Fixed number of threads running jobs from a bounded priority queue.
+
+    :param workers: number of worker threads
+    :param max_queue: how many passive jobs may wait for a free worker; once
+                      the queue is full, :meth:`submit` refuses new ones
+    :param allows_passive: called before each passive job runs; if it
+                           returns ``False`` the job is dropped (and its
+                           ``on_drop`` callback called)
+
+    Explicit jobs always run before passive ones, and are never refused
+    until the pool is shut down.
+    """
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        allows_passive: Callable[[], bool] | None = None,
+    ):
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._max_queue = max_queue
+        self._allows_passive = allows_passive or (lambda: True)
+        self._counter = itertools.count()
+        self.dropped = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(
+                target=self._work, name='reddit-worker-%d' % n, daemon=True)
+            for n in range(max(workers, 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        priority: int = PASSIVE,
+        on_drop: Callable[[], None] | None = None,
+    ) -> bool:
+        """Queue ``func(*args)``; returns ``False`` if the job was refused.
+
+        ``on_drop`` is called if the job is accepted, but dropped before it
+        runs.
+        """
+        if self._closed:
+            return False
+        if priority != EXPLICIT and self._queue.qsize() >= self._max_queue:
+            self.dropped += 1
+            return False
+        self._queue.put((priority, next(self._counter), func, args, on_drop))
+        return True
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def join(self):
+        """Wait until every job queued so far has run (or been dropped)."""
+        self._queue.join()
+
+    def shutdown(self, timeout: float = 0.0) -> bool:
+        """Stop the workers once they finish the explicit jobs already queued.
+
+        New jobs are refused, and queued passive jobs dropped. Waits up to
+        ``timeout`` seconds for the workers to stop; returns whether they
+        all did.
+        """
+        self._closed = True
+        kept = []
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job[0] == EXPLICIT:
+                kept.append(job)
+            elif job[2] is not None:
+                self._drop(job[4])
+            self._queue.task_done()
+        for job in kept:
+            self._queue.put(job)
+
+        for _ in self._threads:
+            # sorts after every real job
+            self._queue.put((PASSIVE + 1, next(self._counter), None, (), None))
+
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def _work(self):
+        while True:
+            priority, _, func, args, on_drop = self._queue.get()
+            try:
+                if func is None:
+                    return
+
+                if priority != EXPLICIT and not self._allows_passive():
+                    LOGGER.debug('Rate limit budget low; dropping passive job')
+                    self._drop(on_drop)
+                    continue
+
+                try:
+                    func(*args)
+                except Exception:
+                    LOGGER.exception('Unhandled error in reddit worker')
+            finally:
+                self._queue.task_done()
+
+    def _drop(self, on_drop: Callable[[], None] | None):
+        self.dropped += 1
+        if on_drop is not None:
+            try:
+                on_drop()
+            except Exception:
+                LOGGER.exception('Unhandled error dropping a reddit job')
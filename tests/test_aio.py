@@ -0,0 +1,159 @@
+"""Tests for the reddit plugin's asyncio backend"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+
+from sopel_reddit.aio import AsyncBackend  # noqa: E402
+
+
+THING = {'kind': 't3', 'data': {'name': 't3_abc', 'id': 'abc'}}
+
+
+@pytest.fixture
+def server():
+    """A stand-in for reddit, served from the backend's own event loop."""
+    state = {'requests': [], 'tokens': 0, 'expired': set()}
+
+    async def access_token(request):
+        state['tokens'] += 1
+        return web.json_response(
+            {'access_token': 'token%d' % state['tokens'], 'expires_in': 3600})
+
+    async def info(request):
+        state['requests'].append(request.query['id'])
+        token = request.headers['Authorization'].split()[1]
+        if token in state['expired']:
+            return web.json_response({'error': 401}, status=401)
+        ids = request.query['id'].split(',')
+        children = [THING] if 't3_abc' in ids else []
+        return web.json_response(
+            {'kind': 'Listing', 'data': {'children': children}},
+            headers={'x-ratelimit-remaining': '42', 'x-ratelimit-reset': '60'})
+
+    async def about(request):
+        raise web.HTTPFound('/subreddits/search')
+
+    async def video(request):
+        raise web.HTTPFound('https://www.reddit.com/r/sopel/comments/abc/video/')
+
+    app = web.Application()
+    app.router.add_post('/api/v1/access_token', access_token)
+    app.router.add_get('/api/info', info)
+    app.router.add_get('/r/{name}/about', about)
+    app.router.add_route('HEAD', '/video/{id}', video)
+    state['app'] = app
+    return state
+
+
+@pytest.fixture
+def backend(server):
+    backend = AsyncBackend('test', 'app', 'http://unused', 'http://unused', batch_window=0.05)
+
+    async def start():
+        runner = web.AppRunner(server['app'])
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        backend.oauth_url = backend.reddit_url = 'http://127.0.0.1:%d' % port
+        return runner
+
+    runner = backend.submit(start()).result()
+    yield backend
+    backend.submit(runner.cleanup()).result()
+    backend.close()
+
+
+def test_info_batches_lookups(backend, server):
+    async def lookups():
+        return await asyncio.gather(backend.info('t3_abc'), backend.info('t3_nope'))
+
+    found, missing = backend.submit(lookups()).result(5)
+    assert found == THING['data']
+    assert missing is None
+    assert server['requests'] == ['t3_abc,t3_nope']
+    assert server['tokens'] == 1
+
+
+def test_remaining_requests_from_headers(backend):
+    assert backend.remaining() is None
+    backend.submit(backend.info('t3_abc')).result(5)
+    assert backend.remaining() == 42.0
+
+    backend._reset_at = time.time() - 1
+    assert backend.remaining() is None
+
+
+def test_expired_token_is_renewed(backend, server):
+    assert backend.submit(backend.info('t3_abc')).result(5) is not None
+    server['expired'].add('token1')
+    assert backend.submit(backend.info('t3_abc')).result(5) is not None
+    assert server['tokens'] == 2
+
+
+def test_redirects_are_not_followed(backend):
+    response = backend.submit(backend.api('/r/nope/about')).result(5)
+    assert response.status == 302
+
+
+def test_head_location(backend):
+    location = backend.submit(backend.head(backend.reddit_url + '/video/abc')).result(5)
+    assert location == 'https://www.reddit.com/r/sopel/comments/abc/video/'
+    # not a redirect
+    assert backend.submit(backend.head(backend.reddit_url + '/nope')).result(5) == ''
+
+
+def test_coalesce_shares_one_run(backend):
+    runs = []
+
+    async def lookup(name):
+        runs.append(name)
+        await asyncio.sleep(0.01)
+        return name.upper()
+
+    async def lookups():
+        return await asyncio.gather(*(
+            backend.coalesce(('lookup', name), lookup, name)
+            for name in ('a', 'a', 'b')
+        ))
+
+    assert backend.submit(lookups()).result(5) == ['A', 'A', 'B']
+    assert runs == ['a', 'b']
+
+
+def test_close_cancels_pending_lookups(server):
+    backend = AsyncBackend('test', 'app', 'http://unused', 'http://unused')
+    future = backend.submit(asyncio.sleep(60))
+    backend.close()
+    assert future.cancelled()
+    backend.close()  # twice is fine
+
+
+def test_saved_token_is_used_and_new_ones_reported(backend, server):
+    saved = []
+    backend._token, backend._token_expires = 'saved', time.time() + 3600
+    backend._on_token = lambda token, expires: saved.append(token)
+    assert backend.submit(backend.info('t3_abc')).result(5) is not None
+    assert server['tokens'] == 0
+
+    backend.submit(backend.renew_token()).result(5)
+    assert server['tokens'] == 1
+    assert saved == ['token1']
+    assert backend.token_expires > time.time() + 3000
+
+
+def test_run_blocking_keeps_the_loop_free(backend):
+    async def both():
+        slow = asyncio.ensure_future(backend.run_blocking(time.sleep, 0.2))
+        started = time.monotonic()
+        await asyncio.sleep(0.01)
+        quick = time.monotonic() - started
+        await slow
+        return quick
+
+    assert backend.submit(both()).result(5) < 0.1
@@ -0,0 +1,70 @@
+"""Tests for the reddit plugin's request batching"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from sopel_reddit.batch import InfoBatcher
+
+
+class FakeInfo:
+    def __init__(self, known):
+        self.known = set(known)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, fullnames):
+        with self.lock:
+            self.calls.append(sorted(fullnames))
+        return [
+            SimpleNamespace(fullname=name)
+            for name in fullnames
+            if name in self.known
+        ]
+
+
+def test_concurrent_lookups_share_a_request():
+    fetch = FakeInfo(['t3_a', 't3_b', 't1_c'])
+    batcher = InfoBatcher(fetch, 0.2)
+    names = ['t3_a', 't3_b', 't1_c', 't3_a', 't3_missing']
+
+    with ThreadPoolExecutor(len(names)) as pool:
+        results = list(pool.map(batcher.get, names))
+
+    assert fetch.calls == [['t1_c', 't3_a', 't3_b', 't3_missing']]
+    assert [r and r.fullname for r in results] == [
+        't3_a', 't3_b', 't1_c', 't3_a', None]
+
+
+def test_full_batch_is_sent_early():
+    fetch = FakeInfo([])
+    batcher = InfoBatcher(fetch, 5.0, max_batch=2)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(batcher.get, ['t3_a', 't3_b']))
+
+    assert fetch.calls == [['t3_a', 't3_b']]
+    # didn't wait out the window
+    assert time.monotonic() - started < 1.0
+
+
+def test_max_batch_is_capped():
+    assert InfoBatcher(FakeInfo([]), 0.1, max_batch=500).max_batch == InfoBatcher.MAX_BATCH
+
+
+def test_errors_reach_every_waiter():
+    def fetch(fullnames):
+        raise RuntimeError('reddit is down')
+
+    batcher = InfoBatcher(fetch, 0.1)
+
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(batcher.get, name) for name in ('t3_a', 't3_b')]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
@@ -0,0 +1,90 @@
+"""Tests for the reddit plugin's known-subreddit index"""
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from sopel_reddit.bloom import BloomFilter, build_from_dump, dump_names
+
+
+def test_no_false_negatives():
+    bloom = BloomFilter.for_capacity(1000)
+    names = ['sub%d' % n for n in range(1000)]
+    bloom.update(names)
+    assert all(name in bloom for name in names)
+    assert 'SUB42' in bloom
+    assert 990 <= len(bloom) <= 1000  # false positives look like duplicates
+
+
+def test_false_positive_rate():
+    bloom = BloomFilter.for_capacity(1000, error_rate=0.01)
+    bloom.update('sub%d' % n for n in range(1000))
+    false_positives = sum('other%d' % n in bloom for n in range(10000))
+    assert false_positives < 250
+
+
+def test_only_complete_filters_rule_out():
+    bloom = BloomFilter.for_capacity(10)
+    bloom.add('sopel')
+    assert not bloom.rules_out('typo')
+
+    bloom.complete = True
+    assert bloom.rules_out('typo')
+    assert not bloom.rules_out('Sopel')
+
+
+def test_add_reports_new_names():
+    bloom = BloomFilter.for_capacity(10)
+    assert not bloom.dirty
+    assert bloom.add('sopel')
+    assert not bloom.add('SOPEL')
+    assert bloom.dirty
+
+
+def test_save_and_load(tmp_path):
+    filename = str(tmp_path / 'subs.bloom')
+    bloom = BloomFilter.for_capacity(100, complete=True)
+    bloom.update(['sopel', 'python'])
+    bloom.save(filename)
+    assert not bloom.dirty
+
+    loaded = BloomFilter.load(filename)
+    assert loaded.complete
+    assert len(loaded) == 2
+    assert 'python' in loaded
+    assert loaded.rules_out('typo')
+
+
+def test_load_empty_or_bad_file(tmp_path):
+    empty = tmp_path / 'empty.bloom'
+    empty.write_bytes(b'')
+    assert BloomFilter.load(str(empty)) is None
+
+    bad = tmp_path / 'bad.bloom'
+    bad.write_bytes(b'not a bloom filter at all, honest')
+    with pytest.raises(ValueError):
+        BloomFilter.load(str(bad))
+
+
+def test_dump_names():
+    dump = io.StringIO(
+        'name,subscribers\n'
+        'sopel,1234\n'
+        'r/Python\n'
+        '/r/AskReddit extra stuff\n'
+        '\n'
+        'x\n'
+        '# comment\n'
+    )
+    assert list(dump_names(dump)) == ['name', 'sopel', 'Python', 'AskReddit']
+
+
+def test_build_from_dump(tmp_path):
+    dump = tmp_path / 'subs.txt'
+    dump.write_text('sopel\npython\n')
+    bloom = build_from_dump(str(dump), capacity=1000)
+    assert bloom.complete
+    assert len(bloom) == 2
+    assert bloom.bits >= 9000  # sized for the capacity, not the dump
+    assert not bloom.rules_out('sopel')
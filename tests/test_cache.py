@@ -0,0 +1,87 @@
+"""Tests for the reddit plugin's caching helpers"""
+from __future__ import annotations
+
+from sopel_reddit.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = TTLCache(10, 60, timer=clock)
+    cache.set('abc', 1)
+
+    clock.now = 59
+    assert cache.get('abc') == 1
+
+    clock.now = 60
+    assert cache.get('abc') is None
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl():
+    clock = FakeClock()
+    cache = TTLCache(10, 60, timer=clock)
+    cache.set('short', 1, ttl=5)
+    cache.set('long', 2)
+
+    clock.now = 10
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+
+
+def test_lru_eviction():
+    cache = TTLCache(2, 60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'b' is now the least recently used
+    cache.set('c', 3)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_disabled():
+    cache = TTLCache(10, 0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+
+def test_stats():
+    cache = TTLCache(10, 60)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+
+    stats = cache.stats()
+    assert stats.hits == 2
+    assert stats.misses == 1
+    assert stats.size == 1
+    assert stats.maxsize == 10
+
+
+def test_add_only_if_absent():
+    clock = FakeClock()
+    cache = TTLCache(10, 60, timer=clock)
+    assert cache.add('abc', 1)
+    assert not cache.add('abc', 2)
+    assert cache.get('abc') == 1
+
+    clock.now = 60
+    assert cache.add('abc', 3)
+    assert cache.get('abc') == 3
+
+
+def test_add_disabled():
+    cache = TTLCache(10, 0)
+    assert cache.add('abc', 1)
+    assert cache.add('abc', 1)
+    assert len(cache) == 0
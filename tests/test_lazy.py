@@ -0,0 +1,22 @@
+"""Tests for the reddit plugin's deferred imports"""
+from __future__ import annotations
+
+import sys
+
+from sopel_reddit.lazy import LazyModule
+
+
+def test_imports_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    module = LazyModule('colorsys')
+    assert 'colorsys' not in sys.modules
+
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert 'colorsys' in sys.modules
+
+
+def test_plugin_defers_praw():
+    from sopel_reddit import plugin
+
+    assert isinstance(plugin.praw, LazyModule)
+    assert isinstance(plugin.prawcore, LazyModule)
@@ -0,0 +1,108 @@
+"""Tests for the reddit plugin's instrumentation"""
+from __future__ import annotations
+
+import pytest
+
+from sopel_reddit.cache import CacheStats
+from sopel_reddit.metrics import endpoint_name, Histogram, Metrics
+
+
+@pytest.mark.parametrize('url, name', (
+    ('https://oauth.reddit.com/api/info/?id=t3_abc', 'info'),
+    ('https://www.reddit.com/api/v1/access_token', 'access_token'),
+    ('https://oauth.reddit.com/r/all/search/?q=url%3Afoo', 'search'),
+    ('https://oauth.reddit.com/r/sopel/about/', 'subreddit_about'),
+    ('https://oauth.reddit.com/user/spez/about/', 'user_about'),
+    ('https://www.reddit.com/r/sopel/s/AbCdEf123', 'share'),
+    ('https://oauth.reddit.com/comments/abc/', 'comments'),
+    ('https://www.reddit.com/video/abc123', 'video'),
+    ('https://oauth.reddit.com/api/v1/me', 'other'),
+))
+def test_endpoint_name(url, name):
+    assert endpoint_name(url) == name
+
+
+def test_histogram_quantile():
+    hist = Histogram((0.1, 1.0))
+    assert hist.quantile(0.5) == 0.0
+
+    for value in (0.05, 0.05, 0.5, 5.0):
+        hist.observe(value)
+
+    assert hist.counts == [2, 1, 1]
+    assert hist.quantile(0.5) == 0.1
+    assert hist.quantile(0.75) == 1.0
+    assert hist.quantile(0.99) == float('inf')
+
+
+def test_timing_records_failures():
+    metrics = Metrics()
+    with metrics.timing('ok'):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timing('broken'):
+            raise ValueError
+
+    assert metrics.latency['ok'].count == 1
+    assert metrics.latency['broken'].count == 1
+    assert metrics.errors == {'broken': 1}
+
+
+def test_count_response_tracks_rate_limit():
+    metrics = Metrics()
+    metrics.count_response(
+        'GET', 'https://oauth.reddit.com/api/info/', 200,
+        {'x-ratelimit-remaining': '598.0'})
+    metrics.count_response(
+        'HEAD', 'https://www.reddit.com/video/abc', 301, {})
+
+    assert metrics.requests == {('GET', 'info'): 1, ('HEAD', 'video'): 1}
+    assert metrics.responses == {('info', 200): 1, ('video', 301): 1}
+    assert metrics.ratelimit_remaining == 598.0
+
+
+def test_prometheus_output():
+    metrics = Metrics()
+    metrics.observe('post_or_comment_info', 0.2)
+    metrics.count_not_found('post')
+    text = metrics.prometheus({'post_cache': CacheStats(3, 1, 2, 1000)})
+
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert (
+        'sopel_reddit_handler_seconds_bucket'
+        '{handler="post_or_comment_info",le="0.25"} 1'
+    ) in lines
+    assert (
+        'sopel_reddit_handler_seconds_bucket'
+        '{handler="post_or_comment_info",le="0.1"} 0'
+    ) in lines
+    assert 'sopel_reddit_not_found_total{kind="post"} 1' in lines
+    assert 'sopel_reddit_cache_hits_total{cache="post_cache"} 3' in lines
+    assert 'sopel_reddit_ratelimit_remaining' not in text
+
+
+def test_summary():
+    metrics = Metrics()
+    lines = metrics.summary({})
+    assert lines[0] == 'Handlers: none run yet'
+    assert 'Rate limit remaining: unknown' in lines[1]
+
+    metrics.observe('subreddit_info', 0.02, failed=True)
+    lines = metrics.summary({'post_cache': CacheStats(3, 1, 2, 1000)})
+    assert lines[0] == 'Handlers: subreddit_info 1× p50 0.025s p99 0.025s (1 errors)'
+    assert lines[3] == 'Caches: post_cache 2/1000 (75% hits)'
+
+
+def test_shared_ratelimit_waits():
+    metrics = Metrics()
+    assert 'Shared limit' not in metrics.summary({})[1]
+    assert 'ratelimit_wait' not in metrics.prometheus({})
+
+    metrics.observe_wait(0.0)
+    metrics.observe_wait(0.3)
+    assert metrics.summary({})[1].endswith(
+        ' | Shared limit waits: p50 0.005s p99 0.5s (0.3s total)')
+    lines = metrics.prometheus({}).splitlines()
+    assert 'sopel_reddit_ratelimit_wait_seconds_bucket{le="0.25"} 1' in lines
+    assert 'sopel_reddit_ratelimit_wait_seconds_count 2' in lines
@@ -0,0 +1,620 @@
+"""Tests for the reddit plugin's handlers, run on a mock bot"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+import datetime as dt
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from sopel.tools import time as sopel_time
+
+from sopel_reddit import plugin
+from sopel_reddit.snapshots import PostInfo, SubredditInfo
+from sopel_reddit.workers import EXPLICIT, PASSIVE
+
+
+TMP_CONFIG = """
+[core]
+owner = Admin
+nick = Sopel
+enable =
+    reddit
+host = irc.example.com
+homedir = {homedir}
+"""
+
+
+@pytest.fixture
+def mockbot(tmpdir, configfactory, botfactory):
+    settings = configfactory('default.ini', TMP_CONFIG.format(homedir=tmpdir))
+    bot = botfactory.preloaded(settings, ['reddit'])
+    yield bot
+    plugin.shutdown(bot)
+
+
+@pytest.fixture
+def irc(mockbot, ircfactory):
+    server = ircfactory(mockbot)
+    server.channel_joined('#test', ['@Op', 'User'])
+    mockbot.backend.clear_message_sent()
+    return server
+
+
+def say(irc, user, channel, text):
+    """Send a line, and wait for the jobs it queued on the worker pool."""
+    irc.say(user, channel, text)
+    irc.bot.memory['reddit_workers'].join()
+
+
+def sent(bot):
+    return [line.decode('utf-8').strip() for line in bot.backend.message_sent]
+
+
+def make_post(id_, subreddit, created_utc, title='A new post', over_18=False, spoiler=False):
+    return PostInfo(
+        id=id_, title=title, flair=None, subreddit=subreddit,
+        is_self=True, url='https://www.reddit.com/r/{}/comments/{}/'.format(subreddit, id_),
+        over_18=over_18, spoiler=spoiler, author='someone', created_utc=created_utc,
+        score=1, upvote_ratio=1.0, num_comments=0, shortlink='https://redd.it/' + id_,
+    )
+
+
+def make_submission(id_, subreddit, created_utc, **fields):
+    """Stand-in for a PRAW ``Submission`` from a listing."""
+    post = make_post(id_, subreddit, created_utc)._replace(**fields)
+    return SimpleNamespace(**dict(
+        post._asdict(),
+        fullname='t3_' + id_,
+        link_flair_text=post.flair,
+        subreddit=SimpleNamespace(display_name=subreddit),
+        author=SimpleNamespace(name=post.author),
+    ))
+
+
+class FakeListing:
+    def __init__(self, posts, paths):
+        self._posts = posts
+        self._paths = paths
+
+    def subreddit(self, path):
+        self._paths.append(path)
+        return self
+
+    def new(self, limit):
+        return list(self._posts)
+
+
+def reddit_error(name, status):
+    """A prawcore exception, as raised for a response with ``status``."""
+    response = SimpleNamespace(
+        status_code=status,
+        headers={'location': 'https://www.reddit.com/subreddits/search.json?q=nope'},
+    )
+    return getattr(plugin.prawcore.exceptions, name)(response)
+
+
+class Unavailable:
+    """Lazy PRAW object whose fetch fails with ``error``."""
+    def __init__(self, error):
+        self._error = error
+
+    def __getattr__(self, name):
+        raise self._error
+
+
+class FakeClient:
+    """Stand-in for ``praw.Reddit``, recording what was looked up."""
+    def __init__(self, subreddits=None, redditors=None, things=None):
+        self._subreddits = subreddits or {}
+        self._redditors = redditors or {}
+        self._things = things or {}
+        self.requests = []
+
+    def info(self, fullnames):
+        self.requests.append(('info', tuple(fullnames)))
+        return [self._things[name] for name in fullnames if name in self._things]
+
+    def subreddit(self, name):
+        self.requests.append(('r', name))
+        return self._subreddits[name]
+
+    def redditor(self, name):
+        self.requests.append(('u', name))
+        return self._redditors[name]
+
+
+class FakeHttp:
+    """Stand-in for the HTTP session shared with PRAW, answering HEAD requests."""
+    def __init__(self, locations=None, error=None):
+        self._locations = locations or {}
+        self._error = error
+        self.requests = []
+
+    def head(self, url, timeout=None):
+        self.requests.append(url)
+        if self._error is not None:
+            raise self._error
+        return SimpleNamespace(headers={'Location': self._locations.get(url, '')})
+
+
+def record_expansions(monkeypatch):
+    """Record what the plugin would say about posts and comments."""
+    said = []
+    monkeypatch.setattr(
+        plugin, 'say_post_info',
+        lambda bot, trigger, id_=None, **kwargs: said.append(('t3', id_, kwargs.get('url'))))
+    monkeypatch.setattr(
+        plugin, 'say_comment_info',
+        lambda bot, trigger, id_=None, **kwargs: said.append(('t1', id_, kwargs.get('url'))))
+    return said
+
+
+def test_watch_add_poll_and_announce(mockbot, irc, userfactory, monkeypatch):
+    monkeypatch.setattr(plugin, 'fetch_subreddit', lambda bot, name: SubredditInfo(
+        name='r/Sopel', path='/r/Sopel/', over18=False, subscribers=1,
+        created_utc=0.0, title='Sopel', public_description=''))
+
+    say(irc, userfactory('Op'), '#test', '.redditwatch add sopel')
+    assert sent(mockbot) == ['PRIVMSG #test :[reddit] Watching r/Sopel for new posts.']
+    assert set(mockbot.memory['reddit_watcher'].subscribers('sopel')) == {'#test'}
+
+    mockbot.backend.clear_message_sent()
+    say(irc, userfactory('Op'), '#test', '.redditwatch list')
+    assert sent(mockbot) == ['PRIVMSG #test :[reddit] #test watches: r/Sopel']
+
+    paths = []
+    posts = [
+        make_submission('abc123', 'Sopel', time.time() + 60),
+        make_submission('old123', 'Sopel', time.time() - 3600),
+    ]
+    monkeypatch.setattr(plugin, 'get_reddit', lambda bot: FakeListing(posts, paths))
+    mockbot.backend.clear_message_sent()
+    plugin.poll_watches(mockbot)
+
+    assert paths == ['Sopel']
+    announced = sent(mockbot)
+    assert len(announced) == 1
+    assert announced[0].startswith('PRIVMSG #test :[reddit] ')
+    assert 'A new post' in announced[0]
+    # only what was announced is cached
+    cache = mockbot.memory['reddit_post_cache']
+    assert 'abc123' in cache
+    assert 'old123' not in cache
+
+
+def test_watch_skips_nsfw_and_spoilers_in_flagged_channels(mockbot, ircfactory):
+    irc = ircfactory(mockbot)
+    watcher = mockbot.memory['reddit_watcher']
+    for channel in ('#test', '#sfw', '#nospoilers'):
+        irc.channel_joined(channel, ['Op'])
+        watcher.add(channel, 'sopel', added=0)
+    plugin.set_channel_flag(mockbot, '#sfw', 'sfw', True)
+    plugin.set_channel_flag(mockbot, '#nospoilers', 'spoiler_free', True)
+    mockbot.backend.clear_message_sent()
+
+    announced = plugin.announce_posts(mockbot, [
+        make_post('nsfw12', 'Sopel', 1.0, title='Naughty', over_18=True),
+        make_post('spoil1', 'Sopel', 1.0, title='Ending', spoiler=True),
+    ])
+
+    assert announced == {'nsfw12', 'spoil1'}
+    told = sorted(
+        (line.split()[1], line.split(':[reddit] ')[1].split()[0])
+        for line in sent(mockbot)
+    )
+    assert told == [
+        ('#nospoilers', 'Naughty'),
+        ('#sfw', 'Ending'),
+        ('#test', 'Ending'),
+        ('#test', 'Naughty'),
+    ]
+
+
+def test_shutdown_waits_for_running_jobs(mockbot):
+    started = threading.Event()
+    seen = []
+
+    def job():
+        started.set()
+        time.sleep(0.1)
+        seen.append(mockbot.memory['reddit_index'].get('image', 'nope'))
+
+    mockbot.memory['reddit_workers'].submit(job)
+    assert started.wait(5)
+    plugin.shutdown(mockbot)
+    assert seen == [None]
+
+
+class InlineBackend:
+    """Stand-in for the asyncio backend that runs coroutines right away."""
+    def __init__(self, remaining=None):
+        self._remaining = remaining
+
+    def remaining(self):
+        return self._remaining
+
+    def submit(self, coro):
+        future = Future()
+        future.set_result(asyncio.run(coro))
+        return future
+
+    def close(self):
+        pass
+
+
+def test_async_video_search_is_queued_as_passive(mockbot, irc, userfactory, monkeypatch):
+    async def unresolved(bot, video):
+        return None
+
+    searched = []
+    monkeypatch.setattr(plugin, 'aresolve_video', unresolved)
+    monkeypatch.setattr(
+        plugin, 'search_video', lambda bot, video, url: searched.append(video))
+    mockbot.memory['reddit_async'] = InlineBackend()
+
+    workers = mockbot.memory['reddit_workers']
+    priorities = []
+    submit = workers.submit
+
+    def recording_submit(func, *args, priority=PASSIVE, **kwargs):
+        priorities.append(priority)
+        return submit(func, *args, priority=priority, **kwargs)
+
+    monkeypatch.setattr(workers, 'submit', recording_submit)
+    say(irc, userfactory('User'), '#test', 'https://v.redd.it/abc123')
+    workers.join()
+
+    # the lookup, its callback, then the search
+    assert priorities == [PASSIVE, EXPLICIT, PASSIVE]
+    assert searched == ['abc123']
+
+
+def test_channel_flags_are_bounded_and_written_through(
+    tmpdir, configfactory, botfactory, ircfactory, userfactory,
+):
+    settings = configfactory('default.ini', TMP_CONFIG.format(homedir=tmpdir) + """
+[reddit]
+cache_max_entries = 2
+""")
+    bot = botfactory.preloaded(settings, ['reddit'])
+    try:
+        irc = ircfactory(bot)
+        irc.channel_joined('#test', ['@Op', 'User'])
+        flags = bot.memory['reddit_channel_flags']
+
+        for n in range(5):
+            say(irc, userfactory('User'), '#test', '.getsfw #nowhere%d' % n)
+        assert len(flags) <= 2
+
+        assert not plugin.get_channel_flag(bot, '#test', 'sfw')
+        bot.backend.clear_message_sent()
+        say(irc, userfactory('Op'), '#test', '.setsfw true')
+        assert sent(bot) == ['PRIVMSG #test :[reddit] #test is now flagged as SFW.']
+        assert plugin.get_channel_flag(bot, '#test', 'sfw')
+        assert bot.db.get_channel_value('#test', 'sfw')
+    finally:
+        plugin.shutdown(bot)
+
+
+@pytest.mark.parametrize('nick_settings, channel_settings', [
+    ({}, {}),
+    ({'timezone': 'Europe/Paris'}, {}),
+    ({}, {'timezone': 'America/New_York'}),
+    ({'timezone': 'Asia/Tokyo'}, {'timezone': 'America/New_York'}),
+    ({'time_format': '%H:%M'}, {}),
+    ({}, {'time_format': '%d/%m/%Y'}),
+    ({'time_format': '%c'}, {'timezone': 'Australia/Sydney', 'time_format': '%H:%M'}),
+])
+def test_time_created_matches_format_time(mockbot, nick_settings, channel_settings):
+    for name, value in nick_settings.items():
+        mockbot.db.set_nick_value('User', name, value)
+    for name, value in channel_settings.items():
+        mockbot.db.set_channel_value('#test', name, value)
+
+    # what the plugin did before caching the settings
+    entrytime = 1600000000.0
+    tz = sopel_time.get_timezone(mockbot.db, mockbot.config, None, 'User', '#test')
+    expected = sopel_time.format_time(
+        mockbot.db, mockbot.config, tz, 'User', '#test',
+        dt.datetime.utcfromtimestamp(entrytime))
+    assert plugin.get_time_created(mockbot, 'User', '#test', entrytime) == expected
+    # and again, from the cache
+    assert plugin.get_time_created(mockbot, 'User', '#test', entrytime) == expected
+
+
+def test_time_settings_are_forgotten_after_sopel_saves_them(
+    mockbot, irc, userfactory, monkeypatch,
+):
+    monkeypatch.setattr(plugin, 'TIME_SETTINGS_SETTLE', 0.05)
+    assert plugin.get_time_settings(mockbot, 'User', '#test')[0] == 'UTC'
+
+    irc.say(userfactory('User'), '#test', '.settz Europe/Paris')
+    # a lookup made before Sopel's own command saves the new timezone
+    assert plugin.get_time_settings(mockbot, 'User', '#test')[0] == 'UTC'
+    mockbot.db.set_nick_value('User', 'timezone', 'Europe/Paris')
+
+    time.sleep(0.2)
+    assert plugin.get_time_settings(mockbot, 'User', '#test')[0] == 'Europe/Paris'
+
+
+def test_repeated_links_are_expanded_once_per_channel(mockbot, irc, userfactory, monkeypatch):
+    said = []
+    monkeypatch.setattr(
+        plugin, 'say_post_info',
+        lambda bot, trigger, submission_id, **kwargs: said.append((trigger.sender, submission_id)))
+
+    for channel in ('#test', '#test', '#other'):
+        say(irc, userfactory('User'), channel, 'https://www.reddit.com/gallery/abc123')
+
+    assert said == [('#test', 'abc123'), ('#other', 'abc123')]
+
+
+def test_repeats_are_forgotten_when_expanding_fails(mockbot, irc, userfactory, monkeypatch):
+    said = []
+    failing = True
+
+    def say_post_info(bot, trigger, submission_id, **kwargs):
+        said.append(submission_id)
+        if failing:
+            raise RuntimeError('reddit is down')
+
+    monkeypatch.setattr(plugin, 'say_post_info', say_post_info)
+    say(irc, userfactory('User'), '#test', 'https://www.reddit.com/gallery/abc123')
+    say(irc, userfactory('User'), '#test', 'https://www.reddit.com/gallery/abc123')
+    assert said == ['abc123', 'abc123']
+
+    # nor is a link that was dropped for lack of API budget
+    said.clear()
+    failing = False
+    workers = mockbot.memory['reddit_workers']
+    monkeypatch.setattr(workers, '_allows_passive', lambda: False)
+    say(irc, userfactory('User'), '#test', 'https://www.reddit.com/gallery/def456')
+    assert said == []
+    monkeypatch.setattr(workers, '_allows_passive', lambda: True)
+    say(irc, userfactory('User'), '#test', 'https://www.reddit.com/gallery/def456')
+    say(irc, userfactory('User'), '#test', 'https://www.reddit.com/gallery/def456')
+    assert said == ['def456']
+
+
+def test_async_budget_drops_passive_mentions_but_not_commands(
+    mockbot, irc, userfactory, monkeypatch,
+):
+    fetched = []
+
+    async def afetch_subreddit(bot, name):
+        fetched.append(name)
+        return SubredditInfo(
+            name='r/Sopel', path='/r/Sopel/', over18=False, subscribers=1,
+            created_utc=0.0, title='Sopel', public_description='')
+
+    monkeypatch.setattr(plugin, 'afetch_subreddit', afetch_subreddit)
+    # fewer requests left than passive_reserve
+    mockbot.memory['reddit_async'] = InlineBackend(remaining=3.0)
+
+    say(irc, userfactory('User'), '#test', 'have you seen r/sopel?')
+    assert fetched == []
+    assert mockbot.memory['reddit_workers'].dropped == 1
+
+    say(irc, userfactory('User'), '#test', '.subreddit sopel')
+    mockbot.memory['reddit_workers'].join()
+    assert fetched == ['sopel']
+    assert len(sent(mockbot)) == 1
+    assert 'r/Sopel' in sent(mockbot)[0]
+
+
+@pytest.mark.parametrize('error, status, reply', [
+    ('Redirect', 302, 'User: No such subreddit.'),
+    ('Forbidden', 403, 'User: r/nope appears to be a private subreddit!'),
+    ('NotFound', 404, 'User: r/nope appears to be a banned subreddit!'),
+])
+def test_missing_subreddits(mockbot, irc, userfactory, monkeypatch, error, status, reply):
+    client = FakeClient(subreddits={'nope': Unavailable(reddit_error(error, status))})
+    monkeypatch.setattr(plugin, 'get_reddit', lambda bot: client)
+
+    say(irc, userfactory('User'), '#test', '.subreddit nope')
+    assert sent(mockbot) == ['PRIVMSG #test :' + reply]
+
+    # and mentions stay quiet
+    mockbot.memory['reddit_subreddit_cache'].clear()
+    mockbot.backend.clear_message_sent()
+    say(irc, userfactory('User'), '#test', 'try r/nope')
+    assert sent(mockbot) == []
+    assert client.requests == [('r', 'nope'), ('r', 'nope')]
+
+
+def test_missing_things_are_remembered(mockbot, irc, userfactory, monkeypatch):
+    client = FakeClient(
+        subreddits={
+            'nope': Unavailable(reddit_error('Redirect', 302)),
+            'secret': Unavailable(reddit_error('Forbidden', 403)),
+        },
+        redditors={'nobody': Unavailable(reddit_error('NotFound', 404))},
+    )
+    monkeypatch.setattr(plugin, 'get_reddit', lambda bot: client)
+
+    # another channel each time, so these aren't skipped as repeats
+    for channel in ('#test', '#other'):
+        say(irc, userfactory('User'), channel, 'r/nope r/secret and u/nobody')
+    assert sorted(client.requests) == [('r', 'nope'), ('r', 'secret'), ('u', 'nobody')]
+
+    say(irc, userfactory('User'), '#test', '.redditor nobody')
+    assert len(client.requests) == 3
+    assert sent(mockbot) == ['PRIVMSG #test :User: No such Redditor.']
+
+
+SHARE_URL = 'https://www.reddit.com/r/sopel/s/{}'
+
+
+@pytest.mark.parametrize('location, expected', [
+    ('https://www.reddit.com/r/sopel/comments/abc123/a_post/', ('t3', 'abc123', None)),
+    ('https://www.reddit.com/r/sopel/comments/abc123/a_post/def456/', ('t1', 'def456', None)),
+])
+def test_share_links_are_resolved_with_one_request(
+    mockbot, irc, userfactory, monkeypatch, location, expected,
+):
+    http = FakeHttp({'https://www.reddit.com/r/sopel/s/AbCd1': location})
+    monkeypatch.setattr(plugin, 'get_http', lambda bot: http)
+    said = record_expansions(monkeypatch)
+
+    say(irc, userfactory('User'), '#test', SHARE_URL.format('AbCd1'))
+    assert http.requests == ['https://www.reddit.com/r/sopel/s/AbCd1']
+    assert said == [expected]
+    assert mockbot.memory['reddit_index'].get(plugin.SHARE, 'AbCd1') == \
+        expected[0] + '_' + expected[1]
+
+
+def test_known_share_links_need_no_request(mockbot, irc, userfactory, monkeypatch):
+    http = FakeHttp()
+    monkeypatch.setattr(plugin, 'get_http', lambda bot: http)
+    said = record_expansions(monkeypatch)
+    mockbot.memory['reddit_index'].set(plugin.SHARE, 'AbCd1', 't1_def456')
+
+    say(irc, userfactory('User'), '#test', SHARE_URL.format('AbCd1'))
+    assert http.requests == []
+    assert said == [('t1', 'def456', None)]
+
+
+def test_share_links_fall_back_to_praw(mockbot, irc, userfactory, monkeypatch):
+    http = FakeHttp(error=plugin.requests.ConnectionError('no route to host'))
+    monkeypatch.setattr(plugin, 'get_http', lambda bot: http)
+    said = record_expansions(monkeypatch)
+
+    def not_a_comment(bot, trigger, id_=None, url=None, **kwargs):
+        said.append(('t1', id_, url))
+        raise plugin.praw.exceptions.InvalidURL(url)
+
+    monkeypatch.setattr(plugin, 'say_comment_info', not_a_comment)
+    url = SHARE_URL.format('AbCd1')
+    say(irc, userfactory('User'), '#test', url)
+
+    assert len(http.requests) == 1
+    assert said == [('t1', None, url), ('t3', None, url)]
+    assert mockbot.memory['reddit_index'].get(plugin.SHARE, 'AbCd1') is None
+
+
+def test_video_redirects_are_indexed(mockbot, irc, userfactory, monkeypatch):
+    http = FakeHttp({
+        'https://www.reddit.com/video/abc123':
+            'https://www.reddit.com/r/sopel/comments/xyz789/a_video/',
+    })
+    monkeypatch.setattr(plugin, 'get_http', lambda bot: http)
+    monkeypatch.setattr(plugin, 'search_submission', lambda bot, url: pytest.fail('searched'))
+    said = record_expansions(monkeypatch)
+
+    say(irc, userfactory('User'), '#test', 'https://v.redd.it/abc123')
+    assert said == [('t3', 'xyz789', None)]
+    assert mockbot.memory['reddit_index'].get(plugin.VIDEO, 'abc123') == 'xyz789'
+
+    say(irc, userfactory('User'), '#other', 'https://v.redd.it/abc123')
+    assert len(http.requests) == 1
+    assert said == [('t3', 'xyz789', None)] * 2
+
+
+@pytest.mark.parametrize('error', [
+    None,
+    plugin.requests.ConnectionError('no route to host'),
+], ids=['no redirect', 'request failed'])
+def test_unresolved_videos_are_searched_once(mockbot, irc, userfactory, monkeypatch, error):
+    http = FakeHttp(error=error)
+    searches = []
+    monkeypatch.setattr(plugin, 'get_http', lambda bot: http)
+    monkeypatch.setattr(
+        plugin, 'search_submission', lambda bot, url: searches.append(url))
+    said = record_expansions(monkeypatch)
+
+    say(irc, userfactory('User'), '#test', 'https://v.redd.it/abc123')
+    assert searches == ['https://v.redd.it/abc123']
+    assert said == []
+    assert 'abc123' in mockbot.memory['reddit_video_misses']
+
+    # known not to be found: neither redirect nor search is tried again
+    say(irc, userfactory('User'), '#other', 'https://v.redd.it/abc123')
+    assert len(http.requests) == 1
+    assert len(searches) == 1
+
+
+def test_image_links_resolve_from_posts_seen_before(mockbot, irc, userfactory, monkeypatch):
+    client = FakeClient(things={'t3_abc123': make_submission(
+        'abc123', 'sopel', 1.0, title='A picture', is_self=False,
+        url='https://i.redd.it/img123.jpg')})
+    searches = []
+    monkeypatch.setattr(plugin, 'get_reddit', lambda bot: client)
+    monkeypatch.setattr(plugin, 'search_submission', lambda bot, url: searches.append(url))
+
+    say(irc, userfactory('User'), '#test', 'https://www.reddit.com/r/sopel/comments/abc123/')
+    assert mockbot.memory['reddit_index'].get(plugin.IMAGE, 'img123') == 'abc123'
+
+    mockbot.backend.clear_message_sent()
+    say(irc, userfactory('User'), '#other', 'https://i.redd.it/img123.png')
+    assert searches == []
+    assert client.requests == [('info', ('t3_abc123',))]
+    lines = sent(mockbot)
+    assert len(lines) == 1
+    assert lines[0].startswith('PRIVMSG #other :[reddit] A picture')
+
+    # images nobody posted are searched for once, then remembered as misses
+    say(irc, userfactory('User'), '#test', 'https://i.redd.it/unknown.jpg')
+    say(irc, userfactory('User'), '#other', 'https://i.redd.it/unknown.jpg')
+    assert searches == ['https://i.redd.it/unknown.jpg']
+
+
+def test_repeat_window_has_its_own_bound(tmpdir, configfactory, botfactory):
+    settings = configfactory('default.ini', TMP_CONFIG.format(homedir=tmpdir) + """
+[reddit]
+cache_max_entries = 10
+repeat_max_entries = 20
+""")
+    bot = botfactory.preloaded(settings, ['reddit'])
+    try:
+        assert bot.memory['reddit_recent_expansions'].maxsize == 20
+        assert bot.memory['reddit_post_cache'].maxsize == 10
+    finally:
+        plugin.shutdown(bot)
+
+
+class FakeAuthorizer:
+    """Stand-in for prawcore's app-only authorizer."""
+    def __init__(self):
+        self.access_token = None
+        self._expiration_timestamp = 0.0
+        self.scopes = None
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+        self.access_token = 'token%d' % self.refreshes
+        self._expiration_timestamp = time.time() + 3600
+        self.scopes = {'*'}
+
+
+@pytest.mark.parametrize('saved, built', [
+    (None, True),
+    (60, True),  # about to expire
+    (3600, False),
+], ids=['no token', 'expiring token', 'good token'])
+def test_token_is_fetched_ahead_of_the_first_lookup(mockbot, monkeypatch, saved, built):
+    authorizer = FakeAuthorizer()
+    clients = []
+
+    def get_reddit(bot):
+        clients.append(SimpleNamespace(_read_only_core=SimpleNamespace(_authorizer=authorizer)))
+        return clients[-1]
+
+    monkeypatch.setattr(plugin, 'get_reddit', get_reddit)
+    if saved is not None:
+        key = plugin.token_key(mockbot.settings.reddit.app_id, mockbot.settings.reddit.oauth_url)
+        mockbot.memory['reddit_tokens'].set(key, 'saved', time.time() + saved, '*')
+
+    plugin.renew_tokens(mockbot)
+    assert bool(clients) is built
+    assert authorizer.refreshes == int(built)
+
+
+def test_tokens_are_renewed_on_connect(mockbot, monkeypatch):
+    renewed = threading.Event()
+    monkeypatch.setattr(plugin, 'renew_tokens', lambda bot: renewed.set())
+    mockbot.on_message(':irc.example.com 001 Sopel :Welcome to the network')
+    assert renewed.wait(5)
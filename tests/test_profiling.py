@@ -0,0 +1,100 @@
+"""Tests for the reddit plugin's on-demand profiler"""
+from __future__ import annotations
+
+import pstats
+import threading
+
+from sopel_reddit.profiling import Profiler, top, where
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def busy(n):
+    return sum(range(n))
+
+
+def test_profiles_the_next_calls():
+    profiler = Profiler(calls=2)
+    assert profiler.run(busy, 10) == 45
+    assert not profiler.done
+    profiler.run(busy, 10)
+    assert profiler.done
+    profiler.run(busy, 10)  # not profiled
+    assert profiler.profiled == 2
+
+    stats = profiler.finish()
+    names = {name for _, _, name in stats.stats}
+    assert 'busy' in names
+    assert stats.stats[next(func for func in stats.stats if func[2] == 'busy')][1] == 2
+
+
+def test_nested_calls_are_part_of_the_outer_one():
+    profiler = Profiler(calls=2)
+
+    def outer():
+        return profiler.run(busy, 10) + 1
+
+    assert profiler.run(outer) == 46
+    assert profiler.profiled == 1
+    assert not profiler.done
+
+
+def test_calls_from_many_threads():
+    profiler = Profiler(calls=8)
+    threads = [
+        threading.Thread(target=profiler.run, args=(busy, 1000))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert profiler.profiled == 8
+    assert profiler.done
+
+
+def test_time_limit():
+    clock = FakeClock()
+    profiler = Profiler(seconds=30, timer=clock)
+    profiler.run(busy, 10)
+    assert not profiler.done
+    clock.now += 30
+    assert profiler.done
+    profiler.run(busy, 10)
+    assert profiler.profiled == 1
+
+
+def test_finish_stops_profiling():
+    profiler = Profiler()
+    assert profiler.finish() is None
+    assert profiler.done
+    profiler.run(busy, 10)
+    assert profiler.profiled == 0
+
+
+def test_top(tmp_path):
+    profiler = Profiler(calls=1)
+    profiler.run(busy, 100000)
+    stats = profiler.finish()
+
+    lines = top(stats, limit=3)
+    assert len(lines) <= 3
+    assert any('busy' in line for line in lines)
+    assert all(' self, ' in line and ' calls: ' in line for line in lines)
+
+    filename = str(tmp_path / 'profile.pstats')
+    stats.dump_stats(filename)
+    assert pstats.Stats(filename).stats.keys() == stats.stats.keys()
+
+
+def test_where():
+    assert where(('/usr/lib/python3/json/decoder.py', 332, 'decode')) == \
+        'decoder.py:332(decode)'
+    assert where(('~', 0, "<built-in method builtins.sum>")) == \
+        '<built-in method builtins.sum>'
@@ -0,0 +1,118 @@
+"""Tests for the reddit plugin's rate-limit helpers"""
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+from sopel_reddit.ratelimit import RateBudget, SharedBucket, throttle
+
+
+def fake_reddit(**state):
+    limiter = SimpleNamespace(
+        remaining=None, reset_timestamp=None, next_request_timestamp=None)
+    limiter.__dict__.update(state)
+    return SimpleNamespace(_core=SimpleNamespace(_rate_limiter=limiter))
+
+
+def test_unknown_budget_allows_passive():
+    budget = RateBudget(lambda: fake_reddit(), 10)
+    assert budget.remaining() is None
+    assert budget.allows_passive()
+
+
+def test_low_budget_refuses_passive():
+    reddit = fake_reddit(remaining=5.0, reset_timestamp=time.time() + 60)
+    budget = RateBudget(lambda: reddit, 10)
+    assert budget.remaining() == 5.0
+    assert not budget.allows_passive()
+
+
+def test_expired_window_allows_passive():
+    reddit = fake_reddit(remaining=0.0, reset_timestamp=time.time() - 1)
+    assert RateBudget(lambda: reddit, 10).allows_passive()
+
+
+def test_pending_sleep_refuses_passive():
+    reddit = fake_reddit(
+        remaining=500.0,
+        reset_timestamp=time.time() + 60,
+        next_request_timestamp=time.time() + 30,
+    )
+    assert not RateBudget(lambda: reddit, 10).allows_passive()
+
+
+def test_asyncio_backend_budget():
+    backend = SimpleNamespace(remaining=lambda: 5.0)
+    budget = RateBudget(lambda: fake_reddit(), 10, get_backend=lambda: backend)
+    assert budget.remaining() == 5.0
+    assert not budget.allows_passive()
+
+    backend.remaining = lambda: None
+    assert budget.allows_passive()
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_shared_bucket_burst_then_rate(tmp_path):
+    clock = FakeClock()
+    bucket = SharedBucket(
+        str(tmp_path / 'bucket'), rate=2, burst=3, timer=clock, sleep=clock.sleep)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.delay() == 0.5
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+    # idle long enough and the burst is available again
+    clock.now += 10
+    assert bucket.delay() == 0.0
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+    assert clock.now == 1010.5
+
+
+def test_shared_bucket_is_shared(tmp_path):
+    filename = str(tmp_path / 'bucket')
+    clock = FakeClock()
+    first = SharedBucket(filename, rate=1, timer=clock)
+    second = SharedBucket(filename, rate=1, timer=clock)
+
+    # each takes the next slot in turn, whoever asks
+    assert first.reserve() == 0.0
+    assert second.reserve() == 1.0
+    assert first.reserve() == 2.0
+    second.close()
+    assert SharedBucket(filename, rate=1, timer=clock).delay() == 3.0
+    # closed buckets don't hold anything up
+    assert second.reserve() == 0.0
+    assert first.reserve() == 3.0
+
+
+def test_shared_bucket_delay_refuses_passive(tmp_path):
+    bucket = SharedBucket(str(tmp_path / 'bucket'), rate=1, timer=FakeClock())
+    budget = RateBudget(lambda: fake_reddit(), 10, bucket=bucket)
+    bucket.reserve()
+    assert budget.allows_passive()  # next slot is a second away
+    bucket.reserve()
+    assert not budget.allows_passive()
+
+
+def test_throttle_waits_before_each_request(tmp_path):
+    clock = FakeClock()
+    bucket = SharedBucket(
+        str(tmp_path / 'bucket'), rate=1, timer=clock, sleep=clock.sleep)
+    session = SimpleNamespace(request=lambda method, url: (method, url, clock.now))
+    waits = []
+    throttle(session, bucket, waits.append)
+
+    assert session.request('GET', 'a') == ('GET', 'a', 1000.0)
+    assert session.request('HEAD', 'b') == ('HEAD', 'b', 1001.0)
+    assert waits == [0.0, 1.0]
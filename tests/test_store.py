@@ -0,0 +1,139 @@
+"""Tests for the reddit plugin's persistent storage"""
+from __future__ import annotations
+
+import sqlite3
+import time
+
+from sopel_reddit import snapshots
+from sopel_reddit.snapshots import Missing, NOT_FOUND, PostInfo, RedditorInfo
+from sopel_reddit.store import IdIndex, IMAGE, SnapshotStore, TokenStore, WatchStore
+
+
+def test_index_roundtrip(tmp_path):
+    filename = str(tmp_path / 'index.db')
+    index = IdIndex(filename)
+    index.update(IMAGE, [('img1', 'abc'), ('img2', 'def')])
+    index.close()
+
+    index = IdIndex(filename)
+    assert index.get(IMAGE, 'img1') == 'abc'
+    assert index.get(IMAGE, 'img2') == 'def'
+    assert index.get(IMAGE, 'img3') is None
+    assert index.get('other', 'img1') is None
+
+
+def test_first_mapping_wins():
+    index = IdIndex(None)
+    index.set(IMAGE, 'img1', 'original')
+    index.set(IMAGE, 'img1', 'repost')
+    assert index.get(IMAGE, 'img1') == 'original'
+
+
+def test_watch_store_roundtrip(tmp_path):
+    filename = str(tmp_path / 'index.db')
+    store = WatchStore(filename, seen_size=3)
+    store.add_watch('#sopel', 'Sopel', 100.0)
+    store.add_watch('#sopel', 'Python', 200.0)
+    store.remove_watch('#sopel', 'Python')
+    store.add_seen(['a', 'b', 'c', 'd'])
+    store.close()
+
+    store = WatchStore(filename, seen_size=3)
+    assert store.watches() == [('#sopel', 'Sopel', 100.0)]
+    assert store.seen() == ['b', 'c', 'd']
+
+    store.add_seen(['e'])
+    assert store.seen() == ['c', 'd', 'e']
+
+
+def test_watch_store_resized(tmp_path):
+    filename = str(tmp_path / 'index.db')
+    store = WatchStore(filename, seen_size=5)
+    store.add_seen(['a', 'b', 'c', 'd', 'e'])
+    store.close()
+
+    store = WatchStore(filename, seen_size=2)
+    assert store.seen() == ['d', 'e']
+    store.add_seen(['f'])
+    assert store.seen() == ['e', 'f']
+
+
+def test_index_compact(monkeypatch):
+    index = IdIndex(None)
+    for n, key in enumerate(['old1', 'old2', 'new1', 'new2', 'new3']):
+        monkeypatch.setattr(time, 'time', lambda n=n: 1000.0 + n * 100)
+        index.set(IMAGE, key, 'post')
+
+    assert index.compact(max_age=0, max_rows=10) == 0
+    assert index.compact(max_age=250, max_rows=10) == 2
+    assert index.get(IMAGE, 'old2') is None
+    assert index.compact(max_age=0, max_rows=2) == 1
+    assert index.get(IMAGE, 'new1') is None
+    assert index.get(IMAGE, 'new3') == 'post'
+
+
+def test_index_migration(tmp_path):
+    filename = str(tmp_path / 'index.db')
+    conn = sqlite3.connect(filename)
+    conn.execute(
+        'CREATE TABLE ids (kind TEXT NOT NULL, key TEXT NOT NULL, '
+        'value TEXT NOT NULL, PRIMARY KEY (kind, key)) WITHOUT ROWID')
+    conn.execute("INSERT INTO ids VALUES ('image', 'img1', 'abc')")
+    conn.commit()
+    conn.close()
+
+    index = IdIndex(filename)
+    assert index.get(IMAGE, 'img1') == 'abc'
+    # migrated mappings count as new, rather than expiring at once
+    assert index.compact(max_age=60, max_rows=10) == 0
+    index.set(IMAGE, 'img2', 'def')
+    assert index.get(IMAGE, 'img2') == 'def'
+
+
+def test_snapshot_roundtrip():
+    for info in (
+        PostInfo('abc', 'Title', None, 'sopel', False, 'https://sopel.chat/',
+                 False, True, 'someone', 1.5e9, 42, 0.9, 7, None),
+        RedditorInfo('someone', 1.2e9, True, False, False, 10, 20),
+        Missing(NOT_FOUND),
+    ):
+        assert snapshots.load(snapshots.dump(info)) == info
+
+
+def test_snapshot_store(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'cache.db')
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+    store = SnapshotStore(filename)
+    store.set('post', 'abc', '["PostInfo"]', 300)
+    store.set('post', 'def', '["PostInfo"]', 60)
+    store.set('post', 'ghi', '["PostInfo"]', 0)  # not stored
+    store.set('redditor', 'abc', '["Missing", "not found"]', 3600)
+    store.close()
+
+    store = SnapshotStore(filename)
+    monkeypatch.setattr(time, 'time', lambda: 1100.0)
+    assert store.get('post', 'abc') == ('["PostInfo"]', 200.0)
+    assert store.get('post', 'def') is None  # expired
+    assert store.get('post', 'ghi') is None
+    assert store.load('post', 10) == [('abc', '["PostInfo"]', 200.0)]
+    assert store.load('redditor', 10) == [('abc', '["Missing", "not found"]', 3500.0)]
+
+    assert store.compact(max_rows=10) == 1
+    store.set('post', 'jkl', '["PostInfo"]', 900)
+    assert store.compact(max_rows=1) == 1
+    assert store.load('post', 10) == [('jkl', '["PostInfo"]', 900.0)]
+
+
+def test_token_store(tmp_path):
+    filename = str(tmp_path / 'index.db')
+    tokens = TokenStore(filename)
+    tokens.set('app https://oauth.reddit.com', 'abc', time.time() + 3600, '*')
+    tokens.set('app http://localhost', 'old', time.time() - 1)
+    tokens.close()
+
+    tokens = TokenStore(filename)
+    token, expires, scopes = tokens.get('app https://oauth.reddit.com')
+    assert (token, scopes) == ('abc', '*')
+    assert expires > time.time()
+    assert tokens.get('app http://localhost') is None  # expired
+    assert tokens.get('other https://oauth.reddit.com') is None
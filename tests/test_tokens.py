@@ -0,0 +1,66 @@
+"""Tests for the reddit plugin's access token upkeep"""
+from __future__ import annotations
+
+import time
+
+from sopel_reddit.store import TokenStore
+from sopel_reddit.tokens import (
+    authorizer_expires,
+    keep_tokens,
+    praw_authorizer,
+    renewal_due,
+    token_key,
+)
+
+
+class FakeAuthorizer:
+    """Like prawcore's ``DeviceIDAuthorizer``, minus the HTTP."""
+    def __init__(self):
+        self.access_token = None
+        self.scopes = None
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+        self.access_token = 'token%d' % self.refreshes
+        self._expiration_timestamp = time.time() + 3600
+        self.scopes = {'*'}
+
+
+def test_token_key():
+    assert token_key('app', 'https://oauth.reddit.com/') == 'app https://oauth.reddit.com'
+
+
+def test_renewal_due():
+    assert renewal_due(0)
+    assert renewal_due(time.time() + 60)
+    assert not renewal_due(time.time() + 3600)
+
+
+def test_new_tokens_are_saved_and_restored():
+    store = TokenStore(None)
+    authorizer = FakeAuthorizer()
+    keep_tokens(authorizer, store, 'key')
+    assert authorizer_expires(authorizer) == 0
+    authorizer.refresh()
+    token, expires, scopes = store.get('key')
+    assert (token, scopes) == ('token1', '*')
+
+    # after a restart
+    restored = FakeAuthorizer()
+    keep_tokens(restored, store, 'key')
+    assert restored.access_token == 'token1'
+    assert restored.scopes == {'*'}
+    assert authorizer_expires(restored) == expires
+    assert restored.refreshes == 0
+
+
+def test_praw_authorizer():
+    class Core:
+        _authorizer = FakeAuthorizer()
+
+    class Reddit:
+        _read_only_core = Core()
+
+    assert praw_authorizer(Reddit()) is Core._authorizer
+    assert praw_authorizer(object()) is None
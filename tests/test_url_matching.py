@@ -1,6 +1,8 @@
 """Tests for Sopel's ``reddit`` plugin"""
 from __future__ import annotations
 
+import re
+
 import pytest
 
 from sopel.trigger import PreTrigger
@@ -120,3 +122,99 @@ def test_hosted_image_url_matching(proto, subdomain, slug, ext, sig, bot):
     matches = [match for match in matched_rules[0].match(bot, line)]
     assert len(matches) == 1
     assert matches[0].group('image') == 'yib0zwk1mmza1.' + ext
+
+
+@pytest.mark.parametrize('link, rule_name', (
+    ('https://v.redd.it/abc123xyz', 'video_info'),
+    ('https://www.reddit.com/gallery/1abcde', 'rgallery_info'),
+    ('https://www.reddit.com/r/subname/s/AbCdEf123', 'share_info'),
+    ('https://www.reddit.com/u/someone', 'auto_redditor_info'),
+    ('https://www.reddit.com/user/someone', 'auto_redditor_info'),
+))
+def test_other_url_matching(link, rule_name, bot):
+    line = PreTrigger(bot.nick, ':User!user@irc.libera.chat PRIVMSG #channel {}'.format(link))
+    matched_rules = [
+        # we can ignore matches that don't come from this plugin
+        match[0] for match in bot.rules.get_triggered_rules(bot, line)
+        if match[0].get_plugin_name() == 'reddit'
+    ]
+
+    assert len(matched_rules) == 1
+    assert matched_rules[0].get_rule_label() == rule_name
+
+
+@pytest.mark.parametrize('text, expected', (
+    ('check out r/eyebleach', [('r', 'eyebleach')]),
+    ('/u/someone and r/sub-name', [('u', 'someone'), ('r', 'sub-name')]),
+    ('no mention here', []),
+    ('a/r/nope or bar/u/nope', []),
+    # Sopel matches find rules case-insensitively
+    ('check R/Funny out', [('R', 'Funny')]),
+    ('U/Someone said', [('U', 'Someone')]),
+))
+def test_slash_matching(text, expected, bot):
+    line = PreTrigger(bot.nick, ':User!user@irc.libera.chat PRIVMSG #channel :{}'.format(text))
+    matches = [
+        (match.group('prefix'), match.group('id'))
+        for rule, match in bot.rules.get_triggered_rules(bot, line)
+        if rule.get_plugin_name() == 'reddit'
+    ]
+
+    assert matches == expected
+
+
+@pytest.mark.parametrize('text', (
+    'hello there, how is everyone doing?',
+    'see https://example.com/r/subname/comments/123456 for details',
+    'https://github.com/sopel-irc/sopel-reddit',
+))
+def test_unrelated_lines(text, bot):
+    line = PreTrigger(bot.nick, ':User!user@irc.libera.chat PRIVMSG #channel :{}'.format(text))
+    matched_rules = [
+        match[0] for match in bot.rules.get_triggered_rules(bot, line)
+        if match[0].get_plugin_name() == 'reddit'
+    ]
+
+    assert matched_rules == []
+
+
+def test_matcher_agrees_with_patterns():
+    from sopel_reddit.plugin import MATCHER
+
+    corpus = (
+        'just chatting, nothing to see',
+        'https://www.reddit.com/r/subname/',
+        'https://old.reddit.com/r/subname/comments/123456/slug/234567',
+        'https://redd.it/sh0r7',
+        'https://i.redd.it/yib0zwk1mmza1.png?s=abc',
+        'https://preview.redd.it/some-slug-v0-yib0zwk1mmza1.jpg',
+        'https://v.redd.it/abc123',
+        'https://www.reddit.com/gallery/1abcde',
+        'https://www.reddit.com/r/subname/s/AbCdEf123',
+        'https://reddit.com/user/someone',
+        'r/subname and u/someone',
+        'R/Subname and U/Someone',
+        'foo/r/bar',
+        'reddit is down again',
+    )
+
+    for name, regex in MATCHER.patterns.items():
+        view = MATCHER.view(name)
+        for text in corpus:
+            expected = [m.group(0) for m in regex.finditer(text)]
+            assert [m.group(0) for m in view.finditer(text)] == expected
+            assert bool(view.search(text)) == bool(expected)
+
+
+def test_matcher_flags():
+    from sopel_reddit.matching import Matcher
+
+    matcher = Matcher(
+        {'exact': r'Foo\d', 'any_case': r'bar\d'},
+        prefilter=('FOO', 'bar'),
+        flags={'any_case': re.IGNORECASE},
+    )
+    assert matcher.view('exact').search('say Foo1') is not None
+    assert matcher.view('exact').search('say FOO1') is None
+    assert matcher.view('any_case').search('say BAR2').group(0) == 'BAR2'
+    assert not matcher.may_match('say baz3')
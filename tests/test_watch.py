@@ -0,0 +1,133 @@
+"""Tests for the reddit plugin's subreddit watcher"""
+from __future__ import annotations
+
+from sopel_reddit.store import WatchStore
+from sopel_reddit.watch import PAGE_SIZE, SeenRing, Watcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_watcher(clock, group_size=2, store=None):
+    return Watcher(
+        store or WatchStore(None, seen_size=1000),
+        group_size=group_size,
+        min_interval=60,
+        max_interval=900,
+        timer=clock,
+    )
+
+
+def test_seen_ring_forgets_oldest():
+    ring = SeenRing(2, ['a'])
+    assert ring.add('b')
+    assert not ring.add('a')
+    assert ring.add('c')
+    assert 'a' not in ring
+    assert 'b' in ring and 'c' in ring
+    assert len(ring) == 2
+
+
+def test_subscriptions():
+    watcher = make_watcher(FakeClock())
+    assert watcher.add('#a', 'Sopel', added=5.0)
+    assert not watcher.add('#a', 'sopel')
+    assert watcher.add('#b', 'sopel', added=6.0)
+
+    assert watcher.watched_by('#a') == ['sopel']
+    assert watcher.subscribers('SOPEL') == {'#a': 5.0, '#b': 6.0}
+
+    assert watcher.remove('#a', 'SoPeL')
+    assert not watcher.remove('#a', 'sopel')
+    assert watcher.subscribers('sopel') == {'#b': 6.0}
+
+
+def test_subscriptions_persist(tmp_path):
+    filename = str(tmp_path / 'index.db')
+    watcher = make_watcher(FakeClock(), store=WatchStore(filename, 100))
+    watcher.add('#a', 'Sopel', added=5.0)
+    watcher.record(watcher.groups[0], ['x1', 'x2'])
+    watcher.close()
+
+    watcher = make_watcher(FakeClock(), store=WatchStore(filename, 100))
+    assert watcher.subscribers('sopel') == {'#a': 5.0}
+    assert watcher.record(watcher.groups[0], ['x3', 'x2', 'x1']) == ['x3']
+
+
+def test_grouping():
+    watcher = make_watcher(FakeClock(), group_size=2)
+    for name in ('c', 'a', 'b'):
+        watcher.add('#chan', name)
+
+    assert [group.path for group in watcher.groups] == ['a+b', 'c']
+
+    # a subreddit's group is polled once however many channels watch it
+    watcher.add('#other', 'a')
+    assert [group.path for group in watcher.groups] == ['a+b', 'c']
+
+    watcher.remove('#chan', 'b')
+    assert [group.path for group in watcher.groups] == ['a+c']
+
+
+def test_first_polls_are_spread_out():
+    clock = FakeClock()
+    watcher = make_watcher(clock, group_size=1)
+    for name in ('a', 'b', 'c'):
+        watcher.add('#chan', name)
+
+    assert [group.path for group in watcher.due()] == ['a']
+    clock.now += 30
+    assert [group.path for group in watcher.due()] == ['a', 'b']
+    clock.now += 30
+    assert [group.path for group in watcher.due()] == ['a', 'b', 'c']
+
+
+def test_interval_adapts_to_post_rate():
+    clock = FakeClock()
+    watcher = make_watcher(clock)
+    watcher.add('#chan', 'busy')
+    group = watcher.groups[0]
+
+    assert watcher.record(group, ['old']) == ['old']
+    assert group.interval == 60
+
+    # quiet: back off
+    clock.now += 60
+    assert watcher.record(group, ['old']) == []
+    assert group.interval == 120
+    clock.now += 120
+    watcher.record(group, ['old'])
+    assert group.interval == 240
+
+    # a full page of new posts: poll as often as allowed
+    clock.now += 240
+    watcher.record(group, ['p%d' % n for n in range(PAGE_SIZE)])
+    assert group.interval == 60
+    assert group.next_poll == clock.now + 60
+
+    # a post every 10 seconds: aim for a quarter page per poll
+    for n in range(20):
+        clock.now += 60
+        watcher.record(group, ['q%d-%d' % (n, i) for i in range(6)])
+    assert abs(group.interval - (PAGE_SIZE / 4) * 10) < 1
+
+
+def test_slowdown_and_failures():
+    clock = FakeClock()
+    watcher = make_watcher(clock)
+    watcher.add('#chan', 'a')
+    group = watcher.groups[0]
+
+    watcher.record(group, [], slowdown=2.0)
+    assert group.interval == 120
+
+    watcher.failed(group)
+    assert group.interval == 240
+    watcher.failed(group)
+    watcher.failed(group)
+    assert group.interval == 900
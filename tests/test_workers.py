@@ -0,0 +1,119 @@
+"""Tests for the reddit plugin's concurrency helpers"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from sopel_reddit.workers import EXPLICIT, SingleFlight, WorkerPool
+
+
+def test_single_flight_shares_calls():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        release.wait(5)
+        return key.upper()
+
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flights.do, 'k', fetch, 'abc') for _ in range(5)]
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ['ABC'] * 5
+    assert len(calls) < 5
+
+
+def test_single_flight_forgets_finished_calls():
+    flights = SingleFlight()
+    calls = []
+    flights.do('k', calls.append, 1)
+    flights.do('k', calls.append, 2)
+    assert calls == [1, 2]
+
+
+def test_worker_pool_refuses_work_when_full():
+    release = threading.Event()
+    pool = WorkerPool(1, 1)
+
+    assert pool.submit(release.wait, 5)  # taken by the worker...
+    for _ in range(100):
+        if pool.qsize() == 0:
+            break
+        time.sleep(0.01)
+    assert pool.submit(release.wait, 5)  # ...this one waits in the queue...
+    assert not pool.submit(release.wait, 5)  # ...and there's no more room
+
+    release.set()
+    pool.shutdown()
+
+
+def test_worker_pool_runs_explicit_jobs_first():
+    release = threading.Event()
+    done = threading.Event()
+    order = []
+    pool = WorkerPool(1, 10)
+
+    pool.submit(release.wait, 5)
+    for _ in range(100):
+        if pool.qsize() == 0:
+            break
+        time.sleep(0.01)
+    pool.submit(order.append, 'passive')
+    pool.submit(order.append, 'explicit', priority=EXPLICIT)
+    pool.submit(done.set)
+
+    release.set()
+    assert done.wait(5)
+    assert order == ['explicit', 'passive']
+    pool.shutdown()
+
+
+def test_worker_pool_drops_passive_jobs_without_budget():
+    done = threading.Event()
+    order = []
+    pool = WorkerPool(1, 10, allows_passive=lambda: False)
+
+    pool.submit(order.append, 'passive', on_drop=lambda: order.append('dropped'))
+    pool.submit(order.append, 'explicit', priority=EXPLICIT)
+    pool.submit(done.set, priority=EXPLICIT)
+
+    assert done.wait(5)
+    assert order == ['explicit', 'dropped']
+    assert pool.dropped == 1
+    pool.shutdown()
+
+
+def test_worker_pool_join_waits_for_queued_jobs():
+    done = []
+    pool = WorkerPool(2, 10)
+    for n in range(5):
+        pool.submit(lambda n=n: (time.sleep(0.01), done.append(n)))
+    pool.join()
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    pool.shutdown()
+    pool.join()
+
+
+def test_worker_pool_shutdown_runs_explicit_jobs_and_drops_passive_ones():
+    release = threading.Event()
+    order = []
+    pool = WorkerPool(1, 10)
+
+    pool.submit(release.wait, 5, priority=EXPLICIT)
+    for _ in range(100):
+        if pool.qsize() == 0:
+            break
+        time.sleep(0.01)
+    pool.submit(order.append, 'passive')
+    pool.submit(order.append, 'explicit', priority=EXPLICIT)
+
+    assert not pool.shutdown(timeout=0.05)  # still busy
+    assert not pool.submit(order.append, 'late', priority=EXPLICIT)
+    release.set()
+    assert pool.shutdown(timeout=5)
+    assert order == ['explicit']
+    assert pool.dropped == 1